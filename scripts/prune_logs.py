@@ -30,6 +30,12 @@ optional arguments:
                         Compress (using gzip) any teuthology.log files older
                         than DAYS. Negative values will skip this operation.
                         [default: 30]
+  -j NUM, --concurrency NUM
+                        How many removals and compressions to run at once.
+                        [default: 1]
+  --rate-limit MBPS     Limit removals and compressions to roughly MBPS
+                        megabytes per second. Zero means no limit.
+                        [default: 0]
 """.format(archive_base=teuthology.config.config.archive_base)
 
 
@@ -5,9 +5,9 @@ import teuthology.report
 doc = """
 usage:
     teuthology-report -h
-    teuthology-report [-v] [-R] [-n] [-s SERVER] [-a ARCHIVE] [-D] -r RUN ...
-    teuthology-report [-v] [-s SERVER] [-a ARCHIVE] [-D] -r RUN -j JOB ...
-    teuthology-report [-v] [-R] [-n] [-s SERVER] [-a ARCHIVE] --all-runs
+    teuthology-report [-v] [-R] [-n] [-s SERVER] [-a ARCHIVE] [-D] [-c NUM] -r RUN ...
+    teuthology-report [-v] [-s SERVER] [-a ARCHIVE] [-D] [-c NUM] -r RUN -j JOB ...
+    teuthology-report [-v] [-R] [-n] [-s SERVER] [-a ARCHIVE] [-c NUM] --all-runs
 
 Submit test results to a web service
 
@@ -33,6 +33,9 @@ optional arguments:
                         behavior.
   -D, --dead            Mark all given jobs (or entire runs) with status
                         'dead'. Implies --refresh.
+  -c NUM, --concurrency NUM
+                        Read and submit up to NUM jobs of a run at once
+                        [default: 1]
   -v, --verbose         be more verbose
 """.format(archive_base=teuthology.config.config.archive_base)
 
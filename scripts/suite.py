@@ -106,6 +106,10 @@ Scheduler arguments:
                               Useful to avoid bursts that may be too hard on
                               the underlying infrastructure or exceed OpenStack API
                               limits (server creation per minute for instance).
+  --batch                     Schedule jobs from within this process, using
+                              a single queue connection and a single results
+                              server session, instead of running
+                              teuthology-schedule once per job.
   -r, --rerun <name>          Attempt to reschedule a run, selecting only those
                               jobs whose status are mentioned by
                               --rerun-status.
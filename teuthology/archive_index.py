@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from .job_status import get_status
+
+log = logging.getLogger(__name__)
+
+
+def _to_str(obj):
+    """
+    json.loads() returns unicode strings; give back the str objects that were
+    originally read from the archive.
+    """
+    if isinstance(obj, unicode):
+        return obj.encode('utf-8')
+    elif isinstance(obj, list):
+        return [_to_str(item) for item in obj]
+    elif isinstance(obj, dict):
+        return dict((_to_str(k), _to_str(v)) for k, v in obj.iteritems())
+    return obj
+
+
+class ArchiveIndex(object):
+    """
+    An on-disk index of the runs and jobs found in an archive directory,
+    stored in a SQLite database in the archive's root.
+
+    Directory listings are cached and reused for as long as the directory's
+    mtime is unchanged. Merged job info is cached for as long as the mtimes
+    of the files it was built from are unchanged. Anything found to be out
+    of date is re-read and the index is updated in place.
+
+    The index is only a cache. When it can't be read, e.g. because another
+    process holds a lock on it, the archive is read directly instead; if it
+    turns out to be corrupt, it is deleted and rebuilt as it is used.
+    """
+    filename = '.archive_index.sqlite'
+    # An mtime this close to the time it was seen may not yet reflect every
+    # change made during that second, so it is never trusted.
+    racy_window = 2
+    # The statuses of jobs that have finished, and so have a summary.yaml
+    finished_statuses = ('pass', 'fail', 'dead')
+
+    def __init__(self, archive_base, path=None):
+        self.archive_base = archive_base
+        self.path = path or os.path.join(archive_base, self.filename)
+        try:
+            self._open()
+        except sqlite3.Error as exc:
+            if not self._is_corrupt(exc):
+                raise
+            self._recreate()
+
+    def _open(self):
+        self.conn = sqlite3.connect(self.path)
+        # This is a cache: if it is lost, it is rebuilt from the archive
+        self.conn.isolation_level = None
+        self.conn.execute('PRAGMA synchronous = OFF')
+        # A journal file coming and going would change archive_base's mtime
+        self.conn.execute('PRAGMA journal_mode = MEMORY')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS dirs ('
+            'path TEXT PRIMARY KEY, mtime REAL, seen REAL, entries TEXT)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'run_name TEXT, job_id TEXT, stamp TEXT, info TEXT, status TEXT, '
+            'PRIMARY KEY (run_name, job_id))'
+        )
+
+    @staticmethod
+    def _is_corrupt(exc):
+        # OperationalError covers transient trouble like a locked database;
+        # other DatabaseErrors mean the file is not a usable database
+        return (isinstance(exc, sqlite3.DatabaseError) and
+                not isinstance(exc, sqlite3.OperationalError))
+
+    def _recreate(self):
+        log.warning("Archive index %s is corrupt; rebuilding it", self.path)
+        try:
+            self.conn.close()
+        except (AttributeError, sqlite3.Error):
+            pass
+        os.remove(self.path)
+        self._open()
+
+    def _handle_error(self, exc):
+        log.debug("Could not use archive index %s", self.path, exc_info=True)
+        if self._is_corrupt(exc):
+            try:
+                self._recreate()
+            except (OSError, sqlite3.Error):
+                log.warning("Could not rebuild archive index %s", self.path,
+                            exc_info=True)
+
+    def _trusted(self, mtime, seen):
+        return mtime < seen - self.racy_window
+
+    def _read(self, statement, values):
+        """
+        :returns: The rows selected, or None if the index could not be read
+        """
+        try:
+            return self.conn.execute(statement, values).fetchall()
+        except sqlite3.Error as exc:
+            self._handle_error(exc)
+            return None
+
+    def _write(self, statement, values):
+        try:
+            self.conn.execute(statement, values)
+        except sqlite3.Error as exc:
+            self._handle_error(exc)
+
+    def subdirs(self, path):
+        """
+        List the subdirectories of path.
+
+        :param path: A directory; normally archive_base or a run directory
+        :returns:    A list of names
+        """
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return []
+        rows = self._read(
+            'SELECT mtime, seen, entries FROM dirs WHERE path = ?', (path,))
+        if rows and rows[0][0] == mtime and self._trusted(*rows[0][:2]):
+            return _to_str(json.loads(rows[0][2]))
+        seen = time.time()
+        names = [name for name in os.listdir(path)
+                 if os.path.isdir(os.path.join(path, name))]
+        self._write(
+            'INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)',
+            (path, mtime, seen, json.dumps(names)),
+        )
+        return names
+
+    def job_info(self, run_name, job_id, file_names, read_job_info):
+        """
+        Return a job's merged info.
+
+        :param run_name:      The name of the run
+        :param job_id:        The job's id
+        :param file_names:    The names of the files in the job's directory
+                              that read_job_info() reads
+        :param read_job_info: A function that takes no arguments and returns
+                              the job's info, read from the archive
+        :returns:             A dict
+        """
+        job_dir = os.path.join(self.archive_base, run_name, job_id)
+        seen = time.time()
+        mtimes = []
+        trusted = True
+        for name in file_names:
+            try:
+                mtime = os.stat(os.path.join(job_dir, name)).st_mtime
+            except OSError:
+                mtime = None
+            if mtime is not None and not self._trusted(mtime, seen):
+                trusted = False
+            mtimes.append(mtime)
+        stamp = json.dumps(mtimes)
+        rows = self._read(
+            'SELECT stamp, info FROM jobs WHERE run_name = ? AND job_id = ?',
+            (run_name, job_id),
+        )
+        if rows and rows[0][0] == stamp:
+            return _to_str(json.loads(rows[0][1]))
+        job_info = read_job_info()
+        if trusted:
+            try:
+                info = json.dumps(job_info)
+                # Don't index anything JSON would not give back as-is
+                trusted = json.loads(info) == job_info
+            except (TypeError, ValueError):
+                trusted = False
+        if trusted:
+            self._write(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)',
+                (run_name, job_id, stamp, info, get_status(job_info)),
+            )
+        return job_info
+
+    def finished_jobs(self, run_name):
+        """
+        List the jobs of a run that were indexed with a final status. Those
+        have a summary.yaml, which is never removed, so they need not be
+        looked at again to know they are not running.
+
+        :returns: A set of job ids
+        """
+        rows = self._read(
+            'SELECT job_id FROM jobs WHERE run_name = ? AND status IN '
+            '(%s)' % ', '.join('?' * len(self.finished_statuses)),
+            (run_name,) + self.finished_statuses,
+        )
+        return set(str(row[0]) for row in rows or [])
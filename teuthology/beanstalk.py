@@ -6,6 +6,7 @@ import sys
 from collections import OrderedDict
 
 from .config import config
+from . import queue_index
 from . import report
 
 log = logging.getLogger(__name__)
@@ -61,6 +62,94 @@ def walk_jobs(connection, tube_name, processor, pattern=None):
     processor.complete()
 
 
+def find_indexed_jobs(connection, tube_name, index):
+    """
+    List the jobs ready in a tube using the queue index, without reserving
+    any of them.
+
+    The index is only used if it lists as many jobs as are ready in the tube
+    and the job beanstalk would hand out next is among them; a job
+    scheduled without updating the index would otherwise be missed. If it
+    lists more, the extra entries are looked up one by one and those of jobs
+    that are no longer ready are dropped.
+
+    :returns: A list of dicts like those returned by QueueIndex.jobs(), or
+              None if the index doesn't account for every job in the tube
+    """
+    jobs = index.jobs(tube_name)
+    ready = connection.stats_tube(tube_name)['current-jobs-ready']
+    if len(jobs) > ready:
+        stale = [job for job in jobs
+                 if not is_ready(connection, tube_name, job['job_id'])]
+        if stale:
+            index.remove([job['job_id'] for job in stale])
+            jobs = [job for job in jobs if job not in stale]
+    if len(jobs) != ready:
+        log.debug("Queue index lists %d of %d jobs in %s", len(jobs), ready,
+                  tube_name)
+        return None
+    if jobs:
+        # peek-ready looks in the tube being used, not the ones watched
+        connection.use(tube_name)
+        peeked = connection.peek_ready()
+        if peeked is None or \
+                peeked.jid not in [job['job_id'] for job in jobs]:
+            log.debug("Queue index is missing jobs in %s", tube_name)
+            return None
+    return jobs
+
+
+def is_ready(connection, tube_name, job_id):
+    """
+    Whether a job is still waiting in the given tube
+    """
+    try:
+        stats = connection.stats_job(job_id)
+    except beanstalkc.CommandFailed:
+        return False
+    return stats.get('state') == 'ready' and stats.get('tube') == tube_name
+
+
+def walk_indexed_jobs(connection, tube_name, processor, index, pattern=None,
+                      full=False, verify=False):
+    """
+    Like walk_jobs(), but find the jobs using the queue index. Jobs are
+    passed to the processor with a job_config holding just their name,
+    priority and description, unless full is True; then each job's body is
+    fetched with a peek. If verify is True, each job is checked to still be
+    ready before it is passed on, as the processor is going to act on it.
+
+    :returns: False, having done nothing, if the index can't be used
+    """
+    jobs = find_indexed_jobs(connection, tube_name, index)
+    if jobs is None:
+        return False
+    stale = list()
+    for job in jobs:
+        if pattern is not None and pattern not in job['name']:
+            continue
+        job_id = job['job_id']
+        if verify and not is_ready(connection, tube_name, job_id):
+            stale.append(job_id)
+            continue
+        job_config = dict(
+            name=job['name'],
+            priority=job['priority'],
+            description=job['description'],
+        )
+        if full:
+            peeked = connection.peek(job_id)
+            if peeked is None or peeked.body is None:
+                continue
+            job_config = yaml.safe_load(peeked.body)
+        job_obj = beanstalkc.Job(connection, job_id, None, reserved=False)
+        processor.add_job(job_id, job_config, job_obj)
+    if stale:
+        index.remove(stale)
+    processor.complete()
+    return True
+
+
 def print_progress(index, total, message=None):
     msg = "{m} ".format(m=message) if message else ''
     sys.stderr.write("{msg}{i}/{total}\r".format(
@@ -156,6 +245,9 @@ class JobDeleter(JobProcessor):
             job_obj.delete()
         report.try_delete_jobs(job_name, job_id)
 
+    def complete(self):
+        queue_index.remove_jobs(self.jobs.keys())
+
 
 def pause_tube(connection, tube, duration):
     duration = int(duration)
@@ -189,26 +281,36 @@ def main(args):
     show_desc = args['--description']
     full = args['--full']
     pause_duration = args['--pause']
+    index = None
     try:
         connection = connect()
         if machine_type and not pause_duration:
             # watch_tube needs to be run before we inspect individual jobs;
             # it is not needed for pausing tubes
             watch_tube(connection, machine_type)
+            index = queue_index.get_index()
+
+        def walk(processor, pattern=None, verify=False):
+            # Fall back to reserving every job if the index can't be used
+            if index is None or not walk_indexed_jobs(
+                    connection, machine_type, processor, index,
+                    pattern=pattern, full=full, verify=verify):
+                walk_jobs(connection, machine_type, processor,
+                          pattern=pattern)
+
         if status:
             print stats_tube(connection, machine_type)
         elif pause_duration:
             pause_tube(connection, machine_type, pause_duration)
         elif delete:
-            walk_jobs(connection, machine_type,
-                      JobDeleter(delete))
+            walk(JobDeleter(delete), pattern=delete, verify=True)
         elif runs:
-            walk_jobs(connection, machine_type,
-                      RunPrinter())
+            walk(RunPrinter())
         else:
-            walk_jobs(connection, machine_type,
-                      JobPrinter(show_desc=show_desc, full=full))
+            walk(JobPrinter(show_desc=show_desc, full=full))
     except KeyboardInterrupt:
         log.info("Interrupted.")
     finally:
+        if index is not None:
+            index.close()
         connection.close()
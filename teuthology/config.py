@@ -129,11 +129,15 @@ class TeuthologyConfig(YamlConfig):
     yaml_path = os.path.join(os.path.expanduser('~/.teuthology.yaml'))
     _defaults = {
         'archive_base': '/home/teuthworker/archive',
+        'archive_bandwidth': None,
+        'archive_index': False,
         'archive_upload': None,
         'archive_upload_key': None,
         'archive_upload_url': None,
         'automated_scheduling': False,
+        'queue_index': None,
         'reserve_machines': 5,
+        'vm_concurrency': 8,
         'ceph_git_base_url': 'https://github.com/ceph/',
         'ceph_git_url': None,
         'ceph_qa_suite_git_url': None,
@@ -146,11 +150,16 @@ class TeuthologyConfig(YamlConfig):
         'lab_domain': 'front.sepia.ceph.com',
         'lock_server': 'http://paddles.front.sepia.ceph.com/',
         'max_job_time': 259200,  # 3 days
+        'run_capture_limit': None,
         'nsupdate_url': 'http://nsupdate.front.sepia.ceph.com/update',
+        'package_version_cache':
+            os.path.expanduser('~/.cache/teuthology/package_versions.json'),
+        'package_version_cache_ttl': 3600,
         'results_server': 'http://paddles.front.sepia.ceph.com/',
         'results_ui_server': 'http://pulpito.ceph.com/',
         'results_sending_email': 'teuthology',
         'results_timeout': 43200,
+        'ssh_pool_size': 1,
         'src_base_path': os.path.expanduser('~/src'),
         'verify_host_keys': True,
         'watchdog_interval': 120,
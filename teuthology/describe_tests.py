@@ -5,10 +5,10 @@ import json
 from prettytable import PrettyTable, FRAME, ALL
 import os
 import sys
-import yaml
 
 from teuthology.exceptions import ParseError
-from teuthology.suite.build_matrix import build_matrix, combine_path
+from teuthology.suite.build_matrix import lazy_build_matrix, combine_path
+from teuthology.suite.fragment import load_fragment
 
 
 def main(args):
@@ -80,8 +80,8 @@ def get_combinations(suite_dir, fields, subset,
     Returns a tuple of (headers, rows) where both elements are lists
     of strings.
     """
-    configs = [(combine_path(suite_dir, item[0]), item[1]) for item in
-               build_matrix(suite_dir, subset)]
+    configs = ((combine_path(suite_dir, item[0]), item[1]) for item in
+               lazy_build_matrix(suite_dir, subset))
 
     num_listed = 0
     rows = []
@@ -197,8 +197,7 @@ def extract_info(file_name, fields):
     if os.path.isdir(file_name) or not file_name.endswith('.yaml'):
         return empty_result
 
-    with open(file_name, 'r') as f:
-        parsed = yaml.load(f)
+    parsed = load_fragment(file_name)
 
     if not isinstance(parsed, dict):
         return empty_result
@@ -9,6 +9,7 @@ import logging
 import getpass
 
 from . import beanstalk
+from . import queue_index
 from . import report
 from .config import config
 from . import misc
@@ -123,8 +124,34 @@ def remove_beanstalk_jobs(run_name, tube_name):
     beanstalk_conn = beanstalk.connect()
     real_tube_name = beanstalk.watch_tube(beanstalk_conn, tube_name)
 
+    index = queue_index.get_index()
+    if index is not None:
+        try:
+            jobs = beanstalk.find_indexed_jobs(beanstalk_conn, real_tube_name,
+                                               index)
+        finally:
+            index.close()
+        if jobs is not None:
+            deleted = list()
+            for job in jobs:
+                if job['name'] != run_name:
+                    continue
+                if not beanstalk.is_ready(beanstalk_conn, real_tube_name,
+                                          job['job_id']):
+                    # Already gone; just drop it from the index
+                    deleted.append(job['job_id'])
+                    continue
+                log_job_deletion(job['job_id'], job['name'],
+                                 job['description'])
+                beanstalk_conn.delete(job['job_id'])
+                deleted.append(job['job_id'])
+            queue_index.remove_jobs(deleted)
+            beanstalk_conn.close()
+            return
+
     curjobs = beanstalk_conn.stats_tube(real_tube_name)['current-jobs-ready']
     if curjobs != 0:
+        deleted = list()
         x = 1
         while x != curjobs:
             x += 1
@@ -134,19 +161,26 @@ def remove_beanstalk_jobs(run_name, tube_name):
             job_config = yaml.safe_load(job.body)
             if run_name == job_config['name']:
                 job_id = job.stats()['id']
-                msg = "Deleting job from queue. ID: " + \
-                    "{id} Name: {name} Desc: {desc}".format(
-                        id=str(job_id),
-                        name=job_config['name'],
-                        desc=job_config['description'],
-                    )
-                log.info(msg)
+                log_job_deletion(job_id, job_config['name'],
+                                 job_config['description'])
                 job.delete()
+                deleted.append(job_id)
+        queue_index.remove_jobs(deleted)
     else:
         print "No jobs in Beanstalk Queue"
     beanstalk_conn.close()
 
 
+def log_job_deletion(job_id, name, description):
+    msg = "Deleting job from queue. ID: " + \
+        "{id} Name: {name} Desc: {desc}".format(
+            id=str(job_id),
+            name=name,
+            desc=description,
+        )
+    log.info(msg)
+
+
 def kill_processes(run_name, pids=None):
     if pids:
         to_kill = set(pids).intersection(psutil.pids())
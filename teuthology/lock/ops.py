@@ -1,6 +1,7 @@
 import logging
 import json
 import os
+import time
 
 import requests
 
@@ -14,6 +15,7 @@ from teuthology.task import console_log
 
 import util
 import keys
+import query
 
 log = logging.getLogger(__name__)
 
@@ -26,8 +28,10 @@ def lock_many_openstack(ctx, num, machine_type, user=None, description=None,
         resources_hint = ctx.config.get('openstack')
     else:
         resources_hint = None
-    machines =  teuthology.provision.openstack.ProvisionOpenStack().create(
+    provisioner = teuthology.provision.openstack.ProvisionOpenStack()
+    machines = provisioner.create(
         num, os_type, os_version, arch, resources_hint)
+    _record_vm_times(ctx, 'boot', provisioner.boot_times)
     result = {}
     for machine in machines:
         lock_one(machine, user, description)
@@ -94,20 +98,15 @@ def lock_many(ctx, num, machine_type, user=None, description=None,
             data=json.dumps(data),
             headers={'content-type': 'application/json'},
         )
+        query.clear_status_cache()
         if response.ok:
             machines = {misc.canonicalize_hostname(machine['name']):
                         machine['ssh_pub_key'] for machine in response.json()}
             log.debug('locked {machines}'.format(
                 machines=', '.join(machines.keys())))
             if machine_type in vm_types:
-                ok_machs = {}
-                for machine in machines:
-                    if teuthology.provision.create_if_vm(ctx, machine):
-                        ok_machs[machine] = machines[machine]
-                    else:
-                        log.error('Unable to create virtual machine: %s',
-                                  machine)
-                        unlock_one(ctx, machine, user)
+                ok_machs = create_vms(ctx, machines, user)
+                if ok_machs:
                     ok_machs = keys.do_update_keys(ok_machs.keys())[1]
                 return ok_machs
             elif machine_type in reimage_types:
@@ -136,6 +135,98 @@ def lock_many(ctx, num, machine_type, user=None, description=None,
     return []
 
 
+def _record_vm_times(ctx, action, durations):
+    """
+    Log the slowest of the given per-node durations, and add them to
+    ctx.timer under 'vm_<action>_seconds' if there is one
+
+    :param action:    'create', 'recreate' or 'boot'
+    :param durations: A dict mapping node names to seconds
+    """
+    if not durations:
+        return
+    (slowest, seconds) = max(durations.iteritems(), key=lambda item: item[1])
+    log.info('Slowest virtual machine to %s: %s (%ss)', action, slowest,
+             seconds)
+    timer = getattr(ctx, 'timer', None)
+    if timer is not None:
+        name = 'vm_%s_seconds' % action
+        history = timer.extra.get(name, dict())
+        history.update(durations)
+        timer.record(name, history)
+
+
+def create_vms(ctx, machines, user):
+    """
+    Create the virtual machines behind freshly-locked nodes, up to
+    config.vm_concurrency at a time. Nodes whose VM could not be created are
+    unlocked; the rest are returned so the caller can keep them.
+
+    How long each node took is recorded in ctx.timer as 'vm_create_seconds'.
+
+    :param machines: A dict mapping node names to their ssh host keys
+    :param user:     The user the nodes are locked by
+    :returns:        The subset of machines that were created
+    """
+    created = dict()
+    durations = dict()
+
+    def create_one(machine):
+        start = time.time()
+        try:
+            ok = teuthology.provision.create_if_vm(ctx, machine)
+        except Exception:
+            log.exception('Error creating virtual machine: %s', machine)
+            ok = False
+        durations[machine] = round(time.time() - start, 3)
+        if ok:
+            created[machine] = machines[machine]
+        else:
+            log.error('Unable to create virtual machine: %s', machine)
+            unlock_one(ctx, machine, user)
+
+    with teuthology.parallel.parallel(size=config.vm_concurrency) as p:
+        for machine in machines:
+            p.spawn(create_one, machine)
+    _record_vm_times(ctx, 'create', durations)
+    return created
+
+
+def recreate_vms(ctx, machines):
+    """
+    Destroy and re-create the given virtual machines, up to
+    config.vm_concurrency at a time.
+
+    How long each node took is recorded in ctx.timer as
+    'vm_recreate_seconds'.
+
+    :param machines: A list of node names
+    :returns:        A list of the nodes that were re-created
+    """
+    recreated = list()
+    durations = dict()
+
+    def recreate_one(machine):
+        log.info('recreating: ' + machine)
+        full_name = misc.canonicalize_hostname(machine)
+        start = time.time()
+        try:
+            teuthology.provision.destroy_if_vm(ctx, full_name)
+            if teuthology.provision.create_if_vm(ctx, full_name):
+                recreated.append(machine)
+            else:
+                log.error('Unable to recreate virtual machine: %s', machine)
+        except Exception:
+            log.exception('Error recreating virtual machine: %s', machine)
+        durations[machine] = round(time.time() - start, 3)
+
+    with teuthology.parallel.parallel(size=config.vm_concurrency) as p:
+        for machine in machines:
+            p.spawn(recreate_one, machine)
+    _record_vm_times(ctx, 'recreate', durations)
+    return recreated
+
+
 def lock_one(name, user=None, description=None):
     name = misc.canonicalize_hostname(name, user=None)
     if user is None:
@@ -144,6 +235,7 @@ def lock_one(name, user=None, description=None):
                    description=description)
     uri = os.path.join(config.lock_server, 'nodes', name, 'lock', '')
     response = requests.put(uri, json.dumps(request))
+    query.clear_status_cache()
     success = response.ok
     if success:
         log.debug('locked %s as %s', name, user)
@@ -171,6 +263,7 @@ def unlock_many(names, user):
         data=json.dumps(data),
         headers={'content-type': 'application/json'},
     )
+    query.clear_status_cache()
     if response.ok:
         log.debug("Unlocked: %s", ', '.join(names))
     else:
@@ -195,6 +288,7 @@ def unlock_one(ctx, name, user, description=None):
             # Work around https://github.com/kennethreitz/requests/issues/2364
             except requests.ConnectionError as e:
                 log.warn("Saw %s while unlocking; retrying...", str(e))
+    query.clear_status_cache()
     success = response.ok
     if success:
         log.info('unlocked %s', name)
@@ -223,6 +317,7 @@ def update_lock(name, description=None, status=None, ssh_pub_key=None):
         response = requests.put(
             uri,
             json.dumps(updated))
+        query.clear_status_cache()
         return response.ok
     return True
 
@@ -252,6 +347,7 @@ def update_inventory(node_dict):
             json.dumps(node_dict),
             headers={'content-type': 'application/json'},
         )
+    query.clear_status_cache()
     if not response.ok:
         log.error("Node update/creation failed for %s: %s",
                   name, response.text)
@@ -1,39 +1,107 @@
 import logging
 import os
+import time
 import urllib
 
 import requests
 
 from teuthology import misc
 from teuthology.config import config
+from teuthology.parallel import parallel
+from teuthology.report import ResultsReporter
 
 
 log = logging.getLogger(__name__)
 
 
+# How long, in seconds, node statuses read from the lock server are reused
+# within a process. Anything in teuthology.lock.ops that changes a node
+# clears the cache.
+STATUS_CACHE_TTL = 10
+# Maps a node's canonical name to a (time, status) tuple
+_status_cache = dict()
+_session = None
+
+
+def _get_session():
+    """
+    :returns: A requests.Session shared by every lock server query in this
+              process
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=32)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def _http_get(url, **kwargs):
+    return _get_session().get(url, **kwargs)
+
+
+def _cache_statuses(statuses):
+    now = time.time()
+    for status in statuses:
+        _status_cache[status['name']] = (now, status)
+
+
+def _cached_status(name):
+    cached = _status_cache.get(name)
+    if cached is not None and time.time() - cached[0] < STATUS_CACHE_TTL:
+        return cached[1]
+    return None
+
+
+def clear_status_cache():
+    """
+    Forget every node status cached by get_status(), get_statuses() and
+    list_locks()
+    """
+    _status_cache.clear()
+
+
 def get_status(name):
     name = misc.canonicalize_hostname(name, user=None)
+    status = _cached_status(name)
+    if status is not None:
+        return status
     uri = os.path.join(config.lock_server, 'nodes', name, '')
-    response = requests.get(uri)
+    response = _http_get(uri)
     success = response.ok
     if success:
-        return response.json()
+        status = response.json()
+        _cache_statuses([status])
+        return status
     log.warning(
         "Failed to query lock server for status of {name}".format(name=name))
     return None
 
 
 def get_statuses(machines):
+    """
+    Get the status of each of the given machines, or of every machine if
+    none are given.
+
+    Statuses that aren't cached are fetched with a single request for every
+    node, rather than one request per machine.
+    """
     if machines:
+        names = [misc.canonicalize_hostname(machine, user=None)
+                 for machine in machines]
+        missing = [name for name in names if _cached_status(name) is None]
+        if len(missing) > 1:
+            # This caches every node's status
+            list_locks()
         statuses = []
-        for machine in machines:
-            machine = misc.canonicalize_hostname(machine)
-            status = get_status(machine)
+        for name in names:
+            status = _cached_status(name) or get_status(name)
             if status:
                 statuses.append(status)
             else:
                 log.error("Lockserver doesn't know about machine: %s" %
-                          machine)
+                          name)
     else:
         statuses = list_locks()
     return statuses
@@ -60,18 +128,20 @@ def list_locks(keyed_by_name=False, **kwargs):
             kwargs['machine_type'] = kwargs['machine_type'].replace(',','|')
         uri += '?' + urllib.urlencode(kwargs)
     try:
-        response = requests.get(uri)
+        response = _http_get(uri)
     except requests.ConnectionError:
         success = False
         log.exception("Could not contact lock server: %s", config.lock_server)
     else:
         success = response.ok
     if success:
+        nodes = response.json()
+        _cache_statuses(nodes)
         if not keyed_by_name:
-            return response.json()
+            return nodes
         else:
             return {node['name']: node
-                    for node in response.json()}
+                    for node in nodes}
     return dict()
 
 
@@ -108,34 +178,52 @@ def find_stale_locks(owner=None):
         nodes = [node for node in nodes if node['locked_by'] == owner]
     nodes = filter(might_be_stale, nodes)
 
-    def node_job_is_active(node, cache):
-        """
-        Is this node's job active (e.g. running or waiting)?
-
-        :param node:  The node dict as returned from the lock server
-        :param cache: A set() used for caching results
-        :returns:     True or False
-        """
-        description = node['description']
-        if description in cache:
-            return True
-        (name, job_id) = description.split('/')[-2:]
-        url = os.path.join(config.results_server, 'runs', name, 'jobs', job_id,
-                           '')
-        resp = requests.get(url)
-        job_info = resp.json()
-        if job_info['status'] in ('running', 'waiting'):
-            cache.add(description)
-            return True
-        return False
-
-    result = list()
     # Here we build the list of of nodes that are locked, for a job (as opposed
     # to being locked manually for random monkeying), where the job is not
     # running
-    active_jobs = set()
+    run_names = set(node['description'].split('/')[-2] for node in nodes)
+    active_jobs = find_active_jobs(run_names)
+    result = list()
     for node in nodes:
-        if node_job_is_active(node, active_jobs):
+        (name, job_id) = node['description'].split('/')[-2:]
+        active = active_jobs.get(name)
+        # If we couldn't tell, leave the node alone
+        if active is None or job_id in active:
             continue
         result.append(node)
-    return result
\ No newline at end of file
+    return result
+
+
+# How many runs find_active_jobs() may query the results server about at once
+ACTIVE_JOBS_CONCURRENCY = 8
+
+
+def find_active_jobs(run_names):
+    """
+    Find which jobs of the given runs are active (e.g. running or waiting).
+    Each run's jobs are fetched with a single request, and several runs are
+    queried at once.
+
+    :param run_names: An iterable of run names
+    :returns:         A dict mapping each run name to a set of the IDs of its
+                      active jobs. A run that doesn't exist has none; a run
+                      whose jobs couldn't be fetched maps to None.
+    """
+    reporter = ResultsReporter()
+
+    def get_active(run_name):
+        try:
+            jobs = reporter.get_jobs(run_name, fields=['status'])
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 404:
+                return run_name, set()
+            log.exception("Could not get the jobs of %s", run_name)
+            return run_name, None
+        return run_name, set(str(job['job_id']) for job in jobs
+                             if job.get('status') in ('running', 'waiting'))
+
+    with parallel(size=ACTIVE_JOBS_CONCURRENCY) as p:
+        for run_name in run_names:
+            p.spawn(get_active, run_name)
+        return dict(p)
@@ -0,0 +1,42 @@
+from mock import patch, MagicMock
+
+from teuthology.lock import ops
+
+
+class TestCreateVMs(object):
+    def setup(self):
+        self.ctx = MagicMock()
+        self.ctx.timer.extra = dict()
+
+    def test_create_vms(self):
+        machines = dict(good1='key1', bad='key2', good2='key3')
+
+        def create_if_vm(ctx, machine):
+            return machine != 'bad'
+
+        with patch('teuthology.lock.ops.unlock_one') as m_unlock_one:
+            with patch('teuthology.provision.create_if_vm',
+                       side_effect=create_if_vm):
+                created = ops.create_vms(self.ctx, machines, 'user')
+        assert created == dict(good1='key1', good2='key3')
+        m_unlock_one.assert_called_once_with(self.ctx, 'bad', 'user')
+        args = self.ctx.timer.record.call_args[0]
+        assert args[0] == 'vm_create_seconds'
+        assert sorted(args[1].keys()) == ['bad', 'good1', 'good2']
+
+    def test_create_vms_error(self):
+        with patch('teuthology.lock.ops.unlock_one') as m_unlock_one:
+            with patch('teuthology.provision.create_if_vm',
+                       side_effect=RuntimeError()):
+                created = ops.create_vms(self.ctx, dict(node='key'), 'user')
+        assert created == dict()
+        m_unlock_one.assert_called_once_with(self.ctx, 'node', 'user')
+
+    def test_recreate_vms(self):
+        with patch('teuthology.provision.destroy_if_vm') as m_destroy:
+            with patch('teuthology.provision.create_if_vm',
+                       side_effect=[True, False]):
+                recreated = ops.recreate_vms(self.ctx, ['node1', 'node2'])
+        assert len(recreated) == 1
+        assert m_destroy.call_count == 2
+        assert self.ctx.timer.record.call_args[0][0] == 'vm_recreate_seconds'
@@ -0,0 +1,91 @@
+from mock import patch, Mock
+
+from teuthology import misc
+from teuthology.lock import ops, query
+
+
+class TestQuery(object):
+    def setup(self):
+        query.clear_status_cache()
+        self.names = [misc.canonicalize_hostname(name, user=None)
+                      for name in ('node1', 'node2', 'node3')]
+        self.nodes = [dict(name=name, locked=True) for name in self.names]
+        self.patcher = patch('teuthology.lock.query._http_get')
+        self.m_http_get = self.patcher.start()
+        self.m_http_get.return_value.ok = True
+
+    def teardown(self):
+        self.patcher.stop()
+        query.clear_status_cache()
+
+    def test_get_statuses_bulk(self):
+        self.m_http_get.return_value.json.return_value = self.nodes
+        statuses = query.get_statuses(['node3', 'ubuntu@node1'])
+        assert statuses == [self.nodes[2], self.nodes[0]]
+        assert self.m_http_get.call_count == 1
+        # Later lookups are answered from the cache
+        assert query.get_status('node2') == self.nodes[1]
+        assert query.is_vm('node1') is False
+        assert self.m_http_get.call_count == 1
+
+    def test_get_statuses_single(self):
+        self.m_http_get.return_value.json.return_value = self.nodes[0]
+        assert query.get_statuses(['node1']) == [self.nodes[0]]
+        assert self.m_http_get.call_args[0][0].endswith(
+            '/nodes/%s/' % self.names[0])
+
+    def test_get_statuses_unknown(self):
+        self.m_http_get.return_value.json.return_value = self.nodes[:1]
+        unknown = Mock(ok=False)
+        self.m_http_get.side_effect = [self.m_http_get.return_value, unknown]
+        assert query.get_statuses(['node1', 'node4']) == [self.nodes[0]]
+
+    def test_cache_expires(self):
+        self.m_http_get.return_value.json.return_value = self.nodes[0]
+        query.get_status('node1')
+        with patch.object(query, 'STATUS_CACHE_TTL', 0):
+            query.get_status('node1')
+        assert self.m_http_get.call_count == 2
+
+    @patch('teuthology.lock.ops.requests')
+    def test_update_clears_cache(self, m_requests):
+        self.m_http_get.return_value.json.return_value = self.nodes[0]
+        query.get_status('node1')
+        ops.update_lock('node1', status='down')
+        query.get_status('node1')
+        assert self.m_http_get.call_count == 2
+
+
+class TestFindStaleLocks(object):
+    def make_node(self, name, description, locked_by='user'):
+        return dict(name=name, locked=True, locked_by=locked_by,
+                    description=description)
+
+    @patch('teuthology.lock.query.ResultsReporter')
+    @patch('teuthology.lock.query.list_locks')
+    def test_find_stale_locks(self, m_list_locks, m_reporter):
+        m_list_locks.return_value = [
+            self.make_node('node1', '/archive/run1/1'),
+            self.make_node('node2', '/archive/run1/2'),
+            self.make_node('node3', '/archive/run1/2'),
+            self.make_node('node4', '/archive/run2/3'),
+            self.make_node('node5', '/archive/run3/4'),
+            self.make_node('node6', 'manually locked'),
+            self.make_node('node7', '/archive/run1/1', locked_by='other'),
+        ]
+        not_found = Exception()
+        not_found.response = Mock(status_code=404)
+
+        def get_jobs(run_name, fields=None):
+            if run_name == 'run1':
+                return [dict(job_id='1', status='running'),
+                        dict(job_id='2', status='dead')]
+            elif run_name == 'run2':
+                raise not_found
+            raise RuntimeError()
+
+        m_reporter.return_value.get_jobs.side_effect = get_jobs
+        stale = query.find_stale_locks(owner='user')
+        assert [node['name'] for node in stale] == ['node2', 'node3', 'node4']
+        # One request per run
+        assert m_reporter.return_value.get_jobs.call_count == 3
@@ -25,9 +25,10 @@ from teuthology import safepath
 from teuthology.exceptions import (CommandCrashedError, CommandFailedError,
                                    ConnectionLostError)
 from .orchestra import run
+from .parallel import parallel
 from .config import config
 from .contextutil import safe_while
-from .orchestra.opsys import DEFAULT_OS_VERSION
+from .orchestra.opsys import DEFAULT_OS_VERSION, OS
 
 log = logging.getLogger(__name__)
 
@@ -537,6 +538,65 @@ def sudo_write_file(remote, path, data, perms=None, owner=None):
     )
 
 
+def write_files(remote, files, sudo=False):
+    """
+    Write data to many remote files at once.
+
+    Without sudo, the files are written over the remote's SFTP session, so no
+    remote process is started at all. With sudo, a single remote command
+    writes every file and then applies any owners and permissions.
+
+    :param remote: Remote site.
+    :param files:  A list of tuples like (path, data) or
+                   (path, data, perms, owner). perms and owner may be None,
+                   and are passed directly to chmod and chown.
+    :param sudo:   Write the files as super user. Required for perms and
+                   owner to be used.
+    """
+    entries = list()
+    for entry in files:
+        (path, data, perms, owner) = (tuple(entry) + (None, None))[:4]
+        if not sudo and (perms is not None or owner is not None):
+            raise ValueError("To specify perms or owner, sudo must be True")
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        entries.append((path, data, perms, owner))
+    if not entries:
+        return
+    if not sudo:
+        with remote.sftp_session() as sftp:
+            for (path, data, _, _) in entries:
+                with sftp.open(path, 'wb') as f:
+                    f.set_pipelined(True)
+                    f.write(data)
+        return
+
+    # Each file's path and size are given as arguments, and the files'
+    # contents are concatenated on stdin
+    args = [
+        'sudo',
+        'python',
+        '-c',
+        'import sys\n'
+        'stdin = getattr(sys.stdin, "buffer", sys.stdin)\n'
+        'a = sys.argv[1:]\n'
+        'for i in range(0, len(a), 2):\n'
+        '    with open(a[i], "wb") as f:\n'
+        '        f.write(stdin.read(int(a[i + 1])))\n',
+    ]
+    for (path, data, _, _) in entries:
+        args.extend([path, str(len(data))])
+    for (path, _, perms, owner) in entries:
+        if owner:
+            args.extend([run.Raw('&&'), 'sudo', 'chown', owner, path])
+        if perms:
+            args.extend([run.Raw('&&'), 'sudo', 'chmod', perms, path])
+    remote.run(
+        args=args,
+        stdin=''.join(data for (_, data, _, _) in entries),
+    )
+
+
 def copy_file(from_remote, from_path, to_remote, to_path=None):
     """
     Copies a file from one remote to another.
@@ -746,16 +806,65 @@ def get_file(remote, path, sudo=False, dest_dir='/tmp'):
     return file_data
 
 
-def pull_directory(remote, remotedir, localdir):
+class RateLimiter(object):
+    """
+    Keeps the aggregate rate of some operation, like a transfer, at or below
+    a given number of bytes per second. One instance may be shared by many
+    greenlets.
+    """
+    def __init__(self, rate=None):
+        """
+        :param rate: Bytes per second; if None or zero, nothing is limited
+        """
+        self.rate = rate
+        self.start = time.time()
+        self.total = 0
+
+    def consume(self, size):
+        """
+        Account for size bytes, sleeping for as long as it takes to bring the
+        average rate back down to self.rate
+        """
+        self.total += size
+        if not self.rate:
+            return
+        delay = self.total / float(self.rate) - (time.time() - self.start)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _CountingReader(object):
+    """
+    Wraps a file-like object, counting the bytes read from it and optionally
+    throttling reads with a RateLimiter
+    """
+    def __init__(self, fileobj, rate_limiter=None):
+        self.fileobj = fileobj
+        self.rate_limiter = rate_limiter
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.bytes_read += len(data)
+        if self.rate_limiter is not None:
+            self.rate_limiter.consume(len(data))
+        return data
+
+
+def pull_directory(remote, remotedir, localdir, rate_limiter=None):
     """
     Copy a remote directory to a local directory.
+
+    :param rate_limiter: An optional RateLimiter to throttle the transfer with
+    :returns: The number of (compressed) bytes transferred
     """
     log.debug('Transferring archived files from %s:%s to %s',
               remote.shortname, remotedir, localdir)
     if not os.path.exists(localdir):
         os.mkdir(localdir)
     r = remote.get_tar_stream(remotedir, sudo=True)
-    tar = tarfile.open(mode='r|gz', fileobj=r.stdout)
+    reader = _CountingReader(r.stdout, rate_limiter)
+    tar = tarfile.open(mode='r|gz', fileobj=reader)
     while True:
         ti = tar.next()
         if ti is None:
@@ -779,6 +888,7 @@ def pull_directory(remote, remotedir, localdir):
             else:
                 type_ = 'unknown'
             log.info('Ignoring tar entry: %r type %r', ti.name, type_)
+    return reader.bytes_read
 
 
 def pull_directory_tarball(remote, remotedir, localfile):
@@ -967,6 +1077,11 @@ def reboot(node, timeout=300, interval=30):
             host=node.hostname, time=timeout))
 
 
+# The longest time, in seconds, to wait between attempts to reconnect to a
+# remote
+RECONNECT_MAX_DELAY = 16
+
+
 def reconnect(ctx, timeout, remotes=None):
     """
     Connect to all the machines in ctx.cluster.
@@ -980,29 +1095,51 @@ def reconnect(ctx, timeout, remotes=None):
     holding the ssh keys for each of them. As long as it
     contains this data, you can construct a context
     that is a subset of your full cluster.
+
+    Every remote is tried at once, each backing off exponentially (up to
+    RECONNECT_MAX_DELAY seconds) between its own failed attempts, so a slow
+    host doesn't hold up the others.
+
+    :returns: A dict mapping each remote's name to the number of seconds it
+              took to reconnect to it. This is also recorded in ctx.timer, if
+              there is one.
     """
     log.info('Re-opening connections...')
     starttime = time.time()
 
     if remotes:
-        need_reconnect = remotes
+        need_reconnect = list(remotes)
     else:
         need_reconnect = ctx.cluster.remotes.keys()
+    downtime = dict()
 
-    while need_reconnect:
-        for remote in need_reconnect:
+    def reconnect_one(remote):
+        delay = 1
+        while True:
             log.info('trying to connect to %s', remote.name)
-            success = remote.reconnect()
-            if not success:
-                if time.time() - starttime > timeout:
-                    raise RuntimeError("Could not reconnect to %s" %
-                                       remote.name)
-            else:
-                need_reconnect.remove(remote)
+            if remote.reconnect():
+                downtime[remote.name] = round(time.time() - starttime, 3)
+                log.debug('reconnected to {name} after {elapsed}s'.format(
+                    name=remote.name, elapsed=downtime[remote.name]))
+                return
+            elapsed = time.time() - starttime
+            if elapsed > timeout:
+                raise RuntimeError("Could not reconnect to %s" %
+                                   remote.name)
+            time.sleep(min(delay, timeout - elapsed))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    with parallel() as p:
+        for remote in need_reconnect:
+            p.spawn(reconnect_one, remote)
 
-        log.debug('waited {elapsed}'.format(
-            elapsed=str(time.time() - starttime)))
-        time.sleep(1)
+    timer = getattr(ctx, 'timer', None)
+    if timer is not None:
+        history = timer.extra.get('reconnect_downtime', dict())
+        for (name, seconds) in downtime.iteritems():
+            history.setdefault(name, list()).append(seconds)
+        timer.record('reconnect_downtime', history)
+    return downtime
 
 
 def get_clients(ctx, roles):
@@ -1142,18 +1279,19 @@ def ssh_keyscan(hostnames, _raise=True):
     hostnames = [canonicalize_hostname(name, user=None) for name in
                  hostnames]
     keys_dict = dict()
-    for hostname in hostnames:
-        with safe_while(
-            sleep=1,
-            tries=5 if _raise else 1,
-            _raise=_raise,
-            action="ssh_keyscan " + hostname,
-        ) as proceed:
-            while proceed():
-                key = _ssh_keyscan(hostname)
-                if key:
-                    keys_dict[hostname] = key
-                    break
+    missing = list(hostnames)
+    # Scan every host at once, then retry just the ones that didn't answer,
+    # backing off a little more each time
+    with safe_while(
+        sleep=1,
+        increment=1,
+        tries=5 if _raise else 1,
+        _raise=_raise,
+        action="ssh_keyscan " + ' '.join(hostnames),
+    ) as proceed:
+        while missing and proceed():
+            keys_dict.update(_ssh_keyscan(missing))
+            missing = [name for name in hostnames if name not in keys_dict]
     if len(keys_dict) != len(hostnames):
         missing = set(hostnames) - set(keys_dict.keys())
         msg = "Unable to scan these host keys: %s" % ' '.join(missing)
@@ -1164,27 +1302,35 @@ def ssh_keyscan(hostnames, _raise=True):
     return keys_dict
 
 
-def _ssh_keyscan(hostname):
+def _ssh_keyscan(hostnames):
     """
-    Fetch the SSH public key of one or more hosts
+    Fetch the SSH public keys of one or more hosts, using a single
+    ssh-keyscan process that probes them all in parallel
 
-    :param hostname: The hostname
-    :returns: The host key
+    :param hostnames: A list of hostnames
+    :returns: A dict keyed by hostname, with the host keys as values. Hosts
+              that could not be scanned are omitted.
     """
-    args = ['ssh-keyscan', '-T', '1', '-t', 'rsa', hostname]
+    args = ['ssh-keyscan', '-T', '1', '-t', 'rsa'] + list(hostnames)
     p = subprocess.Popen(
         args=args,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
     )
-    p.wait()
-    for line in p.stderr.readlines():
+    (stdout, stderr) = p.communicate()
+    for line in stderr.splitlines():
         line = line.strip()
         if line and not line.startswith('#'):
             log.error(line)
-    for line in p.stdout.readlines():
-        host, key = line.strip().split(' ', 1)
-        return key
+    keys_dict = dict()
+    for line in stdout.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        host, key = line.split(' ', 1)
+        if host in hostnames and host not in keys_dict:
+            keys_dict[host] = key
+    return keys_dict
 
 
 def ssh_keyscan_wait(hostname):
@@ -1229,18 +1375,20 @@ def get_system_type(remote, distro=False, version=False):
     If both, return both.
     If neither, return 'deb' or 'rpm' if distro is known to be one of those
     Finally, if unknown, return the unfiltered distro (from lsb_release -is)
+
+    The values come from the remote's cached facts rather than from running
+    lsb_release each time. If they are missing, e.g. because lsb_release is
+    not installed, RuntimeError is raised.
     """
-    r = remote.run(
-        args=[
-            'sudo', 'lsb_release', '-is',
-        ],
-        stdout=StringIO(),
-    )
-    system_value = r.stdout.getvalue().strip()
+    lsb_release = remote.facts['lsb_release']
+    system_value = OS.get_value(lsb_release, 'Distributor ID')
+    if not system_value:
+        raise RuntimeError(
+            "Could not determine the distro of %s: lsb_release -a gave no "
+            "Distributor ID" % remote.shortname)
     log.debug("System to be installed: %s" % system_value)
     if version:
-        v = remote.run(args=['sudo', 'lsb_release', '-rs'], stdout=StringIO())
-        version = v.stdout.getvalue().strip()
+        version = OS.get_value(lsb_release, 'Release')
     if distro and version:
         return system_value.lower(), version
     if distro:
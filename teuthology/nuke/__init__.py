@@ -11,7 +11,7 @@ import teuthology
 from teuthology import provision
 from teuthology.lock.ops import unlock_one
 from teuthology.lock.query import is_vm, list_locks, \
-    find_stale_locks, get_status
+    find_stale_locks, get_status, get_statuses
 from teuthology.lock.util import locked_since_seconds
 from .actions import (
     check_console, clear_firewall, shutdown_daemons, remove_installed_packages,
@@ -52,9 +52,13 @@ OPENSTACK_DELAY = 30 * 60
 
 
 def stale_openstack_instances(ctx, instances, locked_nodes):
+    found = OpenStack.show_instances(instances.keys())
     for (instance_id, instance) in instances.iteritems():
-        i = OpenStackInstance(instance_id)
-        if not i.exists():
+        if found is None:
+            i = OpenStackInstance(instance_id)
+        else:
+            i = found.get(instance_id)
+        if i is None or not i.exists():
             log.debug("stale-openstack: {instance} disappeared, ignored"
                       .format(instance=instance_id))
             continue
@@ -94,13 +98,15 @@ def stale_openstack_volumes(ctx, volumes):
     now = datetime.datetime.now()
     for volume in volumes:
         volume_id = volume.get('ID') or volume['id']
-        try:
-            volume = json.loads(OpenStack().run("volume show -f json " +
-                                                volume_id))
-        except subprocess.CalledProcessError:
-            log.debug("stale-openstack: {id} disappeared, ignored"
-                      .format(id=volume_id))
-            continue
+        # Volumes listed through the API client already carry created_at
+        if 'created_at' not in volume:
+            try:
+                volume = json.loads(OpenStack().run("volume show -f json " +
+                                                    volume_id))
+            except subprocess.CalledProcessError:
+                log.debug("stale-openstack: {id} disappeared, ignored"
+                          .format(id=volume_id))
+                continue
         volume_name = (volume.get('Display Name') or volume.get('display_name')
                        or volume['name'])
         enforce_json_dictionary(volume)
@@ -229,6 +235,9 @@ def nuke(ctx, should_unlock, sync_clocks=True, reboot_all=True, noipmi=False):
         return
     total_unnuked = {}
     targets = dict(ctx.config['targets'])
+    # Fetch every target's status at once; the per-target lock checks below
+    # are then answered from query's cache
+    get_statuses(targets.keys())
     if ctx.name:
         log.info('Checking targets against current locks')
         locks = list_locks()
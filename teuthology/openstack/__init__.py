@@ -42,6 +42,8 @@ from teuthology.config import config as teuth_config
 from teuthology.config import set_config_attr
 from teuthology.orchestra import connection
 from teuthology import misc
+from teuthology.openstack import api
+from teuthology.parallel import parallel
 
 log = logging.getLogger(__name__)
 
@@ -65,6 +67,14 @@ class OpenStackInstance(object):
             self.info = dict(map(lambda (k,v): (k.lower(), v), info.iteritems()))
 
     def set_info(self):
+        client = api.get_client()
+        if client is not None:
+            server = client.server(self.name_or_id)
+            if server is None:
+                self.info = None
+            else:
+                self.info = api.server_show_format(server)
+            return
         try:
             self.info = json.loads(
                 OpenStack().run("server show -f json " + self.name_or_id))
@@ -313,6 +323,9 @@ class OpenStack(object):
         """
         Return true if the image exists in OpenStack.
         """
+        client = api.get_client()
+        if client is not None:
+            return len(client.images(self.image_name(image))) > 0
         found = self.run("image list -f json --property name='" +
                         self.image_name(image) + "'")
         return len(json.loads(found)) > 0
@@ -321,6 +334,12 @@ class OpenStack(object):
         """
         Return the uuid of the network in OpenStack.
         """
+        client = api.get_client()
+        if client is not None:
+            r = client.network(network)
+            if r is None:
+                raise ValueError("no network " + network)
+            return r['id']
         r = json.loads(self.run("network show -f json " +
                                network))
         return self.get_value(r, 'id')
@@ -369,8 +388,13 @@ class OpenStack(object):
         """
         Return the smallest flavor that satisfies the desired size.
         """
-        flavors_string = self.run("flavor list -f json")
-        flavors = json.loads(flavors_string)
+        client = api.get_client()
+        if client is not None:
+            flavors = map(api.flavor_list_format, client.flavors())
+            flavors_string = json.dumps(flavors)
+        else:
+            flavors_string = self.run("flavor list -f json")
+            flavors = json.loads(flavors_string)
         found = []
         for flavor in flavors:
             if select and not re.match(select, flavor['Name']):
@@ -414,14 +438,46 @@ class OpenStack(object):
     @staticmethod
     def list_instances():
         ownedby = "ownedby='" + teuth_config.openstack['ip'] + "'"
-        all = json.loads(OpenStack().run(
-            "server list -f json --long --name 'target'"))
+        client = api.get_client()
+        if client is not None:
+            all = map(api.server_list_format,
+                      client.servers(pattern='target'))
+        else:
+            all = json.loads(OpenStack().run(
+                "server list -f json --long --name 'target'"))
         return filter(lambda instance: ownedby in instance['Properties'], all)
 
+    @staticmethod
+    def show_instances(ids):
+        """
+        Get the details of many instances with a single request, instead of
+        one 'openstack server show' per instance.
+
+        :param ids: The ids of the instances, as found by list_instances()
+        :returns: A dict mapping the id of each instance that still exists
+                  to its OpenStackInstance, or None if the API client is not
+                  available, in which case each OpenStackInstance must be
+                  created separately
+        """
+        client = api.get_client()
+        if client is None:
+            return None
+        ids = set(ids)
+        return dict(
+            (server['id'], OpenStackInstance(
+                server['id'], api.server_show_format(server)))
+            for server in client.servers(pattern='target')
+            if server['id'] in ids
+        )
+
     @staticmethod
     def list_volumes():
         ownedby = "ownedby='" + teuth_config.openstack['ip'] + "'"
-        all = json.loads(OpenStack().run("volume list -f json --long"))
+        client = api.get_client()
+        if client is not None:
+            all = map(api.volume_list_format, client.volumes())
+        else:
+            all = json.loads(OpenStack().run("volume list -f json --long"))
         def select(volume):
             return (ownedby in volume['Properties'] and
                     volume['Display Name'].startswith('target'))
@@ -485,7 +541,7 @@ class OpenStack(object):
                     output = channel.makefile('r', 1)
                     channel.exec_command(tail)
                     for line in iter(output.readline, b''):
-                        log.info(line.strip())
+                        log.info(ip + ': ' + line.strip())
                         if self.up_string in line:
                             success = True
                             break
@@ -502,6 +558,39 @@ class OpenStack(object):
                     break
             return success
 
+    def cloud_init_wait_many(self, instances, start=None):
+        """
+        Wait for cloud-init to complete on all the instances at once,
+        instead of one after the other.
+
+        :param instances: A list of OpenStackInstance
+        :param start:     The time.time() to measure from, by default now
+        :returns: A generator of (instance, success, seconds) tuples, one per
+                  instance, in the order in which they finish. seconds is
+                  the time from start until the instance was done, whatever
+                  the caller does between iterations. If the caller stops
+                  iterating or a wait fails, the remaining instances are no
+                  longer waited for.
+        """
+        if start is None:
+            start = time.time()
+
+        def wait(instance):
+            success = self.cloud_init_wait(instance)
+            return (instance, success, time.time() - start)
+
+        with parallel() as p:
+            for instance in instances:
+                p.spawn(wait, instance)
+            try:
+                for result in p:
+                    yield result
+            except BaseException:
+                # The caller stopped iterating or a wait failed: do not keep
+                # waiting for the other instances
+                p.group.kill()
+                raise
+
     def get_ip(self, instance_id, network):
         return OpenStackInstance(instance_id).get_ip(network)
 
@@ -0,0 +1,482 @@
+"""
+An in-process client for the OpenStack REST APIs.
+
+teuthology.openstack.OpenStack.run() starts the openstack CLI for every
+call, which costs a Python interpreter startup and a Keystone
+authentication each time. The read-only lookups teuthology makes most often
+(servers, volumes, images, flavors and networks) go through this client
+instead when the OS_* credentials are available: it authenticates once,
+keeps the token and its HTTP connections for the life of the process, and
+caches the lookups whose answers do not change while teuthology runs.
+
+The client returns dicts shaped like the JSON output of the matching
+openstack CLI command, so callers can use either.
+"""
+import logging
+import os
+import re
+import time
+
+import requests
+
+from teuthology.config import config
+
+log = logging.getLogger(__name__)
+
+# How long, in seconds, flavor, image and network lookups are reused
+CACHE_TTL = 300
+
+UUID_RE = re.compile(
+    '^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$')
+
+_client = None
+
+
+class OpenStackAPIError(Exception):
+    def __init__(self, method, url, status, body):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.body = body
+
+    def __str__(self):
+        return "{method} {url} failed with {status}: {body}".format(
+            method=self.method, url=self.url, status=self.status,
+            body=self.body)
+
+
+class OpenStackAPI(object):
+    """
+    A Keystone-authenticated session on the compute, volume, image and
+    network services of one OpenStack region.
+
+    :param auth_url:    The Keystone URL, i.e. OS_AUTH_URL
+    :param username:    The user name, i.e. OS_USERNAME
+    :param password:    The password, i.e. OS_PASSWORD
+    :param project:     The project (or tenant) name
+    :param project_id:  The project (or tenant) id, used if project is None
+    :param region:      The region whose endpoints are used. If None, the
+                        first endpoint of each service is used.
+    :param user_domain: The user domain name, for Keystone v3
+    :param project_domain: The project domain name, for Keystone v3
+    :param identity_api_version: '2' or '3'. If None, it is guessed from
+                                 auth_url.
+    """
+    def __init__(self, auth_url, username, password, project=None,
+                 project_id=None, region=None, user_domain='Default',
+                 project_domain='Default', identity_api_version=None):
+        self.auth_url = auth_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.project = project
+        self.project_id = project_id
+        self.region = region
+        self.user_domain = user_domain
+        self.project_domain = project_domain
+        if identity_api_version is None:
+            identity_api_version = (
+                '3' if self.auth_url.endswith('/v3') else '2')
+        self.identity_api_version = str(identity_api_version).split('.')[0]
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=16)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.token = None
+        self.endpoints = dict()
+        # Maps a lookup key to a (time, value) tuple
+        self._cache = dict()
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        """
+        Build a client from the OS_* variables the openstack CLI reads.
+
+        :returns: An OpenStackAPI, or None if the environment does not
+                  hold a password-based set of credentials
+        """
+        environ = os.environ if environ is None else environ
+        needed = ('OS_AUTH_URL', 'OS_USERNAME', 'OS_PASSWORD')
+        if not all(environ.get(name) for name in needed):
+            return None
+        return cls(
+            auth_url=environ['OS_AUTH_URL'],
+            username=environ['OS_USERNAME'],
+            password=environ['OS_PASSWORD'],
+            project=(environ.get('OS_PROJECT_NAME') or
+                     environ.get('OS_TENANT_NAME')),
+            project_id=(environ.get('OS_PROJECT_ID') or
+                        environ.get('OS_TENANT_ID')),
+            region=environ.get('OS_REGION_NAME'),
+            user_domain=(environ.get('OS_USER_DOMAIN_NAME') or
+                         environ.get('OS_DOMAIN_NAME') or 'Default'),
+            project_domain=(environ.get('OS_PROJECT_DOMAIN_NAME') or
+                            environ.get('OS_DOMAIN_NAME') or 'Default'),
+            identity_api_version=environ.get('OS_IDENTITY_API_VERSION'),
+        )
+
+    def authenticate(self):
+        """
+        Get a token and the service catalog from Keystone
+        """
+        if self.identity_api_version == '3':
+            self._authenticate_v3()
+        else:
+            self._authenticate_v2()
+        log.debug("Authenticated with %s, endpoints: %s", self.auth_url,
+                  self.endpoints)
+
+    def _authenticate_v2(self):
+        auth = {
+            'passwordCredentials': {
+                'username': self.username,
+                'password': self.password,
+            },
+        }
+        if self.project:
+            auth['tenantName'] = self.project
+        elif self.project_id:
+            auth['tenantId'] = self.project_id
+        url = self.auth_url + '/tokens'
+        response = self.session.post(url, json={'auth': auth})
+        if not response.ok:
+            raise OpenStackAPIError('POST', url, response.status_code,
+                                    response.text)
+        access = response.json()['access']
+        self.token = access['token']['id']
+        endpoints = dict()
+        for service in access.get('serviceCatalog', []):
+            for endpoint in service['endpoints']:
+                if self.region and endpoint.get('region') != self.region:
+                    continue
+                endpoints.setdefault(service['type'], endpoint['publicURL'])
+        self.endpoints = endpoints
+
+    def _authenticate_v3(self):
+        if self.project:
+            project = {
+                'name': self.project,
+                'domain': {'name': self.project_domain},
+            }
+        else:
+            project = {'id': self.project_id}
+        auth = {
+            'identity': {
+                'methods': ['password'],
+                'password': {
+                    'user': {
+                        'name': self.username,
+                        'domain': {'name': self.user_domain},
+                        'password': self.password,
+                    },
+                },
+            },
+            'scope': {'project': project},
+        }
+        url = self.auth_url + '/auth/tokens'
+        response = self.session.post(url, json={'auth': auth})
+        if not response.ok:
+            raise OpenStackAPIError('POST', url, response.status_code,
+                                    response.text)
+        self.token = response.headers['X-Subject-Token']
+        endpoints = dict()
+        for service in response.json()['token'].get('catalog', []):
+            for endpoint in service['endpoints']:
+                if endpoint.get('interface') != 'public':
+                    continue
+                region = endpoint.get('region_id') or endpoint.get('region')
+                if self.region and region != self.region:
+                    continue
+                endpoints.setdefault(service['type'], endpoint['url'])
+        self.endpoints = endpoints
+
+    def endpoint(self, service):
+        """
+        :param service: 'compute', 'volume', 'image' or 'network'
+        :returns: The base URL of the service's API, without a trailing
+                  slash
+        """
+        if self.token is None:
+            self.authenticate()
+        if service == 'volume':
+            types = ('volumev2', 'volume')
+        else:
+            types = (service,)
+        for type in types:
+            if type in self.endpoints:
+                url = self.endpoints[type].rstrip('/')
+                break
+        else:
+            raise KeyError("no {service} endpoint in the service catalog"
+                           .format(service=service))
+        # The image and network catalog entries do not carry the API version
+        if service == 'image' and not re.search('/v\d+(\.\d+)?$', url):
+            url += '/v2'
+        elif service == 'network' and not re.search('/v\d+(\.\d+)?$', url):
+            url += '/v2.0'
+        return url
+
+    def get(self, service, path, params=None):
+        """
+        GET a path relative to a service's endpoint, authenticating again
+        once if the token was rejected.
+
+        :returns: The decoded JSON body, or None if the resource does not
+                  exist
+        """
+        for attempt in (1, 2):
+            url = self.endpoint(service) + path
+            response = self.session.get(
+                url, params=params, headers={'X-Auth-Token': self.token})
+            if response.status_code == 401 and attempt == 1:
+                log.debug("Token rejected by %s, authenticating again", url)
+                self.authenticate()
+                continue
+            break
+        if response.status_code == 404:
+            return None
+        if not response.ok:
+            raise OpenStackAPIError('GET', url, response.status_code,
+                                    response.text)
+        return response.json()
+
+    def get_all(self, service, path, key, params=None):
+        """
+        GET every page of a paginated list. The compute and volume APIs
+        return at most osapi_max_limit items per request, with a 'next'
+        link in <key>_links when there are more.
+
+        :param key: The key of the list in the response, e.g. 'servers'
+        :returns: The concatenated list
+        """
+        params = dict(params or {})
+        items = list()
+        while True:
+            page = self.get(service, path, params)
+            if page is None:
+                return items
+            items.extend(page[key])
+            links = page.get(key + '_links', [])
+            if not (page[key] and
+                    any(link.get('rel') == 'next' for link in links)):
+                return items
+            params['marker'] = page[key][-1]['id']
+
+    def _cached(self, key, fetch):
+        cached = self._cache.get(key)
+        if cached is not None and time.time() - cached[0] < CACHE_TTL:
+            return cached[1]
+        value = fetch()
+        # Only remember what was found: a missing image may be uploaded
+        # in the meantime
+        if value:
+            self._cache[key] = (time.time(), value)
+        return value
+
+    def clear_cache(self):
+        """
+        Forget every cached flavor, image and network lookup
+        """
+        self._cache.clear()
+
+    def servers(self, name=None, pattern=None):
+        """
+        List the servers of the project, with all their details, in as few
+        requests as the API allows.
+
+        :param name:    If not None, only list the servers with this exact
+                        name
+        :param pattern: If not None, only list the servers whose name
+                        matches this regular expression, like
+                        'openstack server list --name' does
+        :returns: A list of server dicts as returned by the compute API
+        """
+        params = None
+        if name is not None:
+            params = {'name': '^' + re.escape(name) + '$'}
+        elif pattern is not None:
+            params = {'name': pattern}
+        servers = self.get_all('compute', '/servers/detail', 'servers',
+                               params)
+        if name is not None:
+            servers = [s for s in servers if s['name'] == name]
+        elif pattern is not None:
+            servers = [s for s in servers if re.search(pattern, s['name'])]
+        return servers
+
+    def server(self, name_or_id):
+        """
+        :returns: The server dict as returned by the compute API, or None if
+                  there is no such server
+        """
+        if UUID_RE.match(name_or_id):
+            found = self.get('compute', '/servers/' + name_or_id)
+            if found is not None:
+                return found['server']
+        servers = self.servers(name=name_or_id)
+        if len(servers) > 1:
+            raise ValueError("More than one server exists with the name " +
+                             name_or_id)
+        return servers[0] if servers else None
+
+    def volumes(self):
+        """
+        List the volumes of the project, with all their details, in as few
+        requests as the API allows.
+        """
+        return self.get_all('volume', '/volumes/detail', 'volumes')
+
+    def flavors(self):
+        return self._cached(
+            'flavors',
+            lambda: self.get_all('compute', '/flavors/detail', 'flavors'))
+
+    def images(self, name):
+        """
+        :returns: The images with the given name
+        """
+        def fetch():
+            found = self.get('image', '/images', {'name': name})
+            return found['images'] if found is not None else []
+        return self._cached(('images', name), fetch)
+
+    def network(self, name_or_id):
+        """
+        :returns: The network dict as returned by the network API, or None
+                  if there is no such network
+        """
+        def fetch():
+            if UUID_RE.match(name_or_id):
+                found = self.get('network', '/networks/' + name_or_id)
+                if found is not None:
+                    return found['network']
+            found = self.get('network', '/networks', {'name': name_or_id})
+            if found is None or not found['networks']:
+                return None
+            return found['networks'][0]
+        return self._cached(('network', name_or_id), fetch)
+
+
+def format_addresses(server):
+    """
+    :returns: The addresses of a server, formatted like the openstack CLI
+              does, e.g. 'net1=10.0.0.3, 1.2.3.4; net2=192.168.0.2'
+    """
+    return '; '.join(
+        network + '=' + ', '.join(address['addr'] for address in addresses)
+        for (network, addresses) in sorted(server['addresses'].items())
+    )
+
+
+def format_properties(resource):
+    """
+    :returns: The metadata of a server or volume, formatted like the
+              openstack CLI does, e.g. "ownedby='1.2.3.4', teuthology='x'"
+    """
+    return ', '.join(
+        "%s='%s'" % (key, value)
+        for (key, value) in sorted(resource.get('metadata', {}).items())
+    )
+
+
+def server_show_format(server):
+    """
+    :returns: A dict like the one printed by 'openstack server show -f json'
+    """
+    info = dict(server)
+    info['addresses'] = format_addresses(server)
+    info['properties'] = format_properties(server)
+    info['flavor'] = server.get('flavor', {}).get('id')
+    image = server.get('image')
+    info['image'] = image.get('id') if image else ''
+    info.setdefault('os-extended-volumes:volumes_attached', [])
+    return info
+
+
+def server_list_format(server):
+    """
+    :returns: A dict like the ones printed by
+              'openstack server list -f json --long'
+    """
+    image = server.get('image')
+    return {
+        'ID': server['id'],
+        'Name': server['name'],
+        'Status': server['status'],
+        'Networks': format_addresses(server),
+        'Image ID': image.get('id') if image else '',
+        'Flavor ID': server.get('flavor', {}).get('id'),
+        'Properties': format_properties(server),
+    }
+
+
+def volume_list_format(volume):
+    """
+    :returns: A dict like the ones printed by
+              'openstack volume list -f json --long', with the volume's
+              created_at time as well
+    """
+    return {
+        'ID': volume['id'],
+        'Display Name': volume.get('name') or volume.get('display_name'),
+        'Status': volume['status'],
+        'Size': volume['size'],
+        'Attached to': ', '.join(
+            attachment['server_id']
+            for attachment in volume.get('attachments', [])),
+        'Properties': format_properties(volume),
+        'created_at': volume['created_at'],
+    }
+
+
+def flavor_list_format(flavor):
+    """
+    :returns: A dict like the ones printed by 'openstack flavor list -f json'
+    """
+    return {
+        'ID': flavor['id'],
+        'Name': flavor['name'],
+        'RAM': flavor['ram'],
+        'Disk': flavor['disk'],
+        'VCPUs': flavor['vcpus'],
+    }
+
+
+def get_client():
+    """
+    Get the process-wide API client, authenticating on first use.
+
+    :returns: An OpenStackAPI, or None if it is disabled with the
+              openstack.api configuration option, the environment lacks the
+              credentials or authentication fails. Callers then fall back
+              to the openstack CLI.
+    """
+    global _client
+    if _client is False:
+        return None
+    if _client is None:
+        if not (config.openstack or {}).get('api', True):
+            return None
+        client = OpenStackAPI.from_environment()
+        if client is None:
+            return None
+        try:
+            client.authenticate()
+        except (OpenStackAPIError, requests.RequestException, KeyError,
+                ValueError):
+            log.warning("Could not authenticate with %s, using the "
+                        "openstack CLI instead", client.auth_url,
+                        exc_info=True)
+            # Do not try again for every lookup
+            _client = False
+            return None
+        _client = client
+    return _client
+
+
+def reset_client():
+    """
+    Forget the process-wide API client, so that the next get_client() call
+    reads the environment and authenticates again
+    """
+    global _client
+    _client = None
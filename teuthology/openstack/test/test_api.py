@@ -0,0 +1,311 @@
+import BaseHTTPServer
+import json
+import threading
+import urlparse
+
+from mock import patch
+
+from teuthology.config import config
+from teuthology.openstack import api, OpenStack, OpenStackInstance
+
+
+SERVER_ID = 'f3ca32d7-212b-458b-a0d4-57d1085af953'
+
+
+class FakeOpenStack(BaseHTTPServer.HTTPServer):
+    """
+    A Keystone v2, compute, volume, image and network API server that
+    answers from canned data and records the requests it gets
+    """
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', 0), FakeOpenStackHandler)
+        self.url = 'http://127.0.0.1:%d' % self.server_port
+        self.requests = []
+        self.tokens = 0
+        # Lists are paginated like osapi_max_limit does
+        self.page_size = 1000
+        # Endpoints can be moved somewhere that answers 404 to everything
+        self.catalog_paths = dict()
+        self.servers = [
+            {
+                'id': SERVER_ID,
+                'name': 'target167114233032',
+                'status': 'ACTIVE',
+                'created': '2015-08-17T12:21:31Z',
+                'addresses': {
+                    'Ext-Net': [{'addr': '167.114.233.32', 'version': 4}],
+                },
+                'metadata': {'ownedby': '1.1.1.1'},
+                'flavor': {'id': 'F1'},
+                'image': {'id': 'I1'},
+                'os-extended-volumes:volumes_attached': [{'id': 'V1'}],
+            },
+            {
+                'id': '17e4a968-4caa-4cee-8e4b-f950683a02bd',
+                'name': 'other',
+                'status': 'ACTIVE',
+                'created': '2015-08-17T12:21:31Z',
+                'addresses': {},
+                'metadata': {},
+                'flavor': {'id': 'F1'},
+                'image': '',
+            },
+        ]
+
+    def token(self):
+        return 'TOKEN%d' % self.tokens
+
+    def catalog(self):
+        def service(type, path):
+            return {
+                'type': type,
+                'endpoints': [
+                    {'region': 'OTHER', 'publicURL': 'http://invalid/'},
+                    {'region': 'REGION', 'publicURL': self.url + path},
+                ],
+            }
+        paths = dict(image='/image', network='/network/')
+        paths.update(self.catalog_paths)
+        return [
+            service('compute', '/compute/v2/TENANT'),
+            service('volumev2', '/volume/v2/TENANT'),
+            service('image', paths['image']),
+            service('network', paths['network']),
+        ]
+
+    def page(self, key, items, query):
+        if 'marker' in query:
+            ids = [item['id'] for item in items]
+            items = items[ids.index(query['marker'][0]) + 1:]
+        answer = {key: items[:self.page_size]}
+        if len(items) > self.page_size:
+            answer[key + '_links'] = [
+                {'rel': 'next', 'href': 'http://invalid/?marker=x'},
+            ]
+        return answer
+
+    def answer(self, method, path, query, body):
+        self.requests.append((method, path))
+        if method == 'POST' and path == '/identity/v2.0/tokens':
+            credentials = body['auth']['passwordCredentials']
+            if credentials['password'] != 'PASSWORD':
+                return 401, {}
+            self.tokens += 1
+            return 200, {'access': {
+                'token': {'id': self.token()},
+                'serviceCatalog': self.catalog(),
+            }}
+        if path == '/compute/v2/TENANT/servers/detail':
+            servers = self.servers
+            if 'name' in query:
+                servers = [s for s in servers
+                           if query['name'][0].strip('^$') in s['name']]
+            return 200, self.page('servers', servers, query)
+        if path.startswith('/compute/v2/TENANT/servers/'):
+            for server in self.servers:
+                if path.endswith('/' + server['id']):
+                    return 200, {'server': server}
+            return 404, {}
+        if path == '/compute/v2/TENANT/flavors/detail':
+            return 200, self.page('flavors', [
+                {'id': 'F1', 'name': 'big', 'ram': 16000, 'disk': 80,
+                 'vcpus': 4},
+                {'id': 'F2', 'name': 'small', 'ram': 8000, 'disk': 40,
+                 'vcpus': 1},
+            ], query)
+        if path == '/volume/v2/TENANT/volumes/detail':
+            return 200, self.page('volumes', [
+                {'id': 'V1', 'name': 'target167114233032-0',
+                 'status': 'in-use', 'size': 10,
+                 'created_at': '2015-09-17T19:46:59.000000',
+                 'attachments': [{'server_id': SERVER_ID}],
+                 'metadata': {'ownedby': '1.1.1.1'}},
+                {'id': 'V2', 'name': 'other-0',
+                 'status': 'available', 'size': 10,
+                 'created_at': '2015-09-17T19:46:59.000000',
+                 'metadata': {}},
+            ], query)
+        if path == '/image/v2/images':
+            images = []
+            if query['name'][0] == 'teuthology-ubuntu-14.04':
+                images.append({'id': 'I1', 'name': query['name'][0]})
+            return 200, {'images': images}
+        if path == '/network/v2.0/networks':
+            return 200, {'networks': [
+                {'id': 'N1', 'name': query['name'][0]},
+            ]}
+        return 404, {}
+
+
+class FakeOpenStackHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def handle_request(self, method):
+        url = urlparse.urlparse(self.path)
+        body = None
+        if method == 'POST':
+            length = int(self.headers['Content-Length'])
+            body = json.loads(self.rfile.read(length))
+        elif (self.headers.get('X-Auth-Token') !=
+              self.server.token()):
+            self.server.requests.append((method, url.path))
+            self.send_response(401)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        status, answer = self.server.answer(
+            method, url.path, urlparse.parse_qs(url.query), body)
+        answer = json.dumps(answer)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOpenStackAPI(object):
+
+    def setup(self):
+        self.server = FakeOpenStack()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.environ = {
+            'OS_AUTH_URL': self.server.url + '/identity/v2.0',
+            'OS_USERNAME': 'USER',
+            'OS_PASSWORD': 'PASSWORD',
+            'OS_TENANT_NAME': 'TENANT',
+            'OS_REGION_NAME': 'REGION',
+        }
+        self.patcher = patch.dict('os.environ', self.environ)
+        self.patcher.start()
+        api.reset_client()
+
+    def teardown(self):
+        api.reset_client()
+        self.patcher.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def requests_for(self, path):
+        return [r for r in self.server.requests if r[1].endswith(path)]
+
+    def test_from_environment(self):
+        assert api.OpenStackAPI.from_environment({}) is None
+        client = api.OpenStackAPI.from_environment(self.environ)
+        assert client.identity_api_version == '2'
+        assert client.project == 'TENANT'
+        assert client.region == 'REGION'
+
+    def test_authenticates_once(self):
+        client = api.get_client()
+        assert client.endpoint('compute') == (
+            self.server.url + '/compute/v2/TENANT')
+        assert client.endpoint('image') == self.server.url + '/image/v2'
+        assert client.endpoint('network') == self.server.url + '/network/v2.0'
+        OpenStack.list_instances()
+        OpenStack.list_volumes()
+        assert api.get_client() is client
+        assert self.server.tokens == 1
+
+    def test_authenticates_again_when_token_rejected(self):
+        client = api.get_client()
+        client.token = 'EXPIRED'
+        assert len(client.servers()) == 2
+        assert self.server.tokens == 2
+
+    def test_authentication_failure(self):
+        with patch.dict('os.environ', {'OS_PASSWORD': 'WRONG'}):
+            assert api.get_client() is None
+        # The failure is remembered rather than retried for every lookup
+        assert api.get_client() is None
+        assert len(self.requests_for('/tokens')) == 1
+
+    def test_disabled(self):
+        with patch.dict(config.openstack, {'api': False}):
+            assert api.get_client() is None
+        assert self.server.requests == []
+
+    def test_set_info(self):
+        o = OpenStackInstance(SERVER_ID)
+        assert o['name'] == 'target167114233032'
+        assert o['addresses'] == 'Ext-Net=167.114.233.32'
+        assert o['properties'] == "ownedby='1.1.1.1'"
+        assert o.get_volumes() == ['V1']
+        assert o.get_created() > 0
+        o = OpenStackInstance('target167114233032')
+        assert o['id'] == SERVER_ID
+        assert not OpenStackInstance('missing').exists()
+        assert not OpenStackInstance(
+            '915504ad-368b-4cce-be7c-4f8a83902e28').exists()
+
+    def test_pagination(self):
+        self.server.page_size = 1
+        client = api.get_client()
+        assert len(client.servers()) == 2
+        assert len(self.requests_for('/servers/detail')) == 2
+        assert [v['id'] for v in client.volumes()] == ['V1', 'V2']
+        assert len(self.requests_for('/volumes/detail')) == 2
+        assert len(client.flavors()) == 2
+
+    def test_list_instances(self):
+        instances = OpenStack.list_instances()
+        assert [i['ID'] for i in instances] == [SERVER_ID]
+        assert instances[0]['Networks'] == 'Ext-Net=167.114.233.32'
+
+    def test_list_instances_filtered(self):
+        # Only the target is listed, so it fits in one page
+        self.server.page_size = 1
+        assert len(OpenStack.list_instances()) == 1
+        assert len(OpenStack.show_instances([SERVER_ID])) == 1
+        assert len(self.requests_for('/servers/detail')) == 2
+        client = api.get_client()
+        assert [s['name'] for s in client.servers(pattern='^oth')] == \
+            ['other']
+
+    def test_list_volumes(self):
+        volumes = OpenStack.list_volumes()
+        assert [v['Display Name'] for v in volumes] == [
+            'target167114233032-0']
+        assert volumes[0]['created_at'] == '2015-09-17T19:46:59.000000'
+
+    def test_show_instances(self):
+        found = OpenStack.show_instances(
+            [SERVER_ID, '915504ad-368b-4cce-be7c-4f8a83902e28'])
+        assert found.keys() == [SERVER_ID]
+        assert found[SERVER_ID]['name'] == 'target167114233032'
+        assert len(self.requests_for('/servers/detail')) == 1
+
+    def test_cached_lookups(self):
+        o = OpenStack()
+        hint = {'ram': 4000, 'cpus': 1, 'disk': 20}
+        for i in range(3):
+            assert o.flavor(hint, None) == 'small'
+            assert o.flavor(hint, 'big') == 'big'
+            assert o.image_exists('ubuntu-14.04')
+            assert o.net_id('Ext-Net') == 'N1'
+        assert len(self.requests_for('/flavors/detail')) == 1
+        assert len(self.requests_for('/images')) == 1
+        assert len(self.requests_for('/networks')) == 1
+
+    def test_missing_image_not_cached(self):
+        o = OpenStack()
+        assert not o.image_exists('centos-7.2')
+        assert not o.image_exists('centos-7.2')
+        assert len(self.requests_for('/images')) == 2
+
+    def test_missing_endpoints(self):
+        self.server.catalog_paths = dict(image='/missing', network='/missing')
+        client = api.get_client()
+        assert client.images('teuthology-ubuntu-14.04') == []
+        assert client.network('Ext-Net') is None
+        assert client.get_all('compute', '/missing', 'servers') == []
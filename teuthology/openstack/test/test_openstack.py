@@ -368,6 +368,54 @@ class TestOpenStack(object):
         del os.environ['OS_TOKEN_VALUE']
         del os.environ['OS_TOKEN_EXPIRES']
 
+    def test_cloud_init_wait_many(self):
+        delays = {'slow': 0.6, 'fast': 0.2, 'broken': 0.4}
+
+        def cloud_init_wait(self, instance):
+            time.sleep(delays[instance])
+            return instance != 'broken'
+
+        with patch.object(OpenStack, 'cloud_init_wait', cloud_init_wait):
+            start = time.time()
+            results = list(OpenStack().cloud_init_wait_many(
+                ['slow', 'fast', 'broken']))
+            elapsed = time.time() - start
+        assert [(i, success) for (i, success, _) in results] == [
+            ('fast', True), ('broken', False), ('slow', True)]
+        assert results[0][2] < results[2][2]
+        # The instances are waited for at the same time
+        assert elapsed < sum(delays.values())
+
+    def test_cloud_init_wait_many_start(self):
+        def cloud_init_wait(self, instance):
+            time.sleep(instance)
+            return True
+
+        with patch.object(OpenStack, 'cloud_init_wait', cloud_init_wait):
+            results = OpenStack().cloud_init_wait_many(
+                [0.1, 0.3], start=time.time() - 10)
+            (_, _, first) = next(results)
+            # The caller's own work doesn't add to the next instance's time
+            time.sleep(0.5)
+            (_, _, second) = next(results)
+        assert 10.1 <= first < 10.3
+        assert 10.3 <= second < 10.5
+
+    def test_cloud_init_wait_many_stop(self):
+        waited = []
+
+        def cloud_init_wait(self, instance):
+            time.sleep(instance)
+            waited.append(instance)
+            return True
+
+        with patch.object(OpenStack, 'cloud_init_wait', cloud_init_wait):
+            results = OpenStack().cloud_init_wait_many([0.1, 0.5])
+            assert next(results)[0] == 0.1
+            results.close()
+            time.sleep(0.6)
+        assert waited == [0.1]
+
 class TestTeuthologyOpenStack(object):
 
     @classmethod
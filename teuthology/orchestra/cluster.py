@@ -2,7 +2,76 @@
 Cluster definition
 part of context, Cluster is used to save connection information.
 """
+from cStringIO import StringIO
+import time
+
 import teuthology.misc
+from teuthology.parallel import parallel
+
+
+class RemoteResult(object):
+    """
+    The outcome of running a command on one remote with
+    Cluster.run_parallel()
+    """
+    def __init__(self, remote, exitstatus=None, stdout='', stderr='',
+                 duration=None, exception=None):
+        """
+        :param remote:     The Remote the command ran on
+        :param exitstatus: The command's exit status, or None if it could not
+                           be determined
+        :param stdout:     The command's captured stdout
+        :param stderr:     The command's captured stderr
+        :param duration:   How many seconds the command took
+        :param exception:  The exception raised while running the command, if
+                           any
+        """
+        self.remote = remote
+        self.exitstatus = exitstatus
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.exception = exception
+
+    @property
+    def ok(self):
+        return self.exception is None and self.exitstatus == 0
+
+    def __repr__(self):
+        return '{classname}(remote={remote!r}, exitstatus={status!r})'.format(
+            classname=self.__class__.__name__,
+            remote=self.remote,
+            status=self.exitstatus,
+            )
+
+
+class ClusterResult(dict):
+    """
+    The outcome of Cluster.run_parallel(): a dict mapping each Remote to a
+    RemoteResult
+    """
+    @property
+    def ok(self):
+        return all(result.ok for result in self.itervalues())
+
+    @property
+    def failed(self):
+        """
+        The RemoteResults of the remotes the command failed on, in
+        alphabetical order
+        """
+        return sorted(
+            (result for result in self.itervalues() if not result.ok),
+            key=lambda result: result.remote.name,
+        )
+
+    @property
+    def stdout(self):
+        """
+        A dict mapping each Remote to the command's stdout on it
+        """
+        return dict((remote, result.stdout)
+                    for (remote, result) in self.iteritems())
 
 
 class Cluster(object):
@@ -63,23 +132,76 @@ class Cluster(object):
         remotes = sorted(self.remotes.iterkeys(), key=lambda rem: rem.name)
         return [remote.run(**kwargs) for remote in remotes]
 
-    def write_file(self, file_name, content, sudo=False, perms=None, owner=None):
+    def run_parallel(self, concurrency=None, check_status=True, **kwargs):
         """
-        Write text to a file on each node.
+        Run a command on all the nodes in this cluster at once, and wait for
+        it to finish everywhere.
+
+        Each node's stdout and stderr are captured separately, so they may not
+        be passed in. Other arguments are passed to `Remote.run`.
+
+        :param concurrency:  The most nodes to run the command on at once. The
+                             default is all of them.
+        :param check_status: If True, raise the exception of the first node
+                             (in alphabetical order) the command failed on,
+                             once it has finished on every node.
+        :returns: A ClusterResult
+        """
+        results = ClusterResult()
+
+        def run_one(remote):
+            stdout = StringIO()
+            stderr = StringIO()
+            start = time.time()
+            exitstatus = None
+            exception = None
+            try:
+                proc = remote.run(stdout=stdout, stderr=stderr,
+                                  check_status=check_status, **kwargs)
+                exitstatus = proc.exitstatus
+            except Exception as e:
+                exception = e
+                exitstatus = getattr(e, 'exitstatus', None)
+            results[remote] = RemoteResult(
+                remote,
+                exitstatus=exitstatus,
+                stdout=stdout.getvalue(),
+                stderr=stderr.getvalue(),
+                duration=round(time.time() - start, 3),
+                exception=exception,
+            )
+
+        with parallel(size=concurrency) as p:
+            for remote in self.remotes.iterkeys():
+                p.spawn(run_one, remote)
+        if check_status:
+            for result in results.failed:
+                if result.exception is not None:
+                    raise result.exception
+        return results
+
+    def write_file(self, file_name, content, sudo=False, perms=None,
+                   owner=None, concurrency=None):
+        """
+        Write text to a file on each node, writing to all of them at once.
 
         :param file_name: file name
         :param content: file content
         :param sudo: use sudo
         :param perms: file permissions (passed to chmod) ONLY if sudo is True
+        :param concurrency: the most nodes to write to at once; the default
+                            is all of them
         """
-        remotes = sorted(self.remotes.iterkeys(), key=lambda rem: rem.name)
-        for remote in remotes:
-            if sudo:
-                teuthology.misc.sudo_write_file(remote, file_name, content, perms=perms, owner=owner)
-            else:
-                if perms is not None or owner is not None:
-                    raise ValueError("To specify perms or owner, sudo must be True")
-                teuthology.misc.write_file(remote, file_name, content)
+        if not sudo and (perms is not None or owner is not None):
+            raise ValueError("To specify perms or owner, sudo must be True")
+        with parallel(size=concurrency) as p:
+            for remote in self.remotes.iterkeys():
+                if sudo:
+                    p.spawn(teuthology.misc.sudo_write_file, remote,
+                            file_name, content, perms=perms, owner=owner)
+                else:
+                    p.spawn(teuthology.misc.write_file, remote, file_name,
+                            content)
 
     def only(self, *roles):
         """
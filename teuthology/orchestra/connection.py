@@ -2,6 +2,7 @@
 Connection utilities
 """
 import base64
+import gevent.lock
 import paramiko
 import os
 import logging
@@ -108,3 +109,98 @@ def connect(user_at_host, host_key=None, keep_alive=False, timeout=60,
                         "Error connecting to {host}".format(host=host))
     ssh.get_transport().set_keepalive(keep_alive)
     return ssh
+
+
+def is_active(client):
+    """
+    Whether client's transport is still usable
+    """
+    transport = client.get_transport()
+    return transport is not None and transport.is_active()
+
+
+class ConnectionPool(object):
+    """
+    A set of up to size SSH connections to one host, across which commands
+    are spread so that they don't all share one transport.
+
+    The pool starts with just the primary connection; others are opened on
+    demand when every connection in the pool is busy. Connections handed out
+    by get() count as busy until they are given back with put(). A
+    connection whose transport dies is dropped and replaced the next time
+    one is needed. The primary connection is left to its owner to reconnect.
+    """
+    def __init__(self, primary, size, **connect_args):
+        """
+        :param primary:      The already-connected SSHClient to start with
+        :param size:         The most connections to keep open
+        :param connect_args: Passed to connect() to open more connections
+        """
+        self.primary = primary
+        self.size = size
+        self.connect_args = connect_args
+        self.connect_args.setdefault('retry', False)
+        self.clients = [primary]
+        # How many commands each connection is running
+        self.load = {primary: 0}
+        # Connections being opened, which count towards size
+        self.connecting = 0
+        self._lock = gevent.lock.Semaphore()
+
+    def get(self):
+        """
+        Return the least-busy live connection, opening another one if all of
+        them are busy and the pool isn't full yet. Give it back with put().
+        """
+        with self._lock:
+            best = self._least_busy()
+            if self.load[best] == 0 or \
+                    len(self.clients) + self.connecting >= self.size:
+                return self._check_out(best)
+            # Reserve a slot, and connect without holding up other callers
+            self.connecting += 1
+        client = None
+        try:
+            client = connect(**self.connect_args)
+        except Exception:
+            log.debug("Failed to add a connection to the pool",
+                      exc_info=True)
+        with self._lock:
+            self.connecting -= 1
+            if client is None:
+                return self._check_out(self._least_busy())
+            self.clients.append(client)
+            self.load[client] = 0
+            return self._check_out(client)
+
+    def put(self, client):
+        """
+        Give back a connection returned by get()
+        """
+        with self._lock:
+            if self.load.get(client):
+                self.load[client] -= 1
+
+    def _least_busy(self):
+        for client in list(self.clients):
+            if client is not self.primary and not is_active(client):
+                log.debug("Dropping dead connection from pool")
+                self.clients.remove(client)
+                self.load.pop(client, None)
+                client.close()
+        # If the primary is dead, let the caller discover that
+        return min(self.clients, key=lambda client: self.load[client])
+
+    def _check_out(self, client):
+        self.load[client] += 1
+        return client
+
+    def close(self):
+        """
+        Close every connection but the primary one.
+        """
+        for client in self.clients:
+            if client is not self.primary:
+                client.close()
+        self.clients = [self.primary]
+        self.load = {self.primary: 0}
@@ -127,15 +127,15 @@ class OS(object):
             package_type = 'deb'
         """
         str_ = lsb_release_str.strip()
-        name = cls._get_value(str_, 'Distributor ID')
+        name = cls.get_value(str_, 'Distributor ID')
         if name == 'RedHatEnterpriseServer':
             name = 'rhel'
 	elif name.startswith('openSUSE'):
 	    name = 'opensuse'
         name = name.lower()
 
-        version = cls._get_value(str_, 'Release')
-        codename = cls._get_value(str_, 'Codename').lower()
+        version = cls.get_value(str_, 'Release')
+        codename = cls.get_value(str_, 'Codename').lower()
         obj = cls(name=name, version=version, codename=codename)
 
         return obj
@@ -161,8 +161,8 @@ class OS(object):
             package_type = 'deb'
         """
         str_ = os_release_str.strip()
-        name = cls._get_value(str_, 'ID').lower()
-        version = cls._get_value(str_, 'VERSION_ID')
+        name = cls.get_value(str_, 'ID').lower()
+        version = cls.get_value(str_, 'VERSION_ID')
         obj = cls(name=name, version=version)
 
         return obj
@@ -198,7 +198,12 @@ class OS(object):
 
 
     @staticmethod
-    def _get_value(str_, name):
+    def get_value(str_, name):
+        """
+        Return the value given for name in str_, which is formatted like the
+        output of lsb_release -a or the contents of /etc/os-release, or ''
+        if there is none
+        """
         regex = '^%s[:=](.+)' % name
         match = re.search(regex, str_, flags=re.M)
         if match:
@@ -7,11 +7,15 @@ from . import run
 from .opsys import OS
 import connection
 from teuthology import misc
+from teuthology.config import config
+import contextlib
+import gevent.lock
 import time
 import re
 import logging
 from cStringIO import StringIO
 import os
+import paramiko
 import pwd
 import tempfile
 import netaddr
@@ -20,6 +24,46 @@ import console
 
 log = logging.getLogger(__name__)
 
+# Everything Remote needs to know about a host, gathered in one round-trip.
+# Each command's output follows a line holding FACTS_MARKER and the name of
+# its section; failures just leave that section empty.
+FACTS_MARKER = '@@teuthology-fact '
+FACTS_SCRIPT = """
+fact() { echo; echo "%(marker)s$1"; }
+fact arch; uname -m
+fact hostname; hostname --fqdn
+fact platform
+python -c 'import platform; print(platform.linux_distribution())' 2>/dev/null
+fact os_release; cat /etc/os-release 2>/dev/null
+fact lsb_release; lsb_release -a 2>/dev/null
+fact systemctl; which systemctl 2>/dev/null
+fact ip_addr; PATH=/sbin:/usr/sbin:$PATH ip addr show 2>/dev/null
+true
+""" % dict(marker=FACTS_MARKER)
+FACTS = ('arch', 'hostname', 'platform', 'os_release', 'lsb_release',
+         'systemctl', 'ip_addr')
+
+# Attributes of Remote that are derived from its facts
+FACT_ATTRS = ('_arch', '_os', '_init_system', '_interface', '_cidr')
+
+
+def parse_facts(output):
+    """
+    Split the output of FACTS_SCRIPT into a dict keyed by section name.
+    Every name in FACTS is present in the result.
+    """
+    sections = dict((name, []) for name in FACTS)
+    lines = None
+    for line in output.splitlines():
+        if line.startswith(FACTS_MARKER):
+            lines = sections.setdefault(line[len(FACTS_MARKER):].strip(), [])
+        elif lines is not None:
+            lines.append(line)
+    return dict(
+        (name, '\n'.join(lines).strip())
+        for (name, lines) in sections.iteritems()
+    )
+
 
 class Remote(object):
 
@@ -32,6 +76,10 @@ class Remote(object):
     # for unit tests to hook into
     _runner = staticmethod(run.run)
 
+    # The SFTP channel's window size; much larger than paramiko's default so
+    # that transfers of big files aren't throttled by window adjustments
+    sftp_window_size = 2 ** 27
+
     def __init__(self, name, ssh=None, shortname=None, console=None,
                  host_key=None, keep_alive=True):
         self.name = name
@@ -50,6 +98,10 @@ class Remote(object):
         self.keep_alive = keep_alive
         self._console = console
         self.ssh = ssh
+        self._sftp = None
+        self._sftp_lock = gevent.lock.Semaphore()
+        self._facts = None
+        self._pool = None
 
     def connect(self, timeout=None):
         args = dict(user_at_host=self.name, host_key=self._host_key,
@@ -57,6 +109,8 @@ class Remote(object):
         if timeout:
             args['timeout'] = timeout
 
+        self._close_sftp()
+        self._close_pool()
         self.ssh = connection.connect(**args)
         return self.ssh
 
@@ -65,6 +119,8 @@ class Remote(object):
         Attempts to re-establish connection. Returns True for success; False
         for failure.
         """
+        self._close_sftp()
+        self._close_pool()
         if self.ssh is not None:
             self.ssh.close()
         if not timeout:
@@ -113,14 +169,8 @@ class Remote(object):
         return self._cidr
 
     def _set_iface_and_cidr(self):
-        proc = self.run(
-            args=['PATH=/sbin:/usr/sbin', 'ip', 'addr', 'show'],
-            stdout=StringIO(),
-        )
-        proc.wait()
         regexp = 'inet.? %s' % self.ip_address
-        proc.stdout.seek(0)
-        for line in proc.stdout.readlines():
+        for line in self.facts['ip_addr'].splitlines():
             line = line.strip()
             if re.match(regexp, line):
                 items = line.split()
@@ -132,9 +182,7 @@ class Remote(object):
     @property
     def hostname(self):
         if not hasattr(self, '_hostname'):
-            proc = self.run(args=['hostname', '--fqdn'], stdout=StringIO())
-            proc.wait()
-            self._hostname = proc.stdout.getvalue().strip()
+            self._hostname = self.facts['hostname']
         return self._hostname
 
     @property
@@ -190,10 +238,58 @@ class Remote(object):
         """
         if self.ssh is None:
             self.reconnect()
-        r = self._runner(client=self.ssh, name=self.shortname, **kwargs)
+        pool = self._get_pool()
+        if pool is None:
+            client = self.ssh
+        else:
+            client = pool.get()
+        try:
+            r = self._runner(client=client, name=self.shortname, **kwargs)
+        except BaseException:
+            if pool is not None:
+                pool.put(client)
+            raise
         r.remote = self
+        if pool is not None:
+            if kwargs.get('wait', True):
+                pool.put(client)
+            else:
+                gevent.spawn(self._put_when_finished, pool, client, r)
         return r
 
+    def _get_pool(self):
+        """
+        The ConnectionPool to run commands from, or None if ssh_pool_size is
+        one and every command runs on self.ssh.
+        """
+        size = config.ssh_pool_size or 1
+        if size <= 1:
+            return None
+        if self._pool is None or self._pool.primary is not self.ssh:
+            self._close_pool()
+            self._pool = connection.ConnectionPool(
+                self.ssh, size, user_at_host=self.name,
+                host_key=self._host_key, keep_alive=self.keep_alive,
+            )
+        return self._pool
+
+    @staticmethod
+    def _put_when_finished(pool, client, proc):
+        """
+        Give client back to pool once proc, started with wait=False, exits
+        """
+        try:
+            while not proc.finished:
+                gevent.sleep(1)
+        finally:
+            pool.put(client)
+
+    def _close_pool(self):
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool = None
+
     def mktemp(self):
         """
         Make a remote temporary file
@@ -249,33 +345,88 @@ class Remote(object):
         self.run(args="sudo chcon {con} {path}".format(
             con=context, path=file_path))
 
+    @property
+    def sftp(self):
+        """
+        A paramiko.SFTPClient, opened on first use and reused for every
+        transfer until the connection is re-established. It can't serve
+        two requests at once, so use sftp_session() rather than this.
+        """
+        if self._sftp is not None and self._sftp.get_channel().closed:
+            self._sftp = None
+        if self._sftp is None:
+            self._sftp = self._open_sftp()
+        return self._sftp
+
+    def _open_sftp(self):
+        if self.ssh is None:
+            self.reconnect()
+        return paramiko.SFTPClient.from_transport(
+            self.ssh.get_transport(),
+            window_size=self.sftp_window_size,
+        )
+
+    @contextlib.contextmanager
+    def sftp_session(self):
+        """
+        Context manager yielding a paramiko.SFTPClient for this greenlet's
+        exclusive use: the cached one if it is free, otherwise a fresh one
+        which is closed on exit.
+        """
+        if self._sftp_lock.acquire(blocking=False):
+            try:
+                yield self.sftp
+            finally:
+                self._sftp_lock.release()
+            return
+        sftp = self._open_sftp()
+        try:
+            yield sftp
+        finally:
+            sftp.close()
+
+    def _close_sftp(self):
+        if self._sftp is None:
+            return
+        try:
+            self._sftp.close()
+        except Exception:
+            log.debug("Failed to close SFTP session to %s", self.shortname,
+                      exc_info=True)
+        self._sftp = None
+
     def _sftp_put_file(self, local_path, remote_path):
         """
         Use the paramiko.SFTPClient to put a file. Returns the remote filename.
         """
-        sftp = self.ssh.open_sftp()
-        sftp.put(local_path, remote_path)
+        # put() pipelines its writes
+        with self.sftp_session() as sftp:
+            sftp.put(local_path, remote_path)
         return
 
     def _sftp_get_file(self, remote_path, local_path):
         """
         Use the paramiko.SFTPClient to get a file. Returns the local filename.
         """
-        file_size = self._format_size(
-            self._sftp_get_size(remote_path)
-        ).strip()
-        log.debug("{}:{} is {}".format(self.shortname, remote_path, file_size))
-        sftp = self.ssh.open_sftp()
-        sftp.get(remote_path, local_path)
+        with self.sftp_session() as sftp:
+            file_size = self._format_size(
+                sftp.stat(remote_path).st_size
+            ).strip()
+            log.debug("{}:{} is {}".format(
+                self.shortname, remote_path, file_size))
+            # get() prefetches, so its reads are pipelined
+            sftp.get(remote_path, local_path)
         return local_path
 
     def _sftp_open_file(self, remote_path):
         """
         Use the paramiko.SFTPClient to open a file. Returns a
         paramiko.SFTPFile object.
+
+        The file outlives this call, so it gets an SFTP session of its own
+        rather than holding the shared one.
         """
-        sftp = self.ssh.open_sftp()
-        return sftp.open(remote_path)
+        return self._open_sftp().open(remote_path)
 
     def _sftp_get_size(self, remote_path):
         """
@@ -388,35 +539,54 @@ class Remote(object):
             ])
         return self.run(args=args, wait=False, stdout=run.PIPE)
 
+    @property
+    def facts(self):
+        """
+        A dict of raw facts about the host, gathered with a single remote
+        command the first time it is needed. The keys are the section names
+        used in FACTS_SCRIPT; a section whose command failed is empty.
+
+        The result is kept across reconnects; use refresh_facts() if the
+        host may have changed underneath us.
+        """
+        if self._facts is None:
+            proc = self.run(
+                args=['sh', '-c', FACTS_SCRIPT],
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+            self._facts = parse_facts(proc.stdout.getvalue())
+        return self._facts
+
+    def refresh_facts(self):
+        """
+        Discard the cached facts, and everything derived from them, so that
+        they are gathered again on next use.
+        """
+        self._facts = None
+        for attr in FACT_ATTRS:
+            if hasattr(self, attr):
+                delattr(self, attr)
+
     @property
     def os(self):
         if not hasattr(self, '_os'):
-            proc = self.run(
-                args=[
-                    'python', '-c',
-                    'import platform; print platform.linux_distribution()'],
-                stdout=StringIO(), stderr=StringIO(), check_status=False)
-            if proc.exitstatus == 0:
-                self._os = OS.from_python(proc.stdout.getvalue().strip())
-                return self._os
-
-            proc = self.run(args=['cat', '/etc/os-release'], stdout=StringIO(),
-                            stderr=StringIO(), check_status=False)
-            if proc.exitstatus == 0:
-                self._os = OS.from_os_release(proc.stdout.getvalue().strip())
-                return self._os
-
-            proc = self.run(args=['lsb_release', '-a'], stdout=StringIO(),
-                            stderr=StringIO())
-            self._os = OS.from_lsb_release(proc.stdout.getvalue().strip())
+            facts = self.facts
+            if facts['platform']:
+                self._os = OS.from_python(facts['platform'])
+            elif facts['os_release']:
+                self._os = OS.from_os_release(facts['os_release'])
+            elif facts['lsb_release']:
+                self._os = OS.from_lsb_release(facts['lsb_release'])
+            else:
+                raise RuntimeError(
+                    "Could not determine the OS of %s" % self.shortname)
         return self._os
 
     @property
     def arch(self):
         if not hasattr(self, '_arch'):
-            proc = self.run(args=['uname', '-m'], stdout=StringIO())
-            proc.wait()
-            self._arch = proc.stdout.getvalue().strip()
+            self._arch = self.facts['arch']
         return self._arch
 
     @property
@@ -460,15 +630,12 @@ class Remote(object):
         """
         if not hasattr(self, '_init_system'):
             self._init_system = None
-            proc = self.run(
-                args=['which', 'systemctl'],
-                check_status=False,
-            )
-            if proc.returncode == 0:
+            if self.facts['systemctl']:
                 self._init_system = 'systemd'
         return self._init_system
 
     def __del__(self):
+        self._close_pool()
         if self.ssh is not None:
             self.ssh.close()
 
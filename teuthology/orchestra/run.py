@@ -3,6 +3,7 @@ Paramiko run support
 """
 from cStringIO import StringIO
 from paramiko import ChannelFile
+from paramiko.channel import ChannelStderrFile
 
 import gevent
 import gevent.event
@@ -11,12 +12,18 @@ import pipes
 import logging
 import shutil
 
+from ..config import config
 from ..contextutil import safe_while
 from ..exceptions import (CommandCrashedError, CommandFailedError,
                           ConnectionLostError)
 
 log = logging.getLogger(__name__)
 
+# How much command output is read at a time when logging it
+LOG_CHUNK_SIZE = 64 * 1024
+# Longer lines of output are logged in pieces
+MAX_LINE_LENGTH = 1024 * 1024
+
 
 class RemoteProcess(object):
     """
@@ -115,17 +122,23 @@ class RemoteProcess(object):
             # FIXME: Is this actually true?
             raise RuntimeError(self.deadlock_warning % 'stdin')
 
-    def setup_output_stream(self, stream_obj, stream_name):
+    def setup_output_stream(self, stream_obj, stream_name, capture_limit=None,
+                            tee=None):
         if stream_obj is not PIPE:
             # Log the stream
             host_log = self.logger.getChild(self.hostname)
             stream_log = host_log.getChild(stream_name)
+            tee_path = None
+            if tee is not None:
+                tee_path = '{tee}.{stream}'.format(tee=tee, stream=stream_name)
             self.add_greenlet(
                 gevent.spawn(
                     copy_file_to,
                     getattr(self, stream_name),
                     stream_log,
                     stream_obj,
+                    capture_limit=capture_limit,
+                    tee_path=tee_path,
                 )
             )
             setattr(self, stream_name, stream_obj)
@@ -253,19 +266,87 @@ def quote(args):
     return ' '.join(_quote(args))
 
 
-def copy_to_log(f, logger, loglevel=logging.INFO):
-    # Work-around for http://tracker.ceph.com/issues/8313
-    if isinstance(f, ChannelFile):
-        f._flags += ChannelFile.FLAG_BINARY
+def read_chunks(f, size=None):
+    """
+    Yield blocks of at most size (by default LOG_CHUNK_SIZE) bytes read from
+    f, until EOF.
 
-    for line in f:
-        line = line.rstrip()
-        # Second part of work-around for http://tracker.ceph.com/issues/8313
-        try:
-            line = unicode(line, 'utf-8', 'replace').encode('utf-8')
-            logger.log(loglevel, line.decode('utf-8'))
-        except (UnicodeDecodeError, UnicodeEncodeError):
-            logger.exception("Encountered unprintable line in command output")
+    ChannelFile.read(size) waits until it has a full block, which would hold
+    back the output of slow commands, so read from its channel directly to
+    get whatever has arrived. Nothing else reads the file, so its buffer is
+    empty and bypassing it loses nothing.
+    """
+    size = size or LOG_CHUNK_SIZE
+    if isinstance(f, ChannelStderrFile):
+        read = f.channel.recv_stderr
+    elif isinstance(f, ChannelFile):
+        read = f.channel.recv
+    else:
+        read = f.read
+    while True:
+        chunk = read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def log_lines(logger, lines, loglevel=logging.INFO):
+    """
+    Log a batch of raw output lines, one record per line.
+
+    The level is checked once per batch, the batch is decoded in one go and
+    the records are handed straight to the logger's handlers; Logger.log()
+    would otherwise inspect the call stack for every line.
+    """
+    if not lines or not logger.isEnabledFor(loglevel):
+        return
+    text = unicode('\n'.join(lines), 'utf-8', 'replace')
+    for line in text.split(u'\n'):
+        logger.handle(logger.makeRecord(
+            logger.name, loglevel, '(unknown file)', 0, line.rstrip(), None,
+            None,
+        ))
+
+
+def copy_to_log(f, logger, loglevel=logging.INFO, capture=None,
+                capture_limit=None, tee=None):
+    """
+    Log the output read from f, line by line.
+
+    :param f:             file-like object to read from
+    :param logger:        the logger object
+    :param loglevel:      the level to log at
+    :param capture:       an optional file-like object which will receive a
+                          copy of the output
+    :param capture_limit: the most bytes to write to capture; the rest of the
+                          output is still logged. Unlimited if None.
+    :param tee:           an optional file-like object which will receive a
+                          copy of all the raw output
+    """
+    captured = 0
+    partial = ''
+    for chunk in read_chunks(f):
+        if tee is not None:
+            tee.write(chunk)
+        if capture is not None:
+            if capture_limit is None:
+                capture.write(chunk)
+            elif captured < capture_limit:
+                capture.write(chunk[:capture_limit - captured])
+                if captured + len(chunk) > capture_limit:
+                    logger.warning(
+                        "Output exceeds the capture limit of %d bytes; the "
+                        "rest will be logged but not captured", capture_limit)
+            captured += len(chunk)
+        lines = (partial + chunk).split('\n')
+        partial = lines.pop()
+        if len(partial) > MAX_LINE_LENGTH:
+            # Don't let a single enormous line pile up in memory
+            lines.append(partial)
+            partial = ''
+        log_lines(logger, lines, loglevel)
+    if partial:
+        log_lines(logger, [partial], loglevel)
 
 
 def copy_and_close(src, fdst):
@@ -279,19 +360,23 @@ def copy_and_close(src, fdst):
     fdst.close()
 
 
-def copy_file_to(src, logger, stream=None):
+def copy_file_to(src, logger, stream=None, capture_limit=None,
+                 tee_path=None):
     """
     Copy file
     :param src: file to be copied.
     :param logger: the logger object
     :param stream: an optional file-like object which will receive a copy of
                    src.
+    :param capture_limit: the most bytes of src to copy to stream
+    :param tee_path: an optional local path which will receive a copy of src
     """
-    if stream is not None:
-        shutil.copyfileobj(src, stream)
-        stream.seek(0)
-        src = stream
-    copy_to_log(src, logger)
+    if tee_path is None:
+        copy_to_log(src, logger, capture=stream, capture_limit=capture_limit)
+        return
+    with open(tee_path, 'wb') as tee:
+        copy_to_log(src, logger, capture=stream, capture_limit=capture_limit,
+                    tee=tee)
 
 
 def spawn_asyncresult(fn, *args, **kwargs):
@@ -365,6 +450,8 @@ def run(
     label=None,
     timeout=None,
     cwd=None,
+    capture_limit=None,
+    tee=None,
 ):
     """
     Run a command remotely.  If any of 'args' contains shell metacharacters
@@ -397,6 +484,13 @@ def run(
     :param timeout: timeout value for args to complete on remote channel of
                     paramiko
     :param cwd: Directory in which the command should be executed.
+    :param capture_limit: The most bytes of stdout or stderr to store in a
+                          file-like object passed as `stdout` or `stderr`;
+                          the output is logged in full regardless. Defaults
+                          to the run_capture_limit config value, or unlimited.
+    :param tee: A local path prefix. If given, the raw stdout and stderr of
+                the command are also written to <tee>.stdout and
+                <tee>.stderr.
     """
     try:
         transport = client.get_transport()
@@ -417,8 +511,10 @@ def run(
                       cwd=cwd)
     r.execute()
     r.setup_stdin(stdin)
-    r.setup_output_stream(stderr, 'stderr')
-    r.setup_output_stream(stdout, 'stdout')
+    if capture_limit is None:
+        capture_limit = config.run_capture_limit
+    r.setup_output_stream(stderr, 'stderr', capture_limit, tee)
+    r.setup_output_stream(stdout, 'stdout', capture_limit, tee)
     if wait:
         r.wait()
     return r
@@ -4,6 +4,7 @@ import pytest
 from mock import patch, Mock
 
 from .. import cluster, remote
+from ...exceptions import CommandFailedError
 
 
 class TestCluster(object):
@@ -209,6 +210,57 @@ class TestCluster(object):
         assert c_foo.remotes == {r2: ['bar'], r3: ['foo']}
 
 
+class TestRunParallel(object):
+    """ Tests for cluster.run_parallel """
+    def setup(self):
+        self.remotes = list()
+        for name in ('r1', 'r2', 'r3'):
+            rem = Mock()
+            rem.name = name
+            self.remotes.append(rem)
+        self.c = cluster.Cluster(
+            remotes=[(r, [r.name]) for r in self.remotes],
+        )
+
+    def fake_run(self, exitstatus, output=''):
+        def run(stdout, stderr, check_status, **kwargs):
+            stdout.write(output)
+            if check_status and exitstatus:
+                raise CommandFailedError(kwargs['args'], exitstatus)
+            return Mock(exitstatus=exitstatus)
+        return run
+
+    def test_run_parallel(self):
+        for rem in self.remotes:
+            rem.run.side_effect = self.fake_run(0, rem.name)
+        result = self.c.run_parallel(args=['test'], concurrency=2)
+        assert result.ok
+        assert result.stdout == dict(
+            (rem, rem.name) for rem in self.remotes)
+        for rem in self.remotes:
+            assert result[rem].exitstatus == 0
+            assert result[rem].duration >= 0
+
+    def test_run_parallel_failure(self):
+        self.remotes[0].run.side_effect = self.fake_run(0)
+        self.remotes[1].run.side_effect = self.fake_run(1)
+        self.remotes[2].run.side_effect = self.fake_run(2)
+        with pytest.raises(CommandFailedError) as excinfo:
+            self.c.run_parallel(args=['test'])
+        assert excinfo.value.exitstatus == 1
+        # The command still ran everywhere
+        for rem in self.remotes:
+            assert rem.run.call_count == 1
+
+    def test_run_parallel_no_check_status(self):
+        self.remotes[0].run.side_effect = self.fake_run(0)
+        self.remotes[1].run.side_effect = self.fake_run(1)
+        self.remotes[2].run.side_effect = self.fake_run(0)
+        result = self.c.run_parallel(args=['test'], check_status=False)
+        assert not result.ok
+        assert [r.remote for r in result.failed] == [self.remotes[1]]
+
+
 class TestWriteFile(object):
     """ Tests for cluster.write_file """
     def setup(self):
@@ -1,5 +1,7 @@
 import fudge
 
+from mock import MagicMock, patch
+
 from teuthology import config
 from .util import assert_raises
 from .. import connection
@@ -104,3 +106,97 @@ class TestConnection(object):
             _create_key=create_key,
             )
         assert got is ssh
+
+
+class TestConnectionPool(object):
+    def make_client(self, active=True):
+        client = MagicMock()
+        client.get_transport.return_value.is_active.return_value = active
+        return client
+
+    def make_pool(self, primary, size, new_clients):
+        pool = connection.ConnectionPool(primary, size, user_at_host='host')
+        patcher = patch.object(connection, 'connect',
+                               side_effect=new_clients)
+        return pool, patcher
+
+    def test_idle_primary(self):
+        primary = self.make_client()
+        pool, patcher = self.make_pool(primary, 4, [])
+        with patcher as m_connect:
+            assert pool.get() is primary
+            pool.put(primary)
+            assert pool.get() is primary
+        assert m_connect.call_count == 0
+
+    def test_grows_when_busy(self):
+        primary = self.make_client()
+        extra = self.make_client()
+        pool, patcher = self.make_pool(primary, 2, [extra])
+        with patcher as m_connect:
+            assert pool.get() is primary
+            assert pool.get() is extra
+            m_connect.assert_called_once_with(user_at_host='host',
+                                              retry=False)
+            # The pool is full, so the least busy connection is used
+            assert pool.get() is primary
+            assert pool.get() is extra
+            pool.put(primary)
+            pool.put(primary)
+            assert pool.get() is primary
+        assert pool.clients == [primary, extra]
+        assert pool.load == {primary: 1, extra: 2}
+
+    def test_connects_without_lock(self):
+        primary = self.make_client()
+        extra = self.make_client()
+        pool, patcher = self.make_pool(primary, 3, [])
+        pool.get()
+
+        def connect(**kwargs):
+            # Others can use the pool meanwhile, but not take the slot
+            assert pool.connecting == 1
+            assert pool.get() is primary
+            return extra
+        with patcher as m_connect:
+            m_connect.side_effect = connect
+            assert pool.get() is extra
+        assert pool.connecting == 0
+        assert pool.load == {primary: 2, extra: 1}
+
+    def test_replaces_dead(self):
+        primary = self.make_client()
+        dead = self.make_client(active=False)
+        extra = self.make_client()
+        pool, patcher = self.make_pool(primary, 2, [extra])
+        pool.clients.append(dead)
+        pool.load[dead] = 0
+        pool.get()
+        with patcher:
+            assert pool.get() is extra
+        dead.close.assert_called_once_with()
+        assert pool.clients == [primary, extra]
+
+    def test_connect_fails(self):
+        primary = self.make_client()
+        pool, patcher = self.make_pool(primary, 2, Exception('nope'))
+        pool.get()
+        with patcher:
+            assert pool.get() is primary
+        assert pool.clients == [primary]
+        assert pool.connecting == 0
+
+    def test_close(self):
+        primary = self.make_client()
+        extra = self.make_client()
+        pool, patcher = self.make_pool(primary, 2, [extra])
+        pool.get()
+        with patcher:
+            pool.get()
+        pool.close()
+        extra.close.assert_called_once_with()
+        assert primary.close.call_count == 0
+        assert pool.clients == [primary]
+        # Giving back a connection that was closed is harmless
+        pool.put(extra)
+        assert pool.load == {primary: 0}
@@ -1,4 +1,5 @@
-from mock import patch, Mock, MagicMock
+from mock import patch, Mock, MagicMock, PropertyMock
+from pytest import raises
 
 from cStringIO import StringIO
 
@@ -65,61 +66,93 @@ class TestRemote(object):
         assert result is proc
         assert result.remote is rem
 
-    def test_hostname(self):
+    def make_facts_output(self, **sections):
+        output = StringIO()
+        for name, value in sections.items():
+            output.write('%s%s\n%s\n' % (remote.FACTS_MARKER, name, value))
+        output.seek(0)
+        return output
+
+    def make_facts_remote(self, name='jdoe@xyzzy.example.com', **sections):
         m_transport = MagicMock()
         m_transport.getpeername.return_value = ('name', 22)
         self.m_ssh.get_transport.return_value = m_transport
-        m_run = MagicMock()
-        args = [
-            'hostname',
-            '--fqdn',
-            ]
-        stdout = StringIO('test_hostname')
-        stdout.seek(0)
         proc = RemoteProcess(
             client=self.m_ssh,
-            args=args,
+            args='fakey',
             )
-        proc.stdout = stdout
-        proc._stdout_buf = Mock()
-        proc._stdout_buf.channel.recv_exit_status.return_value = 0
-        r = remote.Remote(name='xyzzy.example.com', ssh=self.m_ssh)
+        proc.stdout = self.make_facts_output(**sections)
+        m_run = MagicMock()
         m_run.return_value = proc
+        r = remote.Remote(name=name, ssh=self.m_ssh)
         r._runner = m_run
+        return r
+
+    def facts_calls(self, r):
+        return [call[1]['args'] for call in r._runner.call_args_list].count(
+            ['sh', '-c', remote.FACTS_SCRIPT])
+
+    def test_hostname(self):
+        r = self.make_facts_remote(name='xyzzy.example.com',
+                                   hostname='test_hostname')
         assert r.hostname == 'test_hostname'
 
     def test_arch(self):
-        m_transport = MagicMock()
-        m_transport.getpeername.return_value = ('name', 22)
-        self.m_ssh.get_transport.return_value = m_transport
-        m_run = MagicMock()
-        args = [
-            'uname',
-            '-m',
-            ]
-        stdout = StringIO('test_arch')
-        stdout.seek(0)
-        proc = RemoteProcess(
-            client=self.m_ssh,
-            args='fakey',
-            )
-        proc._stdout_buf = Mock()
-        proc._stdout_buf.channel = Mock()
-        proc._stdout_buf.channel.recv_exit_status.return_value = 0
-        proc._stdout_buf.channel.expects('recv_exit_status').returns(0)
-        proc.stdout = stdout
-        m_run.return_value = proc
-        r = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
-        r._runner = m_run
-        assert m_transport.getpeername.called_once_with()
-        assert proc._stdout_buf.channel.recv_exit_status.called_once_with()
-        assert m_run.called_once_with(
-            client=self.m_ssh,
-            args=args,
-            stdout=StringIO(),
-            name=r.shortname,
-        )
+        r = self.make_facts_remote(arch='test_arch')
         assert r.arch == 'test_arch'
+        assert r._runner.call_count == 1
+        assert r._runner.call_args[1]['args'] == \
+            ['sh', '-c', remote.FACTS_SCRIPT]
+
+    def test_parse_facts(self):
+        output = 'junk\n' + self.make_facts_output(
+            arch='x86_64', systemctl='', extra='a\nb').getvalue()
+        facts = remote.parse_facts(output)
+        assert facts['arch'] == 'x86_64'
+        assert facts['systemctl'] == ''
+        assert facts['extra'] == 'a\nb'
+        assert facts['os_release'] == ''
+        assert set(remote.FACTS).issubset(facts)
+
+    def test_facts_single_round_trip(self):
+        r = self.make_facts_remote(
+            arch='aarch64',
+            hostname='xyzzy.example.com',
+            os_release='ID=centos\nVERSION_ID="7"',
+            lsb_release='Distributor ID:\tCentOS\nRelease:\t7.3.1611',
+            systemctl='/usr/bin/systemctl',
+        )
+        assert r.arch == 'aarch64'
+        assert r.os.name == 'centos'
+        assert r.os.version == '7'
+        assert r.init_system == 'systemd'
+        assert r.system_type == 'rpm'
+        r._host_key = 'host_key'
+        assert r.inventory_info['os_type'] == 'centos'
+        assert self.facts_calls(r) == 1
+        # The facts survive a reconnect
+        with patch('teuthology.orchestra.connection.connect'):
+            r.reconnect()
+        assert r.arch == 'aarch64'
+        assert self.facts_calls(r) == 1
+        # ...but can be refreshed on demand
+        r.refresh_facts()
+        r._runner.return_value.stdout = self.make_facts_output(arch='x86_64')
+        assert r.arch == 'x86_64'
+        assert r.init_system is None
+        assert self.facts_calls(r) == 2
+
+    def test_os_prefers_python(self):
+        r = self.make_facts_remote(
+            platform="('Ubuntu', '14.04', 'trusty')",
+            os_release='ID=ubuntu\nVERSION_ID="14.04"',
+        )
+        assert r.os.codename == 'trusty'
+
+    def test_os_unknown(self):
+        r = self.make_facts_remote(arch='x86_64')
+        with raises(RuntimeError):
+            r.os
 
     def test_host_key(self):
         m_key = MagicMock()
@@ -176,6 +209,58 @@ class TestRemote(object):
             rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
             assert rem._sftp_get_size('/fake/file') == 42
 
+    def test_sftp_cached(self):
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        with patch('teuthology.orchestra.remote.paramiko.SFTPClient') as \
+                m_sftp_client:
+            m_from_transport = m_sftp_client.from_transport
+            m_from_transport.return_value.get_channel.return_value.closed = \
+                False
+            assert rem.sftp is rem.sftp
+            assert m_from_transport.call_count == 1
+            # A closed channel is replaced
+            sftp = rem.sftp
+            sftp.get_channel.return_value.closed = True
+            m_from_transport.return_value = Mock()
+            m_from_transport.return_value.get_channel.return_value.closed = \
+                False
+            assert rem.sftp is not sftp
+            assert m_from_transport.call_count == 2
+            # Reconnecting discards the session
+            sftp = rem.sftp
+            with patch('teuthology.orchestra.connection.connect'):
+                rem.connect()
+            sftp.close.assert_called_once_with()
+            rem.sftp
+            assert m_from_transport.call_count == 3
+
+    def test_sftp_session(self):
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        with patch('teuthology.orchestra.remote.paramiko.SFTPClient') as \
+                m_sftp_client:
+            m_from_transport = m_sftp_client.from_transport
+            m_from_transport.return_value.get_channel.return_value.closed = \
+                False
+            with rem.sftp_session() as sftp:
+                assert sftp is rem.sftp
+                # While the cached session is busy, another one is opened
+                m_from_transport.return_value = Mock()
+                with rem.sftp_session() as other:
+                    assert other is not sftp
+                other.close.assert_called_once_with()
+            assert not sftp.close.called
+            with rem.sftp_session() as again:
+                assert again is sftp
+
+    def test_put_when_finished(self):
+        pool = Mock()
+        proc = Mock()
+        type(proc).finished = PropertyMock(side_effect=[False, True])
+        with patch.object(remote.gevent, 'sleep') as m_sleep:
+            remote.Remote._put_when_finished(pool, 'client', proc)
+        assert m_sleep.call_count == 1
+        pool.put.assert_called_once_with('client')
+
     def test_format_size(self):
         assert remote.Remote._format_size(1023).strip() == '1023B'
         assert remote.Remote._format_size(1024).strip() == '1KB'
@@ -183,3 +268,42 @@ class TestRemote(object):
         assert remote.Remote._format_size(1024**5).strip() == '1TB'
         assert remote.Remote._format_size(1021112).strip() == '997KB'
         assert remote.Remote._format_size(1021112**2).strip() == '971GB'
+
+    def test_run_pool(self):
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        rem._runner = MagicMock()
+        with patch('teuthology.orchestra.remote.config') as m_config:
+            m_config.ssh_pool_size = 1
+            rem.run(args=['true'])
+            assert rem._runner.call_args[1]['client'] is self.m_ssh
+            assert rem._pool is None
+            m_config.ssh_pool_size = 4
+            with patch.object(remote.connection.ConnectionPool, 'get') as \
+                    m_get:
+                with patch.object(remote.connection.ConnectionPool,
+                                  'put') as m_put:
+                    rem.run(args=['true'])
+                    assert rem._runner.call_args[1]['client'] is \
+                        m_get.return_value
+                    # The connection is given back once the command is done
+                    m_put.assert_called_once_with(m_get.return_value)
+                    rem._runner.return_value.finished = False
+                    with patch.object(remote.gevent, 'spawn') as m_spawn:
+                        proc = rem.run(args=['sleep', '1'], wait=False)
+                    assert m_put.call_count == 1
+                    m_spawn.assert_called_once_with(
+                        rem._put_when_finished, rem._pool,
+                        m_get.return_value, proc)
+                    rem._runner.side_effect = RuntimeError
+                    with raises(RuntimeError):
+                        rem.run(args=['true'])
+                    assert m_put.call_count == 2
+            pool = rem._pool
+            assert pool.size == 4
+            assert pool.primary is self.m_ssh
+            # Reconnecting discards the pool
+            with patch('teuthology.orchestra.connection.connect'):
+                with patch.object(pool, 'close') as m_close:
+                    rem.connect()
+            m_close.assert_called_once_with()
+            assert rem._pool is None
@@ -257,6 +257,85 @@ class TestRun(object):
         assert code == 0
         assert proc.exitstatus == 0
 
+    def test_capture_limit(self):
+        output = 'foo\nbar\nbaz\n'
+        set_buffer_contents(self.m_stdout_buf, output)
+        self.m_stdout_buf.channel.recv_exit_status.return_value = 0
+        stdout = StringIO()
+        proc = run.run(
+            client=self.m_ssh,
+            args=['foo', 'bar baz'],
+            stdout=stdout,
+            capture_limit=5,
+        )
+        assert proc.stdout.getvalue() == output[:5]
+
+    def test_tee(self, tmpdir):
+        output = 'foo\nbar\n'
+        set_buffer_contents(self.m_stdout_buf, output)
+        self.m_stdout_buf.channel.recv_exit_status.return_value = 0
+        tee = str(tmpdir.join('cmd'))
+        run.run(
+            client=self.m_ssh,
+            args=['foo', 'bar baz'],
+            tee=tee,
+        )
+        assert tmpdir.join('cmd.stdout').read() == output
+        assert tmpdir.join('cmd.stderr').read() == ''
+
+
+class TestCopyToLog(object):
+    def setup(self):
+        self.logger = MagicMock()
+        self.logger.makeRecord.side_effect = \
+            lambda name, level, fn, lno, msg, args, exc_info: msg
+
+    def logged(self):
+        return [args[0] for (args, kwargs) in
+                self.logger.handle.call_args_list]
+
+    def test_lines_across_chunks(self):
+        src = StringIO('first line\nsecond \xe2\x9c\x93 line  \nlast')
+        with patch.object(run, 'LOG_CHUNK_SIZE', 4):
+            run.copy_to_log(src, self.logger)
+        assert self.logged() == \
+            [u'first line', u'second \u2713 line', u'last']
+
+    def test_disabled_level(self):
+        self.logger.isEnabledFor.return_value = False
+        run.copy_to_log(StringIO('foo\nbar\n'), self.logger)
+        assert self.logger.handle.call_count == 0
+
+    def test_long_line(self):
+        src = StringIO('x' * 10)
+        with patch.multiple(run, LOG_CHUNK_SIZE=4, MAX_LINE_LENGTH=5):
+            run.copy_to_log(src, self.logger)
+        assert ''.join(self.logged()) == 'x' * 10
+        assert len(self.logged()) > 1
+
+    def test_capture_and_tee(self):
+        output = 'foo\nbar\nbaz\n'
+        capture = StringIO()
+        tee = StringIO()
+        with patch.object(run, 'LOG_CHUNK_SIZE', 4):
+            run.copy_to_log(StringIO(output), self.logger, capture=capture,
+                            capture_limit=6, tee=tee)
+        assert capture.getvalue() == output[:6]
+        assert tee.getvalue() == output
+        assert self.logged() == [u'foo', u'bar', u'baz']
+        assert self.logger.warning.call_count == 1
+
+    def test_read_chunks_channel(self):
+        channel = MagicMock()
+        channel.recv.side_effect = ['out', '']
+        channel.recv_stderr.side_effect = ['err', '']
+        stdout = paramiko.ChannelFile(channel, 'r')
+        stderr = paramiko.channel.ChannelStderrFile(channel, 'r')
+        assert list(run.read_chunks(stdout, 8)) == ['out']
+        assert list(run.read_chunks(stderr, 8)) == ['err']
+        channel.recv.assert_called_with(8)
+        channel.recv_stderr.assert_called_with(8)
+
 
 class TestQuote(object):
     def test_quote_simple(self):
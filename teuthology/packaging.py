@@ -2,6 +2,7 @@ import logging
 import ast
 import re
 import requests
+import time
 import urllib
 import urlparse
 
@@ -412,10 +413,61 @@ def _get_config_value_for_remote(ctx, remote, config, key):
     return config.get(key)
 
 
+# How long, in seconds, to reuse the successful responses of lookups against
+# gitbuilder and shaman. Every remote in a job asks the same questions.
+LOOKUP_CACHE_TTL = 300
+# Maps a URL to a (time, response) tuple
+_lookup_cache = dict()
+_session = None
+
+
+def _get_session():
+    """
+    :returns: A requests.Session shared by every lookup in this process
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=32)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def _http_get(url, **kwargs):
+    return _get_session().get(url, **kwargs)
+
+
+def _cached_get(url, **kwargs):
+    """
+    Like requests.get(), but using a shared, pooled session, and reusing
+    successful responses for LOOKUP_CACHE_TTL seconds
+    """
+    # kwargs such as headers can change the response, so they are part of
+    # the key; they may hold dicts, hence repr()
+    key = (url, repr(sorted(kwargs.items())))
+    now = time.time()
+    cached = _lookup_cache.get(key)
+    if cached is not None and now - cached[0] < LOOKUP_CACHE_TTL:
+        log.debug("Using cached response for %s", url)
+        return cached[1]
+    resp = _http_get(url, **kwargs)
+    if resp.ok:
+        _lookup_cache[key] = (now, resp)
+    return resp
+
+
+def clear_lookup_cache():
+    """
+    Forget every response cached by _cached_get()
+    """
+    _lookup_cache.clear()
+
+
 def _get_response(url, wait=False, sleep=15, tries=10):
     with safe_while(sleep=sleep, tries=tries, _raise=False) as proceed:
         while proceed():
-            resp = requests.get(url)
+            resp = _cached_get(url)
             if resp.ok:
                 log.info('Package found...')
                 break
@@ -751,7 +803,7 @@ class GitbuilderProject(object):
         """
         url = "{0}/sha1".format(self.base_url)
         log.info("Looking for package sha1: {0}".format(url))
-        resp = requests.get(url)
+        resp = _cached_get(url)
         sha1 = None
         if not resp.ok:
             # TODO: maybe we should have this retry a few times?
@@ -855,7 +907,7 @@ class ShamanProject(GitbuilderProject):
     def _search(self):
         uri = self._search_uri
         log.debug("Querying %s", uri)
-        resp = requests.get(
+        resp = _cached_get(
             uri,
             headers={'content-type': 'application/json'},
         )
@@ -960,7 +1012,7 @@ class ShamanProject(GitbuilderProject):
         )
 
     def _get_repo(self):
-        resp = requests.get(self.repo_url)
+        resp = _cached_get(self.repo_url)
         resp.raise_for_status()
         return resp.text
 
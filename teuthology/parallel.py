@@ -59,10 +59,20 @@ class parallel(object):
     At the end of the with block, the main thread waits until all
     spawned functions have completed, or, if one exited with an exception,
     kills the rest and raises the exception.
+
+    To bound how many functions run at once, pass a size; spawn() will then
+    block until one of the running functions has completed::
+
+        with parallel(size=10) as p:
+            for foo in bar:
+                p.spawn(quux, foo)
     """
 
-    def __init__(self):
-        self.group = gevent.pool.Group()
+    def __init__(self, size=None):
+        if size:
+            self.group = gevent.pool.Pool(size)
+        else:
+            self.group = gevent.pool.Group()
         self.results = gevent.queue.Queue()
         self.count = 0
         self.any_spawned = False
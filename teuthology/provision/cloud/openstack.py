@@ -278,6 +278,7 @@ class OpenStackProvisioner(base.Provisioner):
                     AuthenticationException,
                 ):
                     pass
+        self.remote.refresh_facts()
         cmd = "while [ ! -e '%s' ]; do sleep 5; done" % self._sentinel_path
         self.remote.run(args=cmd, timeout=600)
         log.info("Node is ready: %s", self.node)
@@ -269,6 +269,8 @@ class FOG(object):
                     EOFError,
                 ):
                     pass
+        # Whatever we knew about the host predates the new image
+        self.remote.refresh_facts()
 
     def _fix_hostname(self):
         """
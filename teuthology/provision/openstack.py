@@ -14,6 +14,7 @@ from .. import misc
 from ..openstack import OpenStack, OpenStackInstance
 from ..config import config
 from ..contextutil import safe_while
+from ..parallel import parallel
 from ..exceptions import QuotaExceededError
 
 
@@ -32,6 +33,10 @@ class ProvisionOpenStack(OpenStack):
         self.basename = 'target'
         self.up_string = 'The system is finally up'
         self.property = "%16x" % random.getrandbits(128)
+        # Maps the fqdn of each instance created by create() to the number
+        # of seconds between 'server create' returning and cloud-init
+        # completing on it
+        self.boot_times = dict()
 
     def __del__(self):
         if os.path.exists(self.user_data):
@@ -94,6 +99,11 @@ class ProvisionOpenStack(OpenStack):
             # bugous for volume
             misc.sh("openstack server add volume " + name + " " + volume_name)
 
+    @staticmethod
+    def ssh_keyscan_wait(fqdn):
+        if not misc.ssh_keyscan_wait(fqdn):
+            raise ValueError('ssh_keyscan_wait failed for ' + fqdn)
+
     @staticmethod
     def ip2name(prefix, ip):
         """
@@ -143,25 +153,43 @@ class ProvisionOpenStack(OpenStack):
             if "quota exceeded" in exc.output.lower():
                 raise QuotaExceededError(message=exc.output)
             raise
+        created = time.time()
         instances = filter(
             lambda instance: self.property in instance['Properties'],
             self.list_instances())
-        instances = [OpenStackInstance(i['ID']) for i in instances]
+        ids = [instance['ID'] for instance in instances]
+        found = self.show_instances(ids)
+        if found is None:
+            instances = [OpenStackInstance(id) for id in ids]
+        else:
+            instances = [found[id] for id in ids if id in found]
         fqdns = []
         try:
             network = config['openstack'].get('network', '')
+            names = dict()
             for instance in instances:
                 ip = instance.get_ip(network)
                 name = self.ip2name(self.basename, ip)
                 self.run("server set " +
                          "--name " + name + " " +
                          instance['ID'])
+                names[instance['ID']] = name
+            with parallel() as p:
+                for name in names.values():
+                    p.spawn(self.ssh_keyscan_wait,
+                            name + '.' + config.lab_domain)
+            time.sleep(15)
+            for (instance, success, seconds) in self.cloud_init_wait_many(
+                    instances, start=created):
+                name = names[instance['ID']]
                 fqdn = name + '.' + config.lab_domain
-                if not misc.ssh_keyscan_wait(fqdn):
-                    raise ValueError('ssh_keyscan_wait failed for ' + fqdn)
-                time.sleep(15)
-                if not self.cloud_init_wait(instance):
+                if not success:
                     raise ValueError('cloud_init_wait failed for ' + fqdn)
+                # Measured as each instance finishes, so attaching volumes
+                # to the ones before it isn't counted
+                self.boot_times[fqdn] = seconds
+                log.info("{fqdn} booted in {seconds:.0f}s".format(
+                    fqdn=fqdn, seconds=self.boot_times[fqdn]))
                 self.attach_volumes(name, resources_hint['volumes'])
                 fqdns.append(fqdn)
         except Exception as e:
@@ -295,5 +295,7 @@ class TestFOG(object):
             with raises(MaxWhileTries):
                 obj._wait_for_ready()
             return
+        obj.remote._facts = dict(lsb_release='Distributor ID: Ubuntu')
         obj._wait_for_ready()
         assert len(self.mocks['m_Remote_connect'].call_args_list) == tries + 1
+        assert obj.remote._facts is None
@@ -3,6 +3,9 @@ import logging
 import os
 import shutil
 import time
+import traceback
+
+from gevent.threadpool import ThreadPool
 
 import teuthology
 from teuthology.contextutil import safe_while
@@ -13,6 +16,12 @@ log = logging.getLogger(__name__)
 # If we see this in any directory, we do not prune it
 PRESERVE_FILE = '.preserve'
 
+# Subdirectories of a job dir removed after --remotes days
+REMOTE_SUBDIRS = (
+    ('remote', 'remote logs'),
+    ('data', 'mon data'),
+)
+
 
 def main(args):
     """
@@ -27,9 +36,12 @@ def main(args):
     fail_days = int(args['--fail'])
     remotes_days = int(args['--remotes'])
     compress_days = int(args['--compress'])
+    concurrency = int(args.get('--concurrency') or 1)
+    rate_limit = float(args.get('--rate-limit') or 0) * 1024 * 1024
 
     prune_archive(
-        archive_dir, pass_days, fail_days, remotes_days, compress_days, dry_run
+        archive_dir, pass_days, fail_days, remotes_days, compress_days,
+        dry_run, concurrency=concurrency, rate_limit=rate_limit,
     )
 
 
@@ -40,11 +52,19 @@ def prune_archive(
         remotes_days,
         compress_days,
         dry_run=False,
+        concurrency=1,
+        rate_limit=None,
 ):
     """
-    Walk through the archive_dir, calling the cleanup functions to process
-    directories that might be old enough
+    Walk through the archive_dir once, deciding what to do with each job
+    directory that might be old enough, and hand the resulting removals and
+    compressions to a Pruner
+
+    :param concurrency: How many removals and compressions to run at once
+    :param rate_limit:  If set, the approximate number of bytes per second to
+                        remove or compress
     """
+    start = time.time()
     min_days = min(filter(
         lambda n: n >= 0, [pass_days, fail_days, remotes_days]))
     log.debug("Archive {archive} has {count} children".format(
@@ -62,11 +82,23 @@ def prune_archive(
                 is_old_enough(child, min_days)):
             run_dirs.append(child)
     run_dirs.sort(key=lambda p: os.path.getctime(p), reverse=True)
+    pruner = Pruner(concurrency=concurrency, rate_limit=rate_limit)
     for run_dir in run_dirs:
         log.debug("Processing %s ..." % run_dir)
-        maybe_remove_jobs(run_dir, pass_days, fail_days, dry_run)
-        maybe_remove_remotes(run_dir, remotes_days, dry_run)
-        maybe_compress_logs(run_dir, compress_days, dry_run)
+        for (action, path) in classify_run(
+                run_dir, pass_days, fail_days, remotes_days, compress_days):
+            if not dry_run:
+                pruner.submit(action, path)
+    pruner.join()
+    log.info(
+        "Reclaimed {size:.1f}MB from {count} removals and compressions in "
+        "{secs:.1f}s".format(
+            size=pruner.bytes_reclaimed / (1024.0 * 1024),
+            count=pruner.count,
+            secs=time.time() - start,
+        )
+    )
+    return pruner.bytes_reclaimed
 
 
 def listdir(path):
@@ -78,156 +110,247 @@ def listdir(path):
                 log.exception("Failed to list %s !" % path)
 
 
-def should_preserve(dir_name):
-    """
-    Should the directory be preserved?
-
-    :returns: True if the directory contains a file named '.preserve'; False
-              otherwise
-    """
-    preserve_path = os.path.join(dir_name, PRESERVE_FILE)
-    if os.path.isdir(dir_name) and os.path.exists(preserve_path):
-        return True
-    return False
-
-
 def is_old_enough(file_name, days):
     """
     :returns: True if the file's modification date is earlier than the amount
               of days specified
     """
+    return _is_old_enough(os.path.getmtime(file_name), days)
+
+
+def _is_old_enough(mtime, days, now=None):
     if days < 0:
         return False
-    now = time.time()
+    now = now or time.time()
     secs_to_days = lambda s: s / (60 * 60 * 24)
-    age = now - os.path.getmtime(file_name)
+    age = now - mtime
     if secs_to_days(age) > days:
         return True
     return False
 
 
-def remove(path):
+def classify_run(run_dir, pass_days, fail_days, remotes_days, compress_days):
     """
-    Attempt to recursively remove a directory. If an OSError is encountered,
-    log it and continue.
-    """
-    try:
-        shutil.rmtree(path)
-    except OSError:
-        log.exception("Failed to remove %s !" % path)
+    Look at each job directory in run_dir exactly once and decide what, if
+    anything, should be done with it:
 
+        - Jobs that passed or failed long enough ago are removed entirely
+        - Otherwise, the remote logs and mon data of jobs older than
+          remotes_days are removed
+        - Otherwise, the teuthology.log of jobs older than compress_days is
+          compressed
 
-def maybe_remove_jobs(run_dir, pass_days, fail_days, dry_run=False):
-    """
-    Remove entire job log directories if they are old enough and the job passed
+    Negative values for any of the day counts skip that operation.
+
+    :returns: A generator of (action, path) tuples, where action is either
+              remove_path or compress_log
     """
-    if pass_days < 0 and fail_days < 0:
-        return
     contents = listdir(run_dir)
     if PRESERVE_FILE in contents:
         return
+    now = time.time()
     for child in contents:
         job_path = os.path.join(run_dir, child)
-        # Ensure the path isn't marked for preservation and that it is a
-        # directory
-        if should_preserve(job_path) or not os.path.isdir(job_path):
+        try:
+            job_mtime = os.stat(job_path).st_mtime
+            job_contents = os.listdir(job_path)
+        except OSError:
+            # Not a directory, or it went away
             continue
-        # Is it a job dir?
-        summary_path = os.path.join(job_path, 'summary.yaml')
-        if not os.path.exists(summary_path):
+        # Ensure the path isn't marked for preservation
+        if PRESERVE_FILE in job_contents:
             continue
-        # Depending on whether it passed or failed, we have a different age
-        # threshold
+        # Is it a finished job dir that is old enough to remove?
+        if 'summary.yaml' in job_contents:
+            summary_path = os.path.join(job_path, 'summary.yaml')
+            (status, days) = _job_status(summary_path, pass_days, fail_days)
+            if status and is_old_enough(summary_path, days):
+                log.info(
+                    "{job} is a {days}-day old {status} job; removing".format(
+                        job=job_path, days=days, status=status))
+                yield (remove_path, job_path)
+                continue
+        if _is_old_enough(job_mtime, remotes_days, now):
+            for (subdir, description) in REMOTE_SUBDIRS:
+                subdir_path = os.path.join(job_path, subdir)
+                if subdir not in job_contents or \
+                        not os.path.isdir(subdir_path):
+                    continue
+                log.info("{job} is {days} days old; removing {desc}".format(
+                    job=job_path,
+                    days=remotes_days,
+                    desc=description,
+                ))
+                yield (remove_path, subdir_path)
+        log_name = 'teuthology.log'
+        if (log_name in job_contents and
+                _is_old_enough(job_mtime, compress_days, now)):
+            log.info("{job} is {days} days old; compressing {name}".format(
+                job=job_path,
+                days=compress_days,
+                name=log_name,
+            ))
+            yield (compress_log, os.path.join(job_path, log_name))
+
+
+def _job_status(summary_path, pass_days, fail_days):
+    """
+    Depending on whether the job passed or failed, we have a different age
+    threshold
+
+    :returns: A tuple like ('passed', pass_days), or (None, -1) if the job's
+              status is unknown
+    """
+    try:
         summary_lines = [line.strip() for line in
                          file(summary_path).readlines()]
-        if 'success: true' in summary_lines:
-            status = 'passed'
-            days = pass_days
-        elif 'success: false' in summary_lines:
-            status = 'failed'
-            days = fail_days
-        else:
-            continue
-        # Ensure the directory is old enough to remove
-        if not is_old_enough(summary_path, days):
-            continue
-        log.info("{job} is a {days}-day old {status} job; removing".format(
-            job=job_path, days=days, status=status))
-        if not dry_run:
-            remove(job_path)
+    except IOError:
+        return (None, -1)
+    if 'success: true' in summary_lines:
+        return ('passed', pass_days)
+    elif 'success: false' in summary_lines:
+        return ('failed', fail_days)
+    return (None, -1)
 
 
-def maybe_remove_remotes(run_dir, days, dry_run=False):
+def remove_path(path):
     """
-    Remove remote logs (not teuthology logs) from job directories if they are
-    old enough
+    Remove a directory and all its contents, adding up the sizes of the
+    files as they are removed rather than walking the tree a second time
+
+    This runs on a Pruner worker thread, where logging is not safe, so
+    errors are returned rather than logged.
+
+    :returns: A tuple of the number of bytes processed, the number of bytes
+              reclaimed and the traceback of the first error met, or None
     """
-    if days < 0:
-        return
-    contents = listdir(run_dir)
-    subdirs = dict(
-        remote='remote logs',
-        data='mon data',
-    )
-    if PRESERVE_FILE in contents:
-        return
-    for child in contents:
-        item = os.path.join(run_dir, child)
-        # Ensure the path isn't marked for preservation, that it is a
-        # directory, and that it is old enough
-        if (should_preserve(item) or not os.path.isdir(item) or not
-                is_old_enough(item, days)):
-            continue
-        for (subdir, description) in subdirs.iteritems():
-            _maybe_remove_subdir(item, subdir, days, description, dry_run)
+    processed = 0
+    reclaimed = 0
+    errors = list()
 
+    def remove_entry(func, entry_path):
+        try:
+            func(entry_path)
+        except OSError:
+            errors.append(traceback.format_exc())
 
-def _maybe_remove_subdir(job_dir, subdir, days, description, dry_run=False):
-    # Does the subdir exist?
-    subdir_path = os.path.join(job_dir, subdir)
-    if not os.path.isdir(subdir_path):
-        return
-    log.info("{job} is {days} days old; removing {desc}".format(
-        job=job_dir,
-        days=days,
-        desc=description,
-    ))
-    if not dry_run:
-        remove(subdir_path)
+    for (dir_path, dir_names, file_names) in os.walk(
+            path, topdown=False, onerror=lambda exc: errors.append(str(exc))):
+        for name in file_names:
+            file_path = os.path.join(dir_path, name)
+            try:
+                size = os.lstat(file_path).st_size
+                processed += size
+                os.remove(file_path)
+                reclaimed += size
+            except OSError:
+                errors.append(traceback.format_exc())
+        for name in dir_names:
+            sub_path = os.path.join(dir_path, name)
+            # os.walk() does not descend into symlinks to directories
+            if os.path.islink(sub_path):
+                remove_entry(os.remove, sub_path)
+            else:
+                remove_entry(os.rmdir, sub_path)
+    remove_entry(os.rmdir, path)
+    return (processed, reclaimed, errors[0] if errors else None)
 
 
-def maybe_compress_logs(run_dir, days, dry_run=False):
-    if days < 0:
-        return
-    contents = listdir(run_dir)
-    if PRESERVE_FILE in contents:
-        return
-    for child in contents:
-        item = os.path.join(run_dir, child)
-        # Ensure the path isn't marked for preservation, that it is a
-        # directory, and that it is old enough
-        if (should_preserve(item) or not os.path.isdir(item) or not
-                is_old_enough(item, days)):
-            continue
-        log_name = 'teuthology.log'
-        log_path = os.path.join(item, log_name)
-        if not os.path.exists(log_path):
-            continue
-        log.info("{job} is {days} days old; compressing {name}".format(
-            job=item,
-            days=days,
-            name=log_name,
-        ))
-        if dry_run:
-            continue
-        zlog_path = log_path + '.gz'
-        try:
-            _compress(log_path, zlog_path)
-        except Exception:
-            log.exception("Failed to compress %s", log_path)
+def compress_log(log_path):
+    """
+    Replace a log file with a gzipped copy
+
+    Like remove_path(), this runs on a Pruner worker thread and does not
+    log.
+
+    :returns: A tuple of the number of bytes processed, the number of bytes
+              reclaimed and the traceback of the error met, or None
+    """
+    zlog_path = log_path + '.gz'
+    try:
+        size = os.path.getsize(log_path)
+        _compress(log_path, zlog_path)
+    except Exception:
+        error = traceback.format_exc()
+        if os.path.exists(zlog_path):
             os.remove(zlog_path)
-        else:
-            os.remove(log_path)
+        return (0, 0, error)
+    os.remove(log_path)
+    return (size, size - os.path.getsize(zlog_path), None)
+
+
+class Pruner(object):
+    """
+    Runs removals and compressions on a pool of worker threads, so that
+    filesystem I/O is not serialized, and keeps track of how much space was
+    reclaimed.
+
+    If rate_limit is set, new work is not started while the bytes processed
+    so far exceed rate_limit bytes per second of elapsed time.
+    """
+    def __init__(self, concurrency=1, rate_limit=None):
+        self.pool = ThreadPool(max(concurrency, 1))
+        self.rate_limit = rate_limit
+        self.bytes_reclaimed = 0
+        self.bytes_processed = 0
+        self.count = 0
+        self.start = time.time()
+        self.pending = list()
+
+    def submit(self, func, path):
+        """
+        Run func(path) on the pool, blocking while the pool is full or the
+        rate limit has been reached
+
+        :param func: A function returning a tuple of the number of bytes it
+                     processed, the number of bytes it reclaimed and the
+                     traceback of the error it met, or None. It must not
+                     log: logging's locks are not safe to take from the
+                     pool's threads.
+        :param path: The path to pass to func
+        """
+        self._throttle()
+        self.count += 1
+        self.pending.append((path, self.pool.spawn(func, path)))
+
+    def _collect(self, wait=False):
+        """
+        Account for the work that has finished, or with wait=True, for all
+        of it once it finishes, and log its errors
+        """
+        pending = list()
+        for (path, result) in self.pending:
+            if wait:
+                result.wait()
+            if not result.ready():
+                pending.append((path, result))
+            elif result.successful():
+                (processed, reclaimed, error) = result.value
+                self.bytes_processed += processed
+                self.bytes_reclaimed += reclaimed
+                if error:
+                    log.error("Failed to prune %s !\n%s", path, error)
+            else:
+                log.error("Failed to prune %s: %s", path, result.exception)
+        self.pending = pending
+
+    def _throttle(self):
+        self._collect()
+        if not self.rate_limit:
+            return
+        while True:
+            delay = (self.bytes_processed / float(self.rate_limit) -
+                     (time.time() - self.start))
+            if delay <= 0:
+                return
+            time.sleep(min(delay, 1))
+            self._collect()
+
+    def join(self):
+        """
+        Wait for all submitted work to finish
+        """
+        self._collect(wait=True)
 
 
 def _compress(in_path, out_path):
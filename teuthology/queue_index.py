@@ -0,0 +1,131 @@
+import logging
+import os
+import sqlite3
+
+from .config import config
+
+log = logging.getLogger(__name__)
+
+
+class QueueIndex(object):
+    """
+    An on-disk index of the jobs waiting in the beanstalk queue, stored in a
+    SQLite database at config.queue_index.
+
+    Jobs are added when they are scheduled and removed when a worker
+    reserves them or they are deleted, so teuthology-queue and teuthology-kill
+    can find a run's jobs without reserving every job in a tube. It is only
+    a hint: callers check it against the queue before trusting it.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'job_id INTEGER PRIMARY KEY, tube TEXT, run_name TEXT, '
+            'priority INTEGER, description TEXT)'
+        )
+
+    def add(self, tube, jobs):
+        """
+        :param tube: The tube the jobs were put in
+        :param jobs: A list of (job_id, job_config) tuples
+        """
+        rows = [
+            (int(job_id), tube, job_config['name'],
+             job_config.get('priority'), job_config.get('description'))
+            for (job_id, job_config) in jobs
+        ]
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)', rows)
+
+    def remove(self, job_ids):
+        with self.conn:
+            self.conn.executemany(
+                'DELETE FROM jobs WHERE job_id = ?',
+                [(int(job_id),) for job_id in job_ids],
+            )
+
+    def count(self, tube):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM jobs WHERE tube = ?', (tube,)).fetchone()[0]
+
+    def jobs(self, tube):
+        """
+        List the jobs in a tube, in the order beanstalk would hand them out
+
+        :returns: A list of dicts with job_id, name, priority and description
+                  keys
+        """
+        cursor = self.conn.execute(
+            'SELECT job_id, run_name, priority, description FROM jobs '
+            'WHERE tube = ? ORDER BY priority, job_id', (tube,))
+        return [
+            dict(job_id=job_id, name=str(name), priority=priority,
+                 description=description)
+            for (job_id, name, priority, description) in cursor
+        ]
+
+    def close(self):
+        self.conn.close()
+
+
+def get_index():
+    """
+    Open the queue index.
+
+    :returns: A QueueIndex, or None if config.queue_index is unset or the
+              index can't be opened
+    """
+    if not config.queue_index:
+        return None
+    path = os.path.expanduser(config.queue_index)
+    try:
+        return QueueIndex(path)
+    except sqlite3.Error:
+        log.warning("Could not open queue index %s", path, exc_info=True)
+        return None
+
+
+def add_jobs(tube, jobs):
+    """
+    Record newly-scheduled jobs in the queue index, if there is one. Errors
+    are logged, not raised; the index is only a hint.
+
+    :param tube: The tube the jobs were put in
+    :param jobs: A list of (job_id, job_config) tuples
+    """
+    index = get_index()
+    if index is None:
+        return
+    try:
+        index.add(tube, jobs)
+    except sqlite3.Error:
+        log.warning("Could not update queue index %s", index.path,
+                    exc_info=True)
+    finally:
+        index.close()
+
+
+def remove_jobs(job_ids, index=None):
+    """
+    Remove jobs that have left the queue from the queue index, if there is
+    one. Errors are logged, not raised.
+
+    :param index: A QueueIndex to use and leave open. By default the index
+                  is opened just for this.
+    """
+    owned = index is None
+    if owned:
+        index = get_index()
+        if index is None:
+            return
+    try:
+        index.remove(job_ids)
+    except sqlite3.Error:
+        log.warning("Could not update queue index %s", index.path,
+                    exc_info=True)
+    finally:
+        if owned:
+            index.close()
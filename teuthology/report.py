@@ -5,11 +5,14 @@ import re
 import requests
 import logging
 import socket
+import sqlite3
 from datetime import datetime
 
 import teuthology
+from .archive_index import ArchiveIndex
 from .config import config
 from .job_status import get_status, set_status
+from .parallel import parallel
 
 report_exceptions = (requests.exceptions.RequestException, socket.error)
 
@@ -38,10 +41,11 @@ def main(args):
     archive_base = os.path.abspath(os.path.expanduser(args['--archive'])) or \
         config.archive_base
     save = not args['--no-save']
+    concurrency = int(args.get('--concurrency') or 1)
 
     log = init_logging()
     reporter = ResultsReporter(archive_base, save=save, refresh=refresh,
-                               log=log)
+                               log=log, concurrency=concurrency)
     if dead and not job:
         for run_name in run:
             try_mark_run_dead(run[0])
@@ -65,10 +69,36 @@ class ResultsSerializer(object):
     """
     yamls = ('orig.config.yaml', 'config.yaml', 'info.yaml', 'summary.yaml')
 
-    def __init__(self, archive_base, log=None):
+    def __init__(self, archive_base, log=None, use_index=None):
+        """
+        :param use_index: Whether to use (and maintain) an ArchiveIndex in
+                          archive_base instead of reading the archive
+                          directly every time. Defaults to the
+                          'archive_index' setting.
+        """
         self.archive_base = archive_base or config.archive_base
         self.log = log or init_logging()
+        if use_index is None:
+            use_index = config.archive_index
+        self.use_index = use_index
+        self._index = None
 
+    @property
+    def index(self):
+        """
+        The ArchiveIndex, opened on first use; None if it is not to be used
+        or could not be opened.
+        """
+        if self.use_index and self._index is None:
+            self.use_index = False
+            if os.path.isdir(self.archive_base):
+                try:
+                    self._index = ArchiveIndex(self.archive_base)
+                    self.use_index = True
+                except sqlite3.Error:
+                    self.log.warning("Could not open archive index in %s",
+                                     self.archive_base, exc_info=True)
+        return self._index
 
     def job_info(self, run_name, job_id, pretty=False, simple=False):
         """
@@ -79,15 +109,26 @@ class ResultsSerializer(object):
         :param simple(bool): Read less data for speed (only orig.config.yaml/info.yaml)
         :returns:        A dict.
         """
+        if self.index is not None and not simple:
+            return self.index.job_info(
+                run_name, job_id,
+                self.yamls + ('teuthology.log',),
+                lambda: self._read_job_info(run_name, job_id),
+            )
+        return self._read_job_info(run_name, job_id, simple=simple)
+
+    def _read_job_info(self, run_name, job_id, simple=False):
         job_archive_dir = os.path.join(self.archive_base,
                                        run_name,
                                        job_id)
         job_info = {}
 
         if simple:
-            self.yamls = ('orig.config.yaml', 'info.yaml')
+            yamls = ('orig.config.yaml', 'info.yaml')
+        else:
+            yamls = self.yamls
 
-        for yaml_name in self.yamls:
+        for yaml_name in yamls:
             yaml_path = os.path.join(job_archive_dir, yaml_name)
             if not os.path.exists(yaml_path):
                 continue
@@ -140,6 +181,11 @@ class ResultsSerializer(object):
         if not os.path.isdir(archive_dir):
             return {}
         jobs = {}
+        if self.index is not None:
+            for job_id in self.index.subdirs(archive_dir):
+                if re.match('\d+$', job_id):
+                    jobs[job_id] = os.path.join(archive_dir, job_id)
+            return jobs
         for item in os.listdir(archive_dir):
             if not re.match('\d+$', item):
                 continue
@@ -157,8 +203,13 @@ class ResultsSerializer(object):
         :returns:        A dict like: {'1': '/path/to/1', '2': 'path/to/2'}
         """
         jobs = self.jobs_for_run(run_name)
+        finished = set()
+        if self.index is not None:
+            finished = self.index.finished_jobs(run_name)
         for job_id in jobs.keys():
-            if os.path.exists(os.path.join(jobs[job_id], 'summary.yaml')):
+            if (job_id in finished or
+                    os.path.exists(os.path.join(jobs[job_id],
+                                                'summary.yaml'))):
                 jobs.pop(job_id)
         return jobs
 
@@ -171,6 +222,8 @@ class ResultsSerializer(object):
         archive_base = self.archive_base
         if not os.path.isdir(archive_base):
             return []
+        if self.index is not None:
+            return self.index.subdirs(archive_base)
         runs = []
         for run_name in os.listdir(archive_base):
             if not os.path.isdir(os.path.join(archive_base, run_name)):
@@ -183,7 +236,12 @@ class ResultsReporter(object):
     last_run_file = 'last_successful_run'
 
     def __init__(self, archive_base=None, base_uri=None, save=False,
-                 refresh=False, log=None):
+                 refresh=False, log=None, concurrency=1):
+        """
+        :param concurrency: How many jobs report_jobs() may read and post at
+                            once. Runs are still reported one after another,
+                            so that last_successful_run stays accurate.
+        """
         self.log = log or init_logging()
         self.archive_base = archive_base or config.archive_base
         self.base_uri = base_uri or config.results_server
@@ -193,6 +251,7 @@ class ResultsReporter(object):
         self.serializer = ResultsSerializer(archive_base, log=self.log)
         self.save_last_run = save
         self.refresh = refresh
+        self.concurrency = max(int(concurrency), 1)
         self.session = self._make_session()
 
         if not self.base_uri:
@@ -201,7 +260,11 @@ class ResultsReporter(object):
 
     def _make_session(self, max_retries=10):
         session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(max_retries=max_retries)
+        # Keep a connection around for each concurrent reporter
+        pool_size = max(self.concurrency,
+                        requests.adapters.DEFAULT_POOLSIZE)
+        adapter = requests.adapters.HTTPAdapter(max_retries=max_retries,
+                                                pool_maxsize=pool_size)
         session.mount('http://', adapter)
         return session
 
@@ -267,8 +330,15 @@ class ResultsReporter(object):
         :param run_name: The name of the run.
         :param job_ids:  The jobs' ids
         """
-        for job_id in job_ids:
-            self.report_job(run_name, job_id, dead=dead)
+        if self.concurrency == 1:
+            for job_id in job_ids:
+                self.report_job(run_name, job_id, dead=dead)
+            return
+        # Reading each job's YAML files in report_job() overlaps with the
+        # other jobs' requests to the results server
+        with parallel(size=self.concurrency) as p:
+            for job_id in job_ids:
+                p.spawn(self.report_job, run_name, job_id, dead=dead)
 
     def report_job(self, run_name, job_id, job_info=None, dead=False):
         """
@@ -470,6 +540,42 @@ def try_push_job_info(job_config, extra_info=None):
                       config.results_server)
 
 
+def try_push_jobs_info(job_configs, extra_info=None):
+    """
+    Like try_push_job_info(), but push the info of several jobs using a single
+    ResultsReporter - and thus a single HTTP session - for all of them.
+
+    :param job_configs: A list of job config dicts to push
+    :param extra_info:  Optional second dict to push for every job
+    """
+    log = init_logging()
+
+    if not config.results_server:
+        log.warning('No results_server in config; not reporting results')
+        return
+
+    reporter = ResultsReporter()
+    log.debug("Pushing info for %d jobs to %s", len(job_configs),
+              config.results_server)
+    for job_config in job_configs:
+        if job_config.get('job_id') is None:
+            log.warning('No job_id found; not reporting results')
+            continue
+
+        if extra_info is not None:
+            job_info = extra_info.copy()
+            job_info.update(job_config)
+        else:
+            job_info = job_config
+
+        try:
+            reporter.report_job(job_config['name'], job_config['job_id'],
+                                job_info)
+        except report_exceptions:
+            log.exception("Could not report results to %s",
+                          config.results_server)
+
+
 def try_delete_jobs(run_name, job_ids, delete_empty_run=True):
     """
     Using the same error checking and retry mechanism as try_push_job_info(),
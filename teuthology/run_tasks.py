@@ -74,6 +74,8 @@ def run_tasks(tasks, ctx):
         )
     else:
         timer = Timer()
+    # Allow tasks to record their own timing data
+    ctx.timer = timer
     stack = []
     try:
         for taskdict in tasks:
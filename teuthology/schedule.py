@@ -1,10 +1,15 @@
+import logging
 import pprint
+import time
 import yaml
 
 import teuthology.beanstalk
 from teuthology.misc import get_user, merge_configs
+from teuthology import queue_index
 from teuthology import report
 
+log = logging.getLogger(__name__)
+
 
 def main(args):
     if not args['--last-in-suite']:
@@ -82,5 +87,62 @@ def schedule_job(job_config, num=1):
         print 'Job scheduled with name {name} and ID {jid}'.format(
             name=job_config['name'], jid=jid)
         job_config['job_id'] = str(jid)
+        queue_index.add_jobs(tube, [(jid, job_config)])
         report.try_push_job_info(job_config, dict(status='queued'))
         num -= 1
+
+
+def schedule_jobs(job_configs, num=1):
+    """
+    Schedule several jobs from within this process. Unlike calling
+    schedule_job() once per job, a single beanstalk connection is used for
+    every put, and the queued jobs are reported to the results server
+    afterward using a single HTTP session. They are added to the queue index,
+    if there is one, in one transaction per tube.
+
+    :param job_configs: A list of complete job dicts
+    :param num:         The number of times to schedule each job
+    :returns:           A list of the IDs of the jobs scheduled
+    """
+    num = int(num)
+    job_ids = list()
+    queued = list()
+    indexed = dict()
+    start = time.time()
+    beanstalk = teuthology.beanstalk.connect()
+    try:
+        current_tube = None
+        for job_config in job_configs:
+            job = yaml.safe_dump(job_config)
+            tube = job_config.pop('tube')
+            if tube != current_tube:
+                beanstalk.use(tube)
+                current_tube = tube
+            for i in range(num):
+                jid = beanstalk.put(
+                    job,
+                    ttr=60 * 60 * 24,
+                    priority=job_config['priority'],
+                )
+                log.info('Job scheduled with name {name} and ID {jid}'.format(
+                    name=job_config['name'], jid=jid))
+                queued_config = dict(job_config)
+                queued_config['job_id'] = str(jid)
+                queued.append(queued_config)
+                job_ids.append(jid)
+                indexed.setdefault(tube, list()).append((jid, job_config))
+    finally:
+        beanstalk.close()
+        for (tube, jobs) in indexed.iteritems():
+            queue_index.add_jobs(tube, jobs)
+    put_time = time.time() - start
+    report.try_push_jobs_info(queued, dict(status='queued'))
+    total_time = time.time() - start
+    log.info(
+        "Queued %d jobs in %.2fs (%.1f jobs/s); total with reporting: "
+        "%.2fs (%.1f jobs/s)",
+        len(job_ids),
+        put_time, len(job_ids) / max(put_time, 0.001),
+        total_time, len(job_ids) / max(total_time, 0.001),
+    )
+    return job_ids
@@ -42,6 +42,19 @@ def build_matrix(path, subset=None):
     component will appear as a file with braces listing the selection
     of chosen subitems.
 
+    :param path:        The path to search for yaml fragments
+    :param subset:	(index, outof)
+    """
+    return list(lazy_build_matrix(path, subset))
+
+
+def lazy_build_matrix(path, subset=None):
+    """
+    Like build_matrix(), but return a Combinations object which generates
+    the (description, [file list]) tuples on demand instead of a list. This
+    allows callers to filter as they go and to stop early without ever
+    holding the whole matrix in memory.
+
     :param path:        The path to search for yaml fragments
     :param subset:	(index, outof)
     """
@@ -51,7 +64,7 @@ def build_matrix(path, subset=None):
             (str(subset[0]), str(subset[1]))
         )
     mat, first, matlimit = _get_matrix(path, subset)
-    return generate_combinations(path, mat, first, matlimit)
+    return Combinations(path, mat, first, matlimit)
 
 
 def _get_matrix(path, subset=None):
@@ -172,13 +185,39 @@ def generate_combinations(path, mat, generate_from, generate_to):
     component will appear as a file with braces listing the selection
     of chosen subitems.
     """
-    ret = []
-    for i in range(generate_from, generate_to):
-        output = mat.index(i)
-        ret.append((
+    return list(iter_combinations(path, mat, generate_from, generate_to))
+
+
+def iter_combinations(path, mat, generate_from, generate_to):
+    """
+    Like generate_combinations(), but yield each (description, [file list])
+    tuple as it is generated.
+    """
+    for output in mat.index_range(generate_from, generate_to):
+        yield (
             matrix.generate_desc(combine_path, output),
-            matrix.generate_paths(path, output, combine_path)))
-    return ret
+            matrix.generate_paths(path, output, combine_path))
+
+
+class Combinations(object):
+    """
+    A lazily-evaluated sequence of the (description, [file list]) tuples
+    described by a matrix. It knows its length without generating anything,
+    and may be iterated over more than once; each iteration generates the
+    items afresh.
+    """
+    def __init__(self, path, mat, generate_from, generate_to):
+        self.path = path
+        self.mat = mat
+        self.generate_from = generate_from
+        self.generate_to = generate_to
+
+    def __len__(self):
+        return max(self.generate_to - self.generate_from, 0)
+
+    def __iter__(self):
+        return iter_combinations(self.path, self.mat, self.generate_from,
+                                 self.generate_to)
 
 
 def combine_path(left, right):
@@ -0,0 +1,65 @@
+import copy
+import logging
+import os
+import yaml
+
+from ..misc import deep_merge
+
+log = logging.getLogger(__name__)
+
+# Maps a fragment's path to a (mtime, parsed_yaml) tuple
+_fragment_cache = dict()
+
+
+def load_fragment(path):
+    """
+    Parse a yaml fragment, caching the result by path and mtime so that
+    fragments shared by many jobs are only parsed once.
+
+    The returned object is shared with the cache and must not be modified;
+    use merge_fragments() to build a config that may be.
+
+    :param path: The path to the fragment
+    :returns:    The parsed yaml
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        # Let open() raise the appropriate error, if any
+        mtime = None
+    cached = _fragment_cache.get(path)
+    if mtime is not None and cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path) as f:
+        parsed = yaml.safe_load(f)
+    if mtime is not None:
+        _fragment_cache[path] = (mtime, parsed)
+    return parsed
+
+
+def merge_fragments(paths):
+    """
+    Deep-merge the yaml fragments found at the given paths, in order, the
+    same way teuthology-schedule merges a job's config files.
+
+    :param paths: A list of paths to fragments
+    :returns:     A new dict
+    """
+    result = dict()
+    for path in paths:
+        parsed = load_fragment(path)
+        if parsed is None:
+            continue
+        try:
+            result = deep_merge(result, copy.deepcopy(parsed))
+        except Exception:
+            log.error("Failed to merge fragment %s", path)
+            raise
+    return result
+
+
+def clear_fragment_cache():
+    """
+    Forget every fragment parsed so far
+    """
+    _fragment_cache.clear()
@@ -8,6 +8,42 @@ def lcm(a, b):
 def lcml(l):
     return reduce(lcm, l)
 
+# Matrices no larger than this memoize the results of index(); their
+# indices recur many times while a larger matrix containing them is
+# expanded.
+MEMO_MAX_SIZE = 4096
+
+# Upper bound on the number of sub-results whose descriptions and path
+# lists are memoized by generate_desc() and generate_lists()
+DESC_MEMO_MAX = 100000
+
+
+def memoize_index(index):
+    """
+    Decorate a Matrix.index() implementation so that, for small
+    deterministic matrices, the result for each index is only computed
+    once.
+    """
+    def wrapper(self, i):
+        memo = self.__dict__.get('_index_memo')
+        if memo is None:
+            if self.deterministic() and self.size() <= MEMO_MAX_SIZE:
+                memo = dict()
+            else:
+                memo = False
+            self._index_memo = memo
+        if memo is False or not 0 <= i < self.size():
+            return index(self, i)
+        try:
+            return memo[i]
+        except KeyError:
+            result = memo[i] = index(self, i)
+            return result
+    wrapper.__name__ = index.__name__
+    wrapper.__doc__ = index.__doc__
+    return wrapper
+
+
 class Matrix:
     """
     Interface for sets
@@ -31,6 +67,32 @@ class Matrix:
         """
         pass
 
+    def index_range(self, start, stop):
+        """
+        Generate index(i) for each i in [start, stop). Subclasses may
+        override this to expand a whole range more cheaply than one index
+        at a time.
+        """
+        for i in xrange(start, stop):
+            yield self.index(i)
+
+    def deterministic(self):
+        """
+        Whether index() always returns the same result for a given index;
+        False if a PickRandom is involved. Only deterministic matrices may
+        have their results memoized.
+        """
+        if '_deterministic' not in self.__dict__:
+            self._deterministic = all(
+                submat.deterministic() for submat in self.children())
+        return self._deterministic
+
+    def children(self):
+        """
+        The submatrices of this matrix
+        """
+        return []
+
     def minscanlen(self):
         """
         min run require to get a good sample
@@ -68,6 +130,9 @@ class Cycle(Matrix):
     def index(self, i):
         return self.mat.index(i % self.mat.size())
 
+    def children(self):
+        return [self.mat]
+
     def minscanlen(self):
         return self.mat.minscanlen()
 
@@ -120,6 +185,16 @@ class Product(Matrix):
         else:
             self._minscanlen += 1
 
+        # See _index(): for each submat but the last, precompute the
+        # (lmat, lsize, clen, cycles) values used to pick its item.
+        self._cycle_table = []
+        for (rsize, lmat) in self.submats[:-1]:
+            lsize = lmat.size()
+            cycles = gcd(rsize, lsize)
+            clen = (rsize * lsize) / cycles
+            self._cycle_table.append((lmat, lsize, clen, cycles))
+        self._last = self.submats[-1][1]
+
     def tostr(self, depth):
         ret = '\t'*depth + "Product({item}):\n".format(item=self.item)
         return ret + ''.join([i[1].tostr(depth+1) for i in self.submats])
@@ -130,7 +205,10 @@ class Product(Matrix):
     def size(self):
         return self._size
 
-    def _index(self, i, submats):
+    def children(self):
+        return [submat for (_, submat) in self.submats]
+
+    def _index(self, i):
         """
         We recursively reduce the N dimension problem to a two
         dimension problem.
@@ -145,34 +223,48 @@ class Product(Matrix):
         number on each repeat.  Each of the N repeats must therefore
         be distinct from the previous ones resulting in lmat.size() *
         rmat.size() combinations.
-        """
-        assert len(submats) > 0, \
-            "_index requires non-empty submats"
-        if len(submats) == 1:
-            return frozenset([submats[0][1].index(i)])
-
-        lmat = submats[0][1]
-        lsize = lmat.size()
-
-        rsize = submats[0][0]
-
-        cycles = gcd(rsize, lsize)
-        clen = (rsize * lsize) / cycles
-        off = (i / clen) % cycles
-
-        def combine(r, s=frozenset()):
-            if type(r) is frozenset:
-                return s | r
-            return s | frozenset([r])
-
-        litems = lmat.index((i - off) % lmat.size())
-        ritems = self._index(i, submats[1:])
-        return combine(litems, combine(ritems))
 
+        The recursion is unrolled using the per-submat values precomputed
+        in self._cycle_table.
+        """
+        items = []
+        for (lmat, lsize, clen, cycles) in self._cycle_table:
+            off = (i / clen) % cycles
+            items.append(lmat.index((i - off) % lsize))
+        items.append(self._last.index(i))
+        return frozenset(items)
+
+    @memoize_index
     def index(self, i):
-        items = self._index(i, self.submats)
+        items = self._index(i)
         return (self.item, items)
 
+    def index_range(self, start, stop):
+        """
+        Expand [start, stop) in one pass: the items of each deterministic
+        submat are tabulated once for the whole range rather than looked up
+        for every index.
+        """
+        count = stop - start
+        table = []
+        for (lmat, lsize, clen, cycles) in self._cycle_table:
+            if lmat.deterministic() and lsize <= count:
+                items = [lmat.index(j) for j in xrange(lsize)]
+            else:
+                items = None
+            table.append((lmat, items, lsize, clen, cycles))
+        last = self._last
+        for i in xrange(start, stop):
+            result = []
+            for (lmat, items, lsize, clen, cycles) in table:
+                j = (i - (i / clen) % cycles) % lsize
+                if items is None:
+                    result.append(lmat.index(j))
+                else:
+                    result.append(items[j])
+            result.append(last.index(i))
+            yield (self.item, frozenset(result))
+
 class Concat(Matrix):
     """
     Concatenates all items in child matrices
@@ -187,12 +279,23 @@ class Concat(Matrix):
     def minscanlen(self):
         return 1
 
+    def children(self):
+        return self.submats
+
     def index(self, i):
+        # The result doesn't depend on i, so compute it only once unless a
+        # PickRandom is involved
+        result = self.__dict__.get('_result')
+        if result is not None:
+            return result
         out = frozenset()
         for submat in self.submats:
             for i in range(submat.size()):
                 out = out | frozenset([submat.index(i)])
-        return (self.item, out)
+        result = (self.item, out)
+        if self.deterministic():
+            self._result = result
+        return result
 
     def tostr(self, depth):
         ret = '\t'*depth + "Concat({item}):\n".format(item=self.item)
@@ -212,6 +315,12 @@ class PickRandom(Matrix):
     def minscanlen(self):
         return 1
 
+    def children(self):
+        return self.submats
+
+    def deterministic(self):
+        return False
+
     def index(self, i):
         indx = random.randint(0, len(self.submats) - 1)
         submat = self.submats[indx]
@@ -306,10 +415,33 @@ class Sum(Matrix):
     def size(self):
         return self._size
 
+    def children(self):
+        return [submat for (_, submat) in self._submats]
+
+    @memoize_index
     def index(self, i):
         si, submat = self._i_to_sis[i % self._size]
         return (self.item, submat.index(si))
 
+_lists_memo = dict()
+_desc_memo = dict()
+
+
+def _memoized(memo, key, fn, *args):
+    """
+    Look up key in memo, computing it with fn(*args) if missing. The memo is
+    emptied once it holds DESC_MEMO_MAX entries, to bound its size.
+    """
+    try:
+        return memo[key]
+    except KeyError:
+        pass
+    if len(memo) >= DESC_MEMO_MAX:
+        memo.clear()
+    value = memo[key] = fn(*args)
+    return value
+
+
 def generate_lists(result):
     """
     Generates a set of tuples representing paths to concatenate
@@ -317,12 +449,12 @@ def generate_lists(result):
     if type(result) is frozenset:
         ret = []
         for i in result:
-            ret.extend(generate_lists(i))
+            ret.extend(_memoized(_lists_memo, i, generate_lists, i))
         return frozenset(ret)
     elif type(result) is tuple:
         ret = []
         (item, children) = result
-        for f in generate_lists(children):
+        for f in _memoized(_lists_memo, children, generate_lists, children):
             nf = [item]
             nf.extend(f)
             ret.append(tuple(nf))
@@ -343,11 +475,13 @@ def generate_desc(joinf, result):
     Generates the text description of the test represented by result
     """
     if type(result) is frozenset:
-        ret = sorted([generate_desc(joinf, i) for i in result])
+        ret = sorted([_memoized(_desc_memo, (joinf, i), generate_desc, joinf, i)
+                      for i in result])
         return '{' + ' '.join(ret) + '}'
     elif type(result) is tuple:
         (item, children) = result
-        cdesc = generate_desc(joinf, children)
+        cdesc = _memoized(_desc_memo, (joinf, children), generate_desc, joinf,
+                          children)
         return joinf(str(item), cdesc)
     else:
         return str(result)
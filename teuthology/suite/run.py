@@ -1,10 +1,10 @@
 import copy
 import logging
 import os
+import pprint
 import pwd
 import re
 import time
-import yaml
 
 from datetime import datetime
 from tempfile import NamedTemporaryFile
@@ -15,9 +15,11 @@ from ..exceptions import (
 )
 from ..misc import deep_merge, get_results_url
 from ..orchestra.opsys import OS
+from .. import schedule
 
 from . import util
-from .build_matrix import combine_path, build_matrix
+from .build_matrix import combine_path, lazy_build_matrix
+from .fragment import merge_fragments
 from .placeholder import substitute_placeholders, dict_templ
 
 log = logging.getLogger(__name__)
@@ -291,6 +293,57 @@ class Run(object):
             base_args.extend(['--owner', self.args.owner])
         return base_args
 
+    def build_schedule_args(self, description=None, conf_paths=None,
+                            last_in_suite=False, email=None, timeout=None):
+        """
+        Build the dict of arguments that teuthology-schedule would have
+        parsed from its command line, for use with schedule.build_config().
+        This mirrors build_base_args().
+        """
+        priority = self.args.priority
+        return {
+            '--name': self.name,
+            '--num': str(self.args.num),
+            '--worker': util.get_worker(self.args.machine_type),
+            '--dry-run': bool(self.args.dry_run),
+            '--priority': str(priority if priority is not None else 1000),
+            '--verbose': bool(self.args.verbose),
+            '--owner': self.args.owner,
+            '--description': description,
+            '--last-in-suite': last_in_suite,
+            '--email': email,
+            '--timeout': timeout,
+            '<conf_file>': list(conf_paths or []),
+        }
+
+    def schedule_batch(self, job_configs):
+        """
+        Submit job configs built by build_schedule_args() from within this
+        process, instead of running teuthology-schedule for each of them.
+
+        In dry-run mode nothing is submitted; with -vv, the job configs are
+        printed as teuthology-schedule --dry-run would.
+        """
+        if self.args.dry_run:
+            if self.args.verbose > 1:
+                for job_config in job_configs:
+                    pprint.pprint(job_config)
+            return
+        schedule.schedule_jobs(job_configs, num=self.args.num)
+
+    def log_batch_job(self, args, log_prefix=''):
+        """
+        In dry-run mode, log the teuthology-schedule command line equivalent
+        to a job scheduled in batch mode, as the subprocess mode does.
+        """
+        if self.args.dry_run:
+            util.teuthology_schedule(
+                args=list(args),
+                dry_run=True,
+                verbose=0,
+                log_prefix=log_prefix,
+            )
+
     def prepare_and_schedule(self):
         """
         Puts together some "base arguments" with which to execute
@@ -314,12 +367,22 @@ class Run(object):
             arg.extend(['--email', self.base_config.email])
             if self.args.timeout:
                 arg.extend(['--timeout', self.args.timeout])
-            util.teuthology_schedule(
-                args=arg,
-                dry_run=self.args.dry_run,
-                verbose=self.args.verbose,
-                log_prefix="Results email: ",
-            )
+            if self.args.batch:
+                self.log_batch_job(arg, log_prefix="Results email: ")
+                self.schedule_batch([schedule.build_config(
+                    self.build_schedule_args(
+                        last_in_suite=True,
+                        email=self.base_config.email,
+                        timeout=self.args.timeout,
+                    )
+                )])
+            else:
+                util.teuthology_schedule(
+                    args=arg,
+                    dry_run=self.args.dry_run,
+                    verbose=self.args.verbose,
+                    log_prefix="Results email: ",
+                )
             results_url = get_results_url(self.base_config.name)
             if results_url:
                 log.info("Test results viewable at %s", results_url)
@@ -327,12 +390,14 @@ class Run(object):
     def collect_jobs(self, arch, configs, newest=False):
         jobs_to_schedule = []
         jobs_missing_packages = []
+        # A list of (job, os_type, os_version, flavor) tuples
+        candidates = []
         for description, fragment_paths in configs:
             base_frag_paths = [
                 util.strip_fragment_path(x) for x in fragment_paths
             ]
             limit = self.args.limit
-            if limit > 0 and len(jobs_to_schedule) >= limit:
+            if limit > 0 and len(candidates) >= limit:
                 log.info(
                     'Stopped after {limit} jobs due to --limit={limit}'.format(
                         limit=limit))
@@ -362,9 +427,7 @@ class Run(object):
                 if all_filt_val:
                     continue
 
-            raw_yaml = '\n'.join([file(a, 'r').read() for a in fragment_paths])
-
-            parsed_yaml = yaml.load(raw_yaml)
+            parsed_yaml = merge_fragments(fragment_paths)
             os_type = parsed_yaml.get('os_type') or self.base_config.os_type
             os_version = parsed_yaml.get('os_version') or self.base_config.os_version
             exclude_arch = parsed_yaml.get('exclude_arch')
@@ -394,15 +457,28 @@ class Run(object):
                 args=arg
             )
 
-            sha1 = self.base_config.sha1
+            flavor = None
             if config.suite_verify_ceph_hash:
                 full_job_config = copy.deepcopy(self.base_config.to_dict())
                 deep_merge(full_job_config, parsed_yaml)
                 flavor = util.get_install_task_flavor(full_job_config)
+            candidates.append((job, os_type, os_version, flavor))
+
+        sha1 = self.base_config.sha1
+        if config.suite_verify_ceph_hash:
+            # Look up every distinct combination at once, rather than one at a
+            # time as we come across them below
+            self.package_versions = util.prefetch_package_versions(
+                set((sha1, os_type, os_version, flavor) for
+                    (_, os_type, os_version, flavor) in candidates),
+                self.package_versions,
+            )
+        for (job, os_type, os_version, flavor) in candidates:
+            if config.suite_verify_ceph_hash:
                 # Get package versions for this sha1, os_type and flavor. If
-                # we've already retrieved them in a previous loop, they'll be
-                # present in package_versions and gitbuilder will not be asked
-                # again for them.
+                # we've already retrieved them above, they'll be present in
+                # package_versions and gitbuilder will not be asked again for
+                # them.
                 try:
                     self.package_versions = util.get_package_versions(
                         sha1,
@@ -429,6 +505,12 @@ class Run(object):
         return jobs_missing_packages, jobs_to_schedule
 
     def schedule_jobs(self, jobs_missing_packages, jobs_to_schedule, name):
+        start = time.time()
+        batch = self.args.batch
+        throttle = self.args.throttle
+        if batch and throttle:
+            log.warning("--throttle is ignored when scheduling with --batch")
+        job_configs = []
         for job in jobs_to_schedule:
             log.info(
                 'Scheduling %s', job['desc']
@@ -446,16 +528,34 @@ class Run(object):
                         "hash {sha1}.".format(sha1=self.base_config.sha1),
                         name,
                     )
+            if batch:
+                self.log_batch_job(job['args'], log_prefix=log_prefix)
+                conf_paths = job['args'][job['args'].index('--') + 1:]
+                job_configs.append(schedule.build_config(
+                    self.build_schedule_args(
+                        description=job['desc'],
+                        conf_paths=conf_paths,
+                    )
+                ))
+                continue
             util.teuthology_schedule(
                 args=job['args'],
                 dry_run=self.args.dry_run,
                 verbose=self.args.verbose,
                 log_prefix=log_prefix,
             )
-            throttle = self.args.throttle
             if not self.args.dry_run and throttle:
                 log.info("pause between jobs : --throttle " + str(throttle))
                 time.sleep(int(throttle))
+        if batch:
+            self.schedule_batch(job_configs)
+        elapsed = time.time() - start
+        log.info(
+            "Scheduled %d jobs in %.2fs (%.1f jobs/s) using %s mode",
+            len(jobs_to_schedule), elapsed,
+            len(jobs_to_schedule) / max(elapsed, 0.001),
+            'batch' if batch else 'subprocess',
+        )
 
     def schedule_suite(self):
         """
@@ -471,10 +571,8 @@ class Run(object):
             self.base_config.suite.replace(':', '/'),
         ))
         log.debug('Suite %s in %s' % (suite_name, suite_path))
-        configs = [
-            (combine_path(suite_name, item[0]), item[1]) for item in
-            build_matrix(suite_path, subset=self.args.subset)
-        ]
+        # Combinations are generated lazily, as collect_jobs() consumes them
+        configs = lazy_build_matrix(suite_path, subset=self.args.subset)
         log.info('Suite %s in %s generated %d jobs (not yet filtered)' % (
             suite_name, suite_path, len(configs)))
 
@@ -494,8 +592,12 @@ class Run(object):
         backtrack = 0
         limit = self.args.newest
         while backtrack <= limit:
+            described_configs = (
+                (combine_path(suite_name, desc), fragment_paths)
+                for desc, fragment_paths in configs
+            )
             jobs_missing_packages, jobs_to_schedule = \
-                self.collect_jobs(arch, configs, self.args.newest)
+                self.collect_jobs(arch, described_configs, self.args.newest)
             if jobs_missing_packages and self.args.newest:
                 new_sha1 = \
                     util.find_git_parent('ceph', self.base_config.sha1)
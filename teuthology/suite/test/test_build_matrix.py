@@ -98,6 +98,31 @@ class TestBuildMatrix(object):
         assert len(result) == 4
         assert self.fragment_occurences(result, 'd1_1_1.yaml') == 0.5
 
+    def test_lazy_convolve_2x2(self):
+        fake_fs = {
+            'd0_0': {
+                '%': None,
+                'd1_0': {
+                    'd1_0_0.yaml': None,
+                    'd1_0_1.yaml': None,
+                },
+                'd1_1': {
+                    'd1_1_0.yaml': None,
+                    'd1_1_1.yaml': None,
+                },
+            },
+        }
+        self.start_patchers(fake_fs)
+        result = build_matrix.lazy_build_matrix('d0_0')
+        assert len(result) == 4
+        assert list(result) == build_matrix.build_matrix('d0_0')
+        # Items are generated on demand, so we can stop early
+        with patch.object(build_matrix.matrix, 'generate_paths',
+                          wraps=build_matrix.matrix.generate_paths) as m_paths:
+            first = next(iter(result))
+            assert m_paths.call_count == 1
+        assert first == build_matrix.build_matrix('d0_0')[0]
+
     def test_convolve_2x2x2(self):
         fake_fs = {
             'd0_0': {
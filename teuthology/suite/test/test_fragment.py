@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from teuthology.suite import fragment
+
+
+class TestFragment(object):
+    def setup(self):
+        fragment.clear_fragment_cache()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+        fragment.clear_fragment_cache()
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_load_fragment_cached(self):
+        path = self.write('a.yaml', 'a: 1\n')
+        with patch('teuthology.suite.fragment.yaml.safe_load',
+                   wraps=fragment.yaml.safe_load) as m_safe_load:
+            assert fragment.load_fragment(path) == {'a': 1}
+            assert fragment.load_fragment(path) == {'a': 1}
+            assert m_safe_load.call_count == 1
+
+    def test_load_fragment_mtime_changed(self):
+        path = self.write('a.yaml', 'a: 1\n', mtime=1000)
+        assert fragment.load_fragment(path) == {'a': 1}
+        self.write('a.yaml', 'a: 2\n', mtime=2000)
+        assert fragment.load_fragment(path) == {'a': 2}
+
+    def test_merge_fragments(self):
+        paths = [
+            self.write('a.yaml', 'tasks: [a]\noverrides: {x: {y: 1}}\n'),
+            self.write('b.yaml', 'tasks: [b]\noverrides: {x: {z: 2}}\n'),
+            self.write('empty.yaml', '# nothing here\n'),
+        ]
+        merged = fragment.merge_fragments(paths)
+        assert merged == dict(
+            tasks=['a', 'b'],
+            overrides=dict(x=dict(y=1, z=2)),
+        )
+        # The cached fragments must not have been modified by the merge
+        assert fragment.load_fragment(paths[0]) == dict(
+            tasks=['a'],
+            overrides=dict(x=dict(y=1)),
+        )
+        merged['tasks'].append('c')
+        assert fragment.merge_fragments(paths)['tasks'] == ['a', 'b']
@@ -165,6 +165,38 @@ class TestSuiteMain(object):
             m_sleep.assert_called_with(int(throttle))
             m['get_gitbuilder_hash'].assert_not_called()
 
+    def test_schedule_suite_batch(self):
+        suite_name = 'noop'
+        suite_dir = os.path.dirname(__file__)
+        machine_type = 'burnupi'
+
+        with patch.multiple(
+            'teuthology.suite.util',
+            fetch_repos=DEFAULT,
+            teuthology_schedule=DEFAULT,
+            get_arch=lambda x: 'x86_64',
+            get_gitbuilder_hash=DEFAULT,
+            git_ls_remote=lambda *args: '1234',
+            package_version_for_hash=DEFAULT,
+        ) as m:
+            config.suite_verify_ceph_hash = False
+            with patch('teuthology.suite.run.schedule.schedule_jobs') as \
+                    m_schedule_jobs:
+                main([
+                    '--ceph', 'master',
+                    '--suite', suite_name,
+                    '--suite-dir', suite_dir,
+                    '--suite-relpath', '',
+                    '--machine-type', machine_type,
+                    '--batch',
+                ])
+            m['teuthology_schedule'].assert_not_called()
+            assert m_schedule_jobs.call_count == 1
+            job_configs = m_schedule_jobs.call_args[0][0]
+            assert len(job_configs) == 1
+            assert job_configs[0]['description'] == 'noop/noop.yaml'
+            assert job_configs[0]['tube'] == machine_type
+
     def test_schedule_suite(self):
         suite_name = 'noop'
         suite_dir = os.path.dirname(__file__)
@@ -182,6 +214,8 @@ class TestSuiteMain(object):
         ) as m:
             m['package_version_for_hash'].return_value = 'fake-9.5'
             config.suite_verify_ceph_hash = True
+            # Don't use or update the real on-disk cache
+            config.package_version_cache = None
             main([
                 '--ceph', 'master',
                 '--suite', suite_name,
@@ -80,3 +80,29 @@ class TestMatrix(object):
                     mbs(2, range(2)),
                     mbs(4, range(9)),
                     ]))
+
+    def test_product_index_range(self):
+        mat = matrix.Product(1, [
+                    mbs(1, range(6)),
+                    mbs(2, range(4)),
+                    mbs(3, range(3)),
+                    ])
+        sz = mat.size()
+        assert list(mat.index_range(0, sz)) == \
+            [mat.index(i) for i in range(sz)]
+        assert list(mat.index_range(5, 17)) == \
+            [mat.index(i) for i in range(5, 17)]
+
+    def test_concat_memoized(self):
+        mat = matrix.Concat(1, [mbs(1, range(3)), mbs(2, range(2))])
+        assert mat.index(0) is mat.index(0)
+
+    def test_pick_random_not_memoized(self):
+        mat = matrix.Concat(1, [matrix.PickRandom(2, [
+                    mbs(1, range(6)),
+                    mbs(3, range(3)),
+                    ])])
+        assert not mat.deterministic()
+        assert not hasattr(mat, '_result')
+        mat.index(0)
+        assert not hasattr(mat, '_result')
@@ -3,6 +3,7 @@ import pytest
 import requests
 import yaml
 
+from contextlib import closing
 from datetime import datetime
 from mock import patch, call, ANY, DEFAULT
 from StringIO import StringIO
@@ -199,8 +200,8 @@ class TestScheduleSuite(object):
     @patch('teuthology.suite.util.has_packages_for_distro')
     @patch('teuthology.suite.util.get_package_versions')
     @patch('teuthology.suite.util.get_install_task_flavor')
-    @patch('__builtin__.file')
-    @patch('teuthology.suite.run.build_matrix')
+    @patch('teuthology.suite.fragment.open', create=True)
+    @patch('teuthology.suite.run.lazy_build_matrix')
     @patch('teuthology.suite.util.git_ls_remote')
     @patch('teuthology.suite.util.package_version_for_hash')
     @patch('teuthology.suite.util.git_validate_sha1')
@@ -210,7 +211,7 @@ class TestScheduleSuite(object):
         m_package_version_for_hash,
         m_git_ls_remote,
         m_build_matrix,
-        m_file,
+        m_open,
         m_get_install_task_flavor,
         m_get_package_versions,
         m_has_packages_for_distro,
@@ -227,9 +228,9 @@ class TestScheduleSuite(object):
         m_build_matrix.return_value = build_matrix_output
         frag1_read_output = 'field1: val1'
         frag2_read_output = 'field2: val2'
-        m_file.side_effect = [
-            StringIO(frag1_read_output),
-            StringIO(frag2_read_output),
+        m_open.side_effect = [
+            closing(StringIO(frag1_read_output)),
+            closing(StringIO(frag2_read_output)),
         ]
         m_get_install_task_flavor.return_value = 'basic'
         m_get_package_versions.return_value = dict()
@@ -269,8 +270,8 @@ class TestScheduleSuite(object):
     @patch('teuthology.suite.util.has_packages_for_distro')
     @patch('teuthology.suite.util.get_package_versions')
     @patch('teuthology.suite.util.get_install_task_flavor')
-    @patch('__builtin__.file')
-    @patch('teuthology.suite.run.build_matrix')
+    @patch('teuthology.suite.fragment.open', create=True)
+    @patch('teuthology.suite.run.lazy_build_matrix')
     @patch('teuthology.suite.util.git_ls_remote')
     @patch('teuthology.suite.util.package_version_for_hash')
     @patch('teuthology.suite.util.git_validate_sha1')
@@ -280,7 +281,7 @@ class TestScheduleSuite(object):
         m_package_version_for_hash,
         m_git_ls_remote,
         m_build_matrix,
-        m_file,
+        m_open,
         m_get_install_task_flavor,
         m_get_package_versions,
         m_has_packages_for_distro,
@@ -296,7 +297,9 @@ class TestScheduleSuite(object):
             (build_matrix_desc, build_matrix_frags),
         ]
         m_build_matrix.return_value = build_matrix_output
-        m_file.side_effect = [StringIO('field: val\n') for i in xrange(11)]
+        m_open.side_effect = [
+            closing(StringIO('field: val\n')) for i in xrange(11)
+        ]
         m_get_install_task_flavor.return_value = 'basic'
         m_get_package_versions.return_value = dict()
         m_has_packages_for_distro.side_effect = [
@@ -320,8 +323,8 @@ class TestScheduleSuite(object):
     @patch('teuthology.suite.util.has_packages_for_distro')
     @patch('teuthology.suite.util.get_package_versions')
     @patch('teuthology.suite.util.get_install_task_flavor')
-    @patch('__builtin__.file')
-    @patch('teuthology.suite.run.build_matrix')
+    @patch('teuthology.suite.fragment.open', create=True)
+    @patch('teuthology.suite.run.lazy_build_matrix')
     @patch('teuthology.suite.util.git_ls_remote')
     @patch('teuthology.suite.util.package_version_for_hash')
     @patch('teuthology.suite.util.git_validate_sha1')
@@ -331,7 +334,7 @@ class TestScheduleSuite(object):
         m_package_version_for_hash,
         m_git_ls_remote,
         m_build_matrix,
-        m_file,
+        m_open,
         m_get_install_task_flavor,
         m_get_package_versions,
         m_has_packages_for_distro,
@@ -350,8 +353,8 @@ class TestScheduleSuite(object):
             (build_matrix_desc, build_matrix_frags),
         ]
         m_build_matrix.return_value = build_matrix_output
-        m_file.side_effect = [
-            StringIO('field: val\n') for i in xrange(NUM_FAILS+1)
+        m_open.side_effect = [
+            closing(StringIO('field: val\n')) for i in xrange(NUM_FAILS+1)
         ]
         m_get_install_task_flavor.return_value = 'basic'
         m_get_package_versions.return_value = dict()
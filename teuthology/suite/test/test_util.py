@@ -1,11 +1,15 @@
+import json
 import os
 import pytest
 import tempfile
+import time
 
 from copy import deepcopy
 from mock import Mock, patch
 
+from teuthology import packaging
 from teuthology.config import config
+from teuthology.exceptions import VersionNotFoundError
 from teuthology.orchestra.opsys import OS
 from teuthology.suite import util
 
@@ -48,8 +52,9 @@ def git_repository(request):
 class TestUtil(object):
     def setup(self):
         config.use_shaman = False
+        packaging.clear_lookup_cache()
 
-    @patch('requests.get')
+    @patch('teuthology.packaging._http_get')
     def test_get_hash_success(self, m_get):
         mock_resp = Mock()
         mock_resp.ok = True
@@ -58,7 +63,7 @@ class TestUtil(object):
         result = util.get_gitbuilder_hash()
         assert result == "the_hash"
 
-    @patch('requests.get')
+    @patch('teuthology.packaging._http_get')
     def test_get_hash_fail(self, m_get):
         mock_resp = Mock()
         mock_resp.ok = False
@@ -66,7 +71,7 @@ class TestUtil(object):
         result = util.get_gitbuilder_hash()
         assert result is None
 
-    @patch('requests.get')
+    @patch('teuthology.packaging._http_get')
     def test_package_version_for_hash(self, m_get):
         mock_resp = Mock()
         mock_resp.ok = True
@@ -266,6 +271,59 @@ class TestMissingPackages(object):
         expected = deepcopy(self.pv)
         assert result == expected
 
+    @patch("teuthology.suite.util.config")
+    @patch("teuthology.suite.util.package_version_for_hash")
+    def test_prefetch_package_versions(self, m_package_version_for_hash,
+                                       m_config, tmpdir):
+        m_config.package_version_cache = str(tmpdir.join('cache.json'))
+        m_config.package_version_cache_ttl = 3600
+
+        def package_version_for_hash(sha1, flavor, distro, distro_version):
+            if distro == 'centos':
+                raise VersionNotFoundError('url')
+            return '1.1'
+        m_package_version_for_hash.side_effect = package_version_for_hash
+        combinations = [
+            ('sha1', 'ubuntu', '14.04', 'basic'),
+            ('sha1', 'ubuntu', '16.04', 'basic'),
+            ('sha1', 'ubuntu', '16.04', 'basic'),
+            ('sha1', 'centos', '7.3', 'basic'),
+        ]
+        result = util.prefetch_package_versions(combinations, self.pv)
+        assert result['sha1']['ubuntu'] == {
+            '14.04': {'basic': '1.0'},
+            '16.04': {'basic': '1.1'},
+        }
+        assert result['sha1']['centos'] == {'7.3': {'basic': None}}
+        # Only the combinations not in self.pv are looked up, just once each
+        assert m_package_version_for_hash.call_count == 2
+        # Found versions come from the on-disk cache next time
+        result = util.prefetch_package_versions(combinations[1:2])
+        assert result == {'sha1': {'ubuntu': {'16.04': {'basic': '1.1'}}}}
+        assert m_package_version_for_hash.call_count == 2
+        # ... until they expire
+        m_config.package_version_cache_ttl = -1
+        util.prefetch_package_versions(combinations[1:2])
+        assert m_package_version_for_hash.call_count == 3
+
+    @patch("teuthology.suite.util.config")
+    def test_load_package_version_cache_bad_entries(self, m_config, tmpdir):
+        path = tmpdir.join('cache.json')
+        m_config.package_version_cache = str(path)
+        m_config.package_version_cache_ttl = 3600
+        stamp = time.time()
+        path.write(json.dumps({
+            'good': [stamp, '1.1'],
+            'short': [stamp],
+            'long': [stamp, '1.1', 'x'],
+            'scalar': 3,
+            'no_stamp': ['yesterday', '1.1'],
+            'no_version': [stamp, None],
+        }))
+        assert util._load_package_version_cache() == {'good': [stamp, '1.1']}
+        path.write(json.dumps([[stamp, '1.1']]))
+        assert util._load_package_version_cache() == dict()
+
     def test_distro_has_packages(self):
         result = util.has_packages_for_distro(
             "sha1",
@@ -1,4 +1,5 @@
 import copy
+import json
 import logging
 import os
 import requests
@@ -6,6 +7,7 @@ import smtplib
 import socket
 import subprocess
 import sys
+import time
 
 from email.mime.text import MIMEText
 
@@ -14,11 +16,13 @@ import teuthology.lock.util
 from .. import repo_utils
 
 from ..config import config
-from ..exceptions import BranchNotFoundError, ScheduleFailError
+from ..exceptions import (BranchNotFoundError, ScheduleFailError,
+                          VersionNotFoundError)
 from ..misc import deep_merge
 from ..repo_utils import fetch_qa_suite, fetch_teuthology
 from ..orchestra.opsys import OS
 from ..packaging import get_builder_project
+from ..parallel import parallel
 from ..repo_utils import build_git_url
 from ..task.install import get_flavor
 
@@ -386,6 +390,132 @@ def get_package_versions(sha1, os_type, os_version, flavor,
     return package_versions
 
 
+def prefetch_package_versions(combinations, package_versions=None,
+                              concurrency=8):
+    """
+    Like get_package_versions(), but for many combinations at once. Those not
+    already in package_versions are looked up concurrently, and positive
+    results are remembered on disk for config.package_version_cache_ttl
+    seconds, so that scheduling the same sha1 again needn't ask gitbuilder or
+    shaman at all.
+
+    Combinations that have no packages are recorded with a version of None.
+
+    :param combinations:     An iterable of (sha1, os_type, os_version, flavor)
+                             tuples
+    :param package_versions: Use this optionally to use cached results of
+                             previous calls to gitbuilder.
+    :param concurrency:      The most lookups to make at once
+    :returns:                A dict of package versions, in the format
+                             get_package_versions() uses
+    """
+    if package_versions is None:
+        package_versions = dict()
+
+    def known(sha1, os_type, os_version, flavor):
+        return flavor in package_versions.get(sha1, dict()).get(
+            str(os_type), dict()).get(os_version, dict())
+
+    def record(sha1, os_type, os_version, flavor, version):
+        package_versions.setdefault(sha1, dict()).setdefault(
+            str(os_type), dict()).setdefault(os_version, dict())[flavor] = \
+            version
+
+    disk_cache = _load_package_version_cache()
+    to_look_up = list()
+    for combination in set(combinations):
+        if known(*combination):
+            continue
+        cached = disk_cache.get(_package_version_cache_key(*combination))
+        if cached is not None:
+            record(*(combination + (cached[1],)))
+        else:
+            to_look_up.append(combination)
+    if not to_look_up:
+        return package_versions
+
+    def look_up(combination):
+        try:
+            return (combination, get_package_versions(*combination))
+        except VersionNotFoundError:
+            return (combination, None)
+
+    log.info("Looking up package versions for %d combinations",
+             len(to_look_up))
+    now = time.time()
+    found = 0
+    with parallel(size=concurrency) as p:
+        for combination in to_look_up:
+            p.spawn(look_up, combination)
+        for (combination, result) in p:
+            if result is None:
+                record(*(combination + (None,)))
+                continue
+            deep_merge(package_versions, result)
+            (sha1, os_type, os_version, flavor) = combination
+            version = result.get(sha1, dict()).get(str(os_type), dict()).get(
+                os_version, dict()).get(flavor)
+            if version:
+                disk_cache[_package_version_cache_key(*combination)] = \
+                    [now, version]
+                found += 1
+    if found:
+        _save_package_version_cache(disk_cache)
+    return package_versions
+
+
+def _package_version_cache_key(sha1, os_type, os_version, flavor):
+    return '/'.join(str(item) for item in (sha1, os_type, os_version, flavor))
+
+
+def _load_package_version_cache():
+    """
+    :returns: A dict mapping _package_version_cache_key() values to
+              [timestamp, version] lists, omitting expired entries
+    """
+    path = config.package_version_cache
+    ttl = config.package_version_cache_ttl
+    if not path or not ttl:
+        return dict()
+    try:
+        with open(os.path.expanduser(path)) as f:
+            cache = json.load(f)
+    except (IOError, ValueError):
+        return dict()
+    if not isinstance(cache, dict):
+        return dict()
+    now = time.time()
+    result = dict()
+    for (key, entry) in cache.iteritems():
+        # Skip anything that isn't a [timestamp, version] pair
+        if not isinstance(entry, list) or len(entry) != 2:
+            continue
+        (stamp, version) = entry
+        if not isinstance(stamp, (int, float)) or \
+                not isinstance(version, basestring):
+            continue
+        if now - stamp < ttl:
+            result[str(key)] = [stamp, str(version)]
+    return result
+
+
+def _save_package_version_cache(cache):
+    path = config.package_version_cache
+    if not path or not config.package_version_cache_ttl:
+        return
+    path = os.path.expanduser(path)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(cache, f)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        log.debug("Could not write package version cache %s", path,
+                  exc_info=True)
+
+
 def has_packages_for_distro(sha1, os_type, os_version, flavor,
                             package_versions=None):
     """
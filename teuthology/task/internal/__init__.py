@@ -7,6 +7,7 @@ from cStringIO import StringIO
 import contextlib
 import logging
 import os
+import sys
 import time
 import yaml
 import subprocess
@@ -19,6 +20,7 @@ from teuthology.config import config as teuth_config
 from teuthology.exceptions import VersionNotFoundError
 from teuthology.job_status import get_status, set_status
 from teuthology.orchestra import cluster, remote, run
+from teuthology.parallel import parallel
 from .redhat import setup_cdn_repo, setup_base_repo, setup_additional_repo  # noqa
 
 log = logging.getLogger(__name__)
@@ -163,28 +165,73 @@ def add_remotes(ctx, config):
             ctx.cluster.add(rem, rem.name)
 
 
+# How many remotes to connect to, or push inventory for, at once
+CONCURRENCY = 16
+# How many of the slowest hosts to record in timing.yaml
+SLOWEST_HOSTS = 5
+
+
+def _run_timed(ctx, func, name, config=None):
+    """
+    Call func(rem) for each remote in ctx.cluster, in parallel, and record
+    the slowest of them in ctx.timer under the given name
+
+    :param func:   A function that takes a Remote object
+    :param name:   A string, like 'connect'
+    :param config: The task's config; may contain 'concurrency' to override
+                   CONCURRENCY
+    """
+    concurrency = (config or dict()).get('concurrency', CONCURRENCY)
+    durations = dict()
+
+    def timed(rem):
+        start = time.time()
+        try:
+            return func(rem)
+        finally:
+            durations[rem.name] = round(time.time() - start, 3)
+
+    with parallel(size=concurrency) as p:
+        for rem in ctx.cluster.remotes.iterkeys():
+            p.spawn(timed, rem)
+    slowest = sorted(durations.iteritems(), key=lambda item: item[1],
+                     reverse=True)[:SLOWEST_HOSTS]
+    if slowest:
+        log.info('Slowest hosts to %s: %s', name,
+                 ', '.join('%s (%ss)' % item for item in slowest))
+    timer = getattr(ctx, 'timer', None)
+    if timer is not None:
+        timer.record(
+            '%s_slowest_hosts' % name,
+            [dict(host=host, seconds=secs) for (host, secs) in slowest],
+        )
+
+
 def connect(ctx, config):
     """
     Connect to all remotes in ctx.cluster
     """
     log.info('Opening connections...')
-    for rem in ctx.cluster.remotes.iterkeys():
+
+    def connect_one(rem):
         log.debug('connecting to %s', rem.name)
         rem.connect()
 
+    _run_timed(ctx, connect_one, 'connect', config)
+
 
 def push_inventory(ctx, config):
     if not teuth_config.lock_server:
         return
 
-    def push():
-        for rem in ctx.cluster.remotes.keys():
+    def push(rem):
+        try:
             info = rem.inventory_info
             teuthology.lock.ops.update_inventory(info)
-    try:
-        push()
-    except Exception:
-        log.exception("Error pushing inventory")
+        except Exception:
+            log.exception("Error pushing inventory for %s", rem.name)
+
+    _run_timed(ctx, push, 'push_inventory', config)
 
 BUILDPACKAGES_FIRST = 0
 BUILDPACKAGES_OK = 1
@@ -330,6 +377,52 @@ def fetch_binaries_for_coredumps(path, remote):
             remote.get_file(debug_path, coredump_path)
 
 
+def pull_archives(ctx, config, archive_dir, logdir):
+    """
+    Pull archive_dir from every remote into its own subdirectory of logdir,
+    CONCURRENCY remotes at a time, along with the binaries needed to read any
+    coredumps. If the archive_bandwidth config option is set, the transfers
+    share that many MB per second between them.
+
+    The bytes and seconds each transfer took are recorded in ctx.timer.
+    Every remote is pulled even if some fail; the first failure is then
+    raised.
+    """
+    concurrency = (config or dict()).get('concurrency', CONCURRENCY)
+    bandwidth = teuth_config.archive_bandwidth
+    rate_limiter = misc.RateLimiter(
+        bandwidth * 1024 * 1024 if bandwidth else None)
+    transfers = dict()
+    failures = list()
+
+    def pull(rem):
+        path = os.path.join(logdir, rem.shortname)
+        start = time.time()
+        try:
+            size = misc.pull_directory(rem, archive_dir, path,
+                                       rate_limiter=rate_limiter)
+            transfers[rem.shortname] = dict(
+                bytes=size,
+                seconds=round(time.time() - start, 3),
+            )
+            # Check for coredumps and pull binaries
+            fetch_binaries_for_coredumps(path, rem)
+        except Exception:
+            log.exception('Failed to transfer archived files from %s',
+                          rem.shortname)
+            failures.append(sys.exc_info())
+
+    with parallel(size=concurrency) as p:
+        for rem in ctx.cluster.remotes.iterkeys():
+            p.spawn(pull, rem)
+    timer = getattr(ctx, 'timer', None)
+    if timer is not None:
+        timer.record('archive_transfers', transfers)
+    if failures:
+        exc_info = failures[0]
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+
 @contextlib.contextmanager
 def archive(ctx, config):
     """
@@ -358,11 +451,7 @@ def archive(ctx, config):
             logdir = os.path.join(ctx.archive, 'remote')
             if (not os.path.exists(logdir)):
                 os.mkdir(logdir)
-            for rem in ctx.cluster.remotes.iterkeys():
-                path = os.path.join(logdir, rem.shortname)
-                misc.pull_directory(rem, archive_dir, path)
-                # Check for coredumps and pull binaries
-                fetch_binaries_for_coredumps(path, rem)
+            pull_archives(ctx, config, archive_dir, logdir)
 
         log.info('Removing archive directory...')
         run.wait(
@@ -443,16 +532,15 @@ def coredump(ctx, config):
 
         # set status = 'fail' if the dir is still there = coredumps were
         # seen
-        for rem in ctx.cluster.remotes.iterkeys():
-            r = rem.run(
-                args=[
-                    'if', 'test', '!', '-e', '{adir}/coredump'.format(adir=archive_dir), run.Raw(';'), 'then',
-                    'echo', 'OK', run.Raw(';'),
-                    'fi',
-                ],
-                stdout=StringIO(),
-            )
-            if r.stdout.getvalue() != 'OK\n':
+        results = ctx.cluster.run_parallel(
+            args=[
+                'if', 'test', '!', '-e', '{adir}/coredump'.format(adir=archive_dir), run.Raw(';'), 'then',
+                'echo', 'OK', run.Raw(';'),
+                'fi',
+            ],
+        )
+        for rem in sorted(results.iterkeys(), key=lambda rem: rem.name):
+            if results[rem].stdout != 'OK\n':
                 log.warning('Found coredumps on %s, flagging run as failed', rem)
                 set_status(ctx.summary, 'fail')
                 if 'failure_reason' not in ctx.summary:
@@ -8,7 +8,6 @@ import teuthology.lock.ops
 import teuthology.lock.query
 import teuthology.lock.util
 from teuthology import misc
-from teuthology import provision
 from teuthology import report
 
 from teuthology.config import config as teuth_config
@@ -109,17 +108,21 @@ def lock_machines(ctx, config):
                         loopcount = 0
                         log.info('virtual machine(s) still not up, ' +
                                  'recreating unresponsive ones.')
-                        for guest in vmlist:
-                            if guest not in keys_dict.keys():
-                                log.info('recreating: ' + guest)
-                                full_name = misc.canonicalize_hostname(guest)
-                                provision.destroy_if_vm(ctx, full_name)
-                                provision.create_if_vm(ctx, full_name)
+                        teuthology.lock.ops.recreate_vms(
+                            ctx,
+                            [guest for guest in vmlist
+                             if guest not in keys_dict],
+                        )
                 if teuthology.lock.keys.do_update_keys(keys_dict)[0]:
                     log.info("Error in virtual machine keys")
                 newscandict = {}
+                statuses = dict(
+                    (stats['name'], stats) for stats in
+                    teuthology.lock.query.get_statuses(all_locked.keys())
+                )
                 for dkey in all_locked.iterkeys():
-                    stats = teuthology.lock.query.get_status(dkey)
+                    stats = statuses[misc.canonicalize_hostname(dkey,
+                                                                user=None)]
                     newscandict[dkey] = stats['ssh_pub_key']
                 ctx.config['targets'] = newscandict
             else:
@@ -688,28 +688,40 @@ def wait_for_reboot(ctx, need_install, timeout, distro=False):
     """
     import time
     starttime = time.time()
+
+    def check_client(client, distro):
+        """
+        :returns: The client if it is running the right kernel, else None
+        """
+        if 'distro' in str(need_install[client]):
+            distro = True
+        log.info('Checking client {client} for new kernel version...'.format(client=client))
+        try:
+            if distro:
+                (remote,) = ctx.cluster.only(client).remotes.keys()
+                assert not need_to_install_distro(remote), \
+                        'failed to install new distro kernel version within timeout'
+
+            else:
+                assert not need_to_install(ctx, client, need_install[client]), \
+                        'failed to install new kernel version within timeout'
+            return client
+        except Exception:
+            log.exception("Saw exception")
+            # ignore connection resets and asserts while time is left
+            if time.time() - starttime > timeout:
+                raise
+
     while need_install:
         teuthology.reconnect(ctx, timeout)
-        for client in need_install.keys():
-            if 'distro' in str(need_install[client]):
-                 distro = True
-            log.info('Checking client {client} for new kernel version...'.format(client=client))
-            try:
-                if distro:
-                    (remote,) = ctx.cluster.only(client).remotes.keys()
-                    assert not need_to_install_distro(remote), \
-                            'failed to install new distro kernel version within timeout'
-
-                else:
-                    assert not need_to_install(ctx, client, need_install[client]), \
-                            'failed to install new kernel version within timeout'
-                del need_install[client]
-            except Exception:
-                log.exception("Saw exception")
-                # ignore connection resets and asserts while time is left
-                if time.time() - starttime > timeout:
-                    raise
-        time.sleep(1)
+        with parallel() as p:
+            for client in need_install.keys():
+                p.spawn(check_client, client, distro)
+            for client in p:
+                if client is not None:
+                    del need_install[client]
+        if need_install:
+            time.sleep(1)
 
 
 def need_to_install_distro(remote):
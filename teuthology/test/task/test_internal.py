@@ -1,5 +1,11 @@
+import pytest
+
+from mock import patch, Mock
+
 from teuthology.config import FakeNamespace
+from teuthology.orchestra.cluster import Cluster
 from teuthology.task import internal
+from teuthology.timer import Timer
 
 
 class TestInternal(object):
@@ -55,3 +61,53 @@ class TestInternal(object):
         assert internal.buildpackages_prep(self.ctx,
                                            self.ctx.config) == internal.BUILDPACKAGES_REMOVED
         assert self.ctx.config == {'tasks': []}
+
+    def make_cluster(self, count):
+        self.ctx.cluster = Cluster()
+        for i in range(count):
+            rem = Mock()
+            rem.name = 'host%d' % i
+            self.ctx.cluster.add(rem, ['role%d' % i])
+        return self.ctx.cluster.remotes.keys()
+
+    def test_connect(self):
+        remotes = self.make_cluster(3)
+        self.ctx.timer = Timer()
+        self.ctx.timer.mark()
+        internal.connect(self.ctx, None)
+        for rem in remotes:
+            rem.connect.assert_called_once_with()
+        slowest = self.ctx.timer.data['connect_slowest_hosts']
+        assert sorted(item['host'] for item in slowest) == \
+            ['host0', 'host1', 'host2']
+
+    def test_connect_failure(self):
+        remotes = self.make_cluster(2)
+        remotes[0].connect.side_effect = RuntimeError()
+        with pytest.raises(RuntimeError):
+            internal.connect(self.ctx, None)
+
+    @patch('teuthology.task.internal.teuthology.lock.ops.update_inventory')
+    @patch('teuthology.task.internal.teuth_config')
+    def test_push_inventory(self, m_config, m_update_inventory):
+        m_config.lock_server = 'http://lock.example.com/'
+        self.make_cluster(3)
+        m_update_inventory.side_effect = [RuntimeError(), True, True]
+        internal.push_inventory(self.ctx, None)
+        assert m_update_inventory.call_count == 3
+
+    @patch('teuthology.task.internal.fetch_binaries_for_coredumps')
+    @patch('teuthology.task.internal.misc.pull_directory')
+    def test_pull_archives(self, m_pull_directory, m_fetch_binaries):
+        remotes = self.make_cluster(3)
+        for rem in remotes:
+            rem.shortname = rem.name
+        m_pull_directory.side_effect = [100, RuntimeError(), 300]
+        self.ctx.timer = Timer()
+        self.ctx.timer.mark()
+        with pytest.raises(RuntimeError):
+            internal.pull_archives(self.ctx, None, '/archive', '/logs')
+        assert m_pull_directory.call_count == 3
+        transfers = self.ctx.timer.data['archive_transfers']
+        assert len(transfers) == 2
+        assert sorted(t['bytes'] for t in transfers.values()) == [100, 300]
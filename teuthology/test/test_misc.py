@@ -1,11 +1,13 @@
 import argparse
 from datetime import datetime
 
-from mock import Mock, patch
+from mock import MagicMock, Mock, patch
 from ..orchestra import cluster
 from .. import misc
+from ..orchestra import run
 from ..config import config
 import subprocess
+import tarfile
 
 import pytest
 
@@ -256,6 +258,139 @@ def test_split_role():
         actual_split = misc.split_role(role)
         assert actual_split == expected_split
 
+
+
+def test_rate_limiter():
+    with patch('teuthology.misc.time') as m_time:
+        m_time.time.return_value = 100
+        limiter = misc.RateLimiter(1000)
+        limiter.consume(500)
+        m_time.sleep.assert_called_once_with(0.5)
+        m_time.time.return_value = 102
+        limiter.consume(500)
+        assert m_time.sleep.call_count == 1
+
+
+def test_pull_directory(tmpdir):
+    src = tmpdir.mkdir('src')
+    src.mkdir('sub').join('file').write('data')
+    tarball = tmpdir.join('archive.tar.gz')
+    with tarfile.open(str(tarball), 'w:gz') as tar:
+        tar.add(str(src), arcname='.')
+    remote = Mock(shortname='host')
+    remote.get_tar_stream.return_value.stdout = tarball.open('rb')
+    dest = tmpdir.join('dest')
+    size = misc.pull_directory(remote, '/archive', str(dest),
+                               rate_limiter=misc.RateLimiter())
+    assert size == tarball.size()
+    assert dest.join('sub', 'file').read() == 'data'
+
+
+@patch('teuthology.misc.subprocess.Popen')
+def test_ssh_keyscan(m_popen):
+    (host1, host2) = [misc.canonicalize_hostname(name, user=None)
+                      for name in ('host1', 'host2')]
+    m_popen.return_value.communicate.side_effect = [
+        ('%s ssh-rsa key1\n' % host1, '# %s:22 SSH-2.0\n' % host1),
+        ('%s ssh-rsa key2\n' % host2, ''),
+    ]
+    with patch('teuthology.contextutil.time.sleep') as m_sleep:
+        keys = misc.ssh_keyscan(['host1', 'host2'])
+    assert keys == {host1: 'ssh-rsa key1', host2: 'ssh-rsa key2'}
+    # All hosts are scanned at once; only those missing are retried
+    assert m_popen.call_args_list[0][1]['args'][-2:] == [host1, host2]
+    assert m_popen.call_args_list[1][1]['args'][-1] == host2
+    assert m_sleep.call_count == 1
+
+
+@patch('teuthology.misc.subprocess.Popen')
+def test_ssh_keyscan_no_raise(m_popen):
+    m_popen.return_value.communicate.return_value = ('', '')
+    keys = misc.ssh_keyscan(['host1'], _raise=False)
+    assert keys == dict()
+    assert m_popen.call_count == 1
+
+
+def test_reconnect():
+    ctx = argparse.Namespace()
+    ctx.cluster = cluster.Cluster()
+    remotes = list()
+    for i in range(3):
+        remote = Mock()
+        remote.name = 'host%d' % i
+        remotes.append(remote)
+        ctx.cluster.add(remote, ['role%d' % i])
+    remotes[0].reconnect.side_effect = [False, False, True]
+    remotes[1].reconnect.return_value = True
+    remotes[2].reconnect.side_effect = [False, True]
+    with patch('teuthology.misc.time.sleep') as m_sleep:
+        downtime = misc.reconnect(ctx, 60)
+    assert sorted(downtime.keys()) == ['host0', 'host1', 'host2']
+    assert [r.reconnect.call_count for r in remotes] == [3, 1, 2]
+    # Each remote backs off on its own
+    assert sorted(call[0][0] for call in m_sleep.call_args_list) == \
+        [1, 1, 2]
+
+
+def test_reconnect_timeout():
+    ctx = argparse.Namespace()
+    remote = Mock()
+    remote.reconnect.return_value = False
+    with patch('teuthology.misc.time') as m_time:
+        m_time.time.side_effect = [0, 10, 20, 30, 40]
+        with pytest.raises(RuntimeError):
+            misc.reconnect(ctx, 15, remotes=[remote])
+
+
+def test_write_files_sftp():
+    remote = MagicMock()
+    misc.write_files(remote, [('/a', 'A'), ('/b', u'B', None, None)])
+    sftp = remote.sftp_session.return_value.__enter__.return_value
+    opened = [c[0] for c in sftp.open.call_args_list]
+    assert opened == [('/a', 'wb'), ('/b', 'wb')]
+    f = sftp.open.return_value.__enter__.return_value
+    assert [c[0][0] for c in f.write.call_args_list] == ['A', 'B']
+    with pytest.raises(ValueError):
+        misc.write_files(remote, [('/a', 'A', '0644', None)])
+
+
+def test_write_files_sudo(tmpdir):
+    remote = Mock()
+    paths = [str(tmpdir.join(name)) for name in ('a', 'b', 'c')]
+    misc.write_files(
+        remote,
+        [(paths[0], 'first'), (paths[1], ''), (paths[2], 'third\n', '0600',
+                                               'root')],
+        sudo=True,
+    )
+    assert remote.run.call_count == 1
+    kwargs = remote.run.call_args[1]
+    args = kwargs['args']
+    assert args[-10:] == [
+        run.Raw('&&'), 'sudo', 'chown', 'root', paths[2],
+        run.Raw('&&'), 'sudo', 'chmod', '0600', paths[2],
+    ]
+    # Run the command's python script locally to check what it writes
+    script_args = args[1:args.index(run.Raw('&&'))]
+    proc = subprocess.Popen(script_args, stdin=subprocess.PIPE)
+    proc.communicate(kwargs['stdin'])
+    assert proc.returncode == 0
+    assert [tmpdir.join(name).read() for name in ('a', 'b', 'c')] == \
+        ['first', '', 'third\n']
+
+
+def test_get_system_type():
+    remote = Mock(shortname='host')
+    remote.facts = dict(lsb_release=(
+        'Distributor ID:\tUbuntu\nRelease:\t14.04\nCodename:\ttrusty'))
+    assert misc.get_system_type(remote) == 'deb'
+    assert misc.get_system_type(remote, distro=True, version=True) == \
+        ('ubuntu', '14.04')
+    remote.facts = dict(lsb_release='')
+    with pytest.raises(RuntimeError):
+        misc.get_system_type(remote)
+
+
 class TestHostnames(object):
     def setup(self):
         config._conf = dict()
@@ -29,6 +29,9 @@ KOJI_TASK_RPMS = [rpm[0] for rpm in KOJI_TASK_RPMS_MATRIX]
 
 class TestPackaging(object):
 
+    def setup(self):
+        packaging.clear_lookup_cache()
+
     def test_get_package_name_deb(self):
         remote = Mock()
         remote.os.package_type = "deb"
@@ -278,7 +281,7 @@ class TestPackaging(object):
     def test_get_koji_task_result_package_name(self, input, expected):
         assert packaging._get_koji_task_result_package_name(input) == expected
 
-    @patch("requests.get")
+    @patch("teuthology.packaging._http_get")
     def test_get_response_success(self, m_get):
         resp = Mock()
         resp.ok = True
@@ -286,7 +289,7 @@ class TestPackaging(object):
         result = packaging._get_response("google.com")
         assert result == resp
 
-    @patch("requests.get")
+    @patch("teuthology.packaging._http_get")
     def test_get_response_failed_wait(self, m_get):
         resp = Mock()
         resp.ok = False
@@ -294,7 +297,7 @@ class TestPackaging(object):
         packaging._get_response("google.com", wait=True, sleep=1, tries=2)
         assert m_get.call_count == 2
 
-    @patch("requests.get")
+    @patch("teuthology.packaging._http_get")
     def test_get_response_failed_no_wait(self, m_get):
         resp = Mock()
         resp.ok = False
@@ -302,6 +305,33 @@ class TestPackaging(object):
         packaging._get_response("google.com", sleep=1, tries=2)
         assert m_get.call_count == 1
 
+    @patch("teuthology.packaging.time")
+    @patch("teuthology.packaging._http_get")
+    def test_cached_get(self, m_get, m_time):
+        m_time.time.return_value = 1000
+        ok = Mock(ok=True)
+        not_ok = Mock(ok=False)
+        m_get.side_effect = [not_ok, ok, ok]
+        assert packaging._cached_get("http://example.com/sha1") is not_ok
+        assert packaging._cached_get("http://example.com/sha1") is ok
+        assert packaging._cached_get("http://example.com/sha1") is ok
+        assert m_get.call_count == 2
+        m_time.time.return_value += packaging.LOOKUP_CACHE_TTL
+        packaging._cached_get("http://example.com/sha1")
+        assert m_get.call_count == 3
+
+    @patch("teuthology.packaging._http_get")
+    def test_cached_get_kwargs(self, m_get):
+        m_get.side_effect = [Mock(ok=True), Mock(ok=True), Mock(ok=True)]
+        json = {'content-type': 'application/json'}
+        plain = packaging._cached_get("http://example.com/search")
+        assert packaging._cached_get(
+            "http://example.com/search", headers=json) is not plain
+        assert packaging._cached_get(
+            "http://example.com/search", headers=dict(json)) is not plain
+        assert packaging._cached_get("http://example.com/search") is plain
+        assert m_get.call_count == 2
+
 
 class TestBuilderProject(object):
     klass = None
@@ -309,6 +339,7 @@ class TestBuilderProject(object):
     def setup(self):
         if self.klass is None:
             pytest.skip()
+        packaging.clear_lookup_cache()
 
     def _get_remote(self, arch="x86_64", system_type="deb", distro="ubuntu",
                     codename="trusty", version="14.04"):
@@ -536,8 +567,9 @@ class TestGitbuilderProject(TestBuilderProject):
             patch('teuthology.packaging._get_config_value_for_remote')
         self.m_get_config_value = self.p_get_config_value.start()
         self.m_get_config_value.return_value = None
-        self.p_get = patch('requests.get')
+        self.p_get = patch('teuthology.packaging._http_get')
         self.m_get = self.p_get.start()
+        packaging.clear_lookup_cache()
         self.p_get_response = patch("teuthology.packaging._get_response")
         self.m_get_response = self.p_get_response.start()
 
@@ -625,8 +657,9 @@ class TestShamanProject(TestBuilderProject):
             patch('teuthology.packaging._get_config_value_for_remote')
         self.m_get_config_value = self.p_get_config_value.start()
         self.m_get_config_value.return_value = None
-        self.p_get = patch('requests.get')
+        self.p_get = patch('teuthology.packaging._http_get')
         self.m_get = self.p_get.start()
+        packaging.clear_lookup_cache()
 
     def teardown(self):
         self.p_config.stop()
@@ -1,3 +1,5 @@
+import gevent
+
 from ..parallel import parallel
 
 
@@ -26,3 +28,20 @@ class TestParallel(object):
             for result in para:
                 in_set.remove(result)
 
+
+    def test_size(self):
+        running = set()
+        peak = [0]
+
+        def track(item):
+            running.add(item)
+            peak[0] = max(peak[0], len(running))
+            gevent.sleep(0.01)
+            running.remove(item)
+            return item
+
+        with parallel(size=3) as para:
+            for i in range(10):
+                para.spawn(track, i)
+            assert sorted(para) == range(10)
+        assert peak[0] == 3
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import time
+
+from mock import patch
+
+from teuthology import prune
+
+
+class TestPrune(object):
+    """ Tests for teuthology.prune """
+
+    def setup(self):
+        self.archive = tempfile.mkdtemp()
+        self.old = time.time() - 100 * 24 * 60 * 60
+
+    def teardown(self):
+        shutil.rmtree(self.archive)
+
+    def make_job(self, run_name, job_id, success=None, remote=False,
+                 preserve=False):
+        job_dir = os.path.join(self.archive, run_name, job_id)
+        os.makedirs(job_dir)
+        with file(os.path.join(job_dir, 'teuthology.log'), 'w') as f:
+            f.write('a line of log\n' * 1000)
+        if success is not None:
+            with file(os.path.join(job_dir, 'summary.yaml'), 'w') as f:
+                f.write('success: %s\n' % str(success).lower())
+        if remote:
+            os.makedirs(os.path.join(job_dir, 'remote', 'host'))
+            with file(os.path.join(job_dir, 'remote', 'host', 'log'),
+                      'w') as f:
+                f.write('x' * 100)
+        if preserve:
+            file(os.path.join(job_dir, prune.PRESERVE_FILE), 'w').close()
+        return job_dir
+
+    def age(self):
+        for root, dirs, files in os.walk(self.archive):
+            for name in dirs + files:
+                os.utime(os.path.join(root, name), (self.old, self.old))
+
+    def test_prune_archive(self):
+        passed = self.make_job('run', '1', success=True)
+        failed = self.make_job('run', '2', success=False, remote=True)
+        preserved = self.make_job('run', '3', success=True, preserve=True)
+        self.age()
+        reclaimed = prune.prune_archive(
+            self.archive, pass_days=14, fail_days=-1, remotes_days=60,
+            compress_days=30, concurrency=4,
+        )
+        assert reclaimed > 0
+        assert not os.path.exists(passed)
+        assert not os.path.exists(os.path.join(failed, 'remote'))
+        assert os.path.exists(os.path.join(failed, 'teuthology.log.gz'))
+        assert not os.path.exists(os.path.join(failed, 'teuthology.log'))
+        assert os.path.exists(os.path.join(preserved, 'teuthology.log'))
+
+    def test_prune_archive_dry_run(self):
+        passed = self.make_job('run', '1', success=True, remote=True)
+        self.age()
+        before = sorted(os.listdir(passed))
+        reclaimed = prune.prune_archive(
+            self.archive, pass_days=14, fail_days=-1, remotes_days=60,
+            compress_days=30, dry_run=True,
+        )
+        assert reclaimed == 0
+        assert sorted(os.listdir(passed)) == before
+
+    def test_classify_run(self):
+        self.make_job('run', '1', success=True, remote=True)
+        self.make_job('run', '2', remote=True)
+        self.age()
+        actions = list(prune.classify_run(
+            os.path.join(self.archive, 'run'), 14, -1, 60, 30))
+        paths = sorted(path[len(self.archive):] for (_, path) in actions)
+        assert paths == [
+            '/run/1',
+            '/run/2/remote',
+            '/run/2/teuthology.log',
+        ]
+
+    def test_compress_log_error(self):
+        (processed, reclaimed, error) = prune.compress_log(
+            os.path.join(self.archive, 'missing.log'))
+        assert (processed, reclaimed) == (0, 0)
+        assert 'OSError' in error
+
+    @patch('teuthology.prune.log')
+    def test_pruner_logs_errors(self, m_log):
+        def fail(path):
+            return (10, 0, 'Traceback: it broke')
+
+        pruner = prune.Pruner(concurrency=2)
+        pruner.submit(fail, '/some/path')
+        pruner.join()
+        assert pruner.bytes_processed == 10
+        args = m_log.error.call_args[0]
+        assert '/some/path' in args
+        assert 'Traceback: it broke' in args
+
+    def test_remove_path(self):
+        job_dir = self.make_job('run', '1', remote=True)
+        os.symlink(os.path.join(job_dir, 'remote'),
+                   os.path.join(job_dir, 'link'))
+        (processed, reclaimed, error) = prune.remove_path(job_dir)
+        assert processed == len('a line of log\n') * 1000 + 100
+        assert reclaimed == processed
+        assert error is None
+        assert not os.path.exists(job_dir)
+        (processed, reclaimed, error) = prune.remove_path(job_dir)
+        assert (processed, reclaimed) == (0, 0)
+        assert 'No such file' in error
@@ -0,0 +1,140 @@
+import beanstalkc
+
+from mock import patch, MagicMock
+
+from teuthology import beanstalk
+from teuthology import queue_index
+from teuthology.config import config
+
+
+class TestQueueIndex(object):
+    def setup(self):
+        self.index = queue_index.QueueIndex(':memory:')
+        self.index.add('tala', [
+            (3, dict(name='run2', priority=50, description='c')),
+            (1, dict(name='run1', priority=100, description='a')),
+            (2, dict(name='run1', priority=100)),
+        ])
+        self.connection = MagicMock()
+        self.connection.stats_tube.return_value = {'current-jobs-ready': 3}
+        self.connection.stats_job.return_value = dict(state='ready',
+                                                      tube='tala')
+        self.connection.peek_ready.return_value = MagicMock(jid=3)
+
+    def teardown(self):
+        self.index.close()
+
+    def test_jobs(self):
+        jobs = self.index.jobs('tala')
+        assert [job['job_id'] for job in jobs] == [3, 1, 2]
+        assert jobs[0] == dict(job_id=3, name='run2', priority=50,
+                               description='c')
+        assert self.index.jobs('mira') == []
+
+    def test_remove(self):
+        self.index.remove([1, '3'])
+        assert self.index.count('tala') == 1
+
+    @patch('teuthology.queue_index.get_index')
+    def test_remove_jobs_open_index(self, m_get_index):
+        queue_index.remove_jobs([1], index=self.index)
+        assert m_get_index.call_count == 0
+        # The index is left open for its owner
+        assert self.index.count('tala') == 2
+
+    def test_find_indexed_jobs(self):
+        jobs = beanstalk.find_indexed_jobs(self.connection, 'tala',
+                                           self.index)
+        assert len(jobs) == 3
+        assert self.connection.reserve.call_count == 0
+        # The counts match, so the jobs aren't looked up one by one
+        assert self.connection.stats_job.call_count == 0
+        self.connection.use.assert_called_once_with('tala')
+
+    def test_find_indexed_jobs_stale(self):
+        self.connection.stats_tube.return_value = {'current-jobs-ready': 1}
+
+        def stats_job(job_id):
+            if job_id == 1:
+                raise beanstalkc.CommandFailed('stats-job', 'NOT_FOUND', [])
+            return dict(state='ready' if job_id == 2 else 'buried',
+                        tube='tala')
+
+        self.connection.stats_job.side_effect = stats_job
+        self.connection.peek_ready.return_value.jid = 2
+        jobs = beanstalk.find_indexed_jobs(self.connection, 'tala',
+                                           self.index)
+        assert [job['job_id'] for job in jobs] == [2]
+        assert self.index.count('tala') == 1
+
+    def test_find_indexed_jobs_unindexed(self):
+        # One indexed job is gone and one job was scheduled without the
+        # index: the counts match, but the next job to be handed out isn't
+        # indexed
+        self.connection.peek_ready.return_value.jid = 4
+        assert beanstalk.find_indexed_jobs(
+            self.connection, 'tala', self.index) is None
+        self.connection.peek_ready.return_value = None
+        assert beanstalk.find_indexed_jobs(
+            self.connection, 'tala', self.index) is None
+
+    def test_find_indexed_jobs_incomplete(self):
+        self.connection.stats_tube.return_value = {'current-jobs-ready': 4}
+        assert beanstalk.find_indexed_jobs(
+            self.connection, 'tala', self.index) is None
+
+    @patch('teuthology.beanstalk.report.try_delete_jobs')
+    @patch('teuthology.beanstalk.queue_index.remove_jobs')
+    def test_walk_indexed_jobs_delete(self, m_remove_jobs, m_try_delete_jobs):
+        deleter = beanstalk.JobDeleter('run1')
+        assert beanstalk.walk_indexed_jobs(
+            self.connection, 'tala', deleter, self.index, pattern='run1')
+        assert self.connection.delete.call_args_list == [((1,),), ((2,),)]
+        assert sorted(m_remove_jobs.call_args[0][0]) == ['1', '2']
+        assert self.connection.reserve.call_count == 0
+
+    @patch('teuthology.beanstalk.report.try_delete_jobs')
+    @patch('teuthology.beanstalk.queue_index.remove_jobs')
+    def test_walk_indexed_jobs_verify(self, m_remove_jobs, m_try_delete_jobs):
+        def stats_job(job_id):
+            if job_id == 1:
+                raise beanstalkc.CommandFailed('stats-job', 'NOT_FOUND', [])
+            return dict(state='ready', tube='tala')
+
+        self.connection.stats_job.side_effect = stats_job
+        deleter = beanstalk.JobDeleter('run1')
+        assert beanstalk.walk_indexed_jobs(
+            self.connection, 'tala', deleter, self.index, pattern='run1',
+            verify=True)
+        # Only the jobs matching the pattern are looked up
+        assert sorted(c[0][0] for c in
+                      self.connection.stats_job.call_args_list) == [1, 2]
+        assert self.connection.delete.call_args_list == [((2,),)]
+        assert [job['job_id'] for job in self.index.jobs('tala')] == [3, 2]
+
+    def test_walk_indexed_jobs_full(self):
+        self.connection.peek.return_value.body = 'name: run2\nos_type: rhel\n'
+        processor = beanstalk.JobProcessor()
+        beanstalk.walk_indexed_jobs(
+            self.connection, 'tala', processor, self.index, pattern='run2',
+            full=True)
+        assert processor.jobs['3']['job_config'] == \
+            dict(name='run2', os_type='rhel')
+
+
+class TestAddJobs(object):
+    @patch('teuthology.schedule.report.try_push_jobs_info')
+    @patch('teuthology.schedule.teuthology.beanstalk.connect')
+    def test_schedule_jobs(self, m_connect, m_try_push_jobs_info, tmpdir):
+        from teuthology.schedule import schedule_jobs
+        m_connect.return_value.put.side_effect = range(1, 4)
+        path = str(tmpdir.join('queue_index.sqlite'))
+        with patch.object(config, 'queue_index', path, create=True):
+            schedule_jobs([
+                dict(name='run1', priority=99, tube='tala'),
+                dict(name='run1', priority=99, tube='mira'),
+            ], num=1)
+            index = queue_index.get_index()
+        assert index.count('tala') == 1
+        assert index.jobs('mira')[0]['job_id'] == 2
+        index.close()
@@ -1,6 +1,11 @@
+import os
+import sqlite3
+import time
 import yaml
 import json
 import fake_archive
+from mock import patch
+from .. import archive_index
 from .. import report
 
 
@@ -75,3 +80,155 @@ class TestSerializer(object):
         assert full_obj == out_obj
 
 
+
+
+class TestReporter(object):
+    def setup(self):
+        self.archive = fake_archive.FakeArchive()
+        self.archive.setup()
+        self.archive_base = self.archive.archive_base
+
+    def teardown(self):
+        self.archive.teardown()
+
+    def test_report_jobs_concurrently(self):
+        run_name = "test_report_jobs_concurrently"
+        yaml_path = "examples/3node_ceph.yaml"
+        job_count = 10
+        jobs = self.archive.create_fake_run(run_name, job_count, yaml_path)
+        job_ids = [str(job['job_id']) for job in jobs]
+
+        reporter = report.ResultsReporter(archive_base=self.archive_base,
+                                          base_uri='http://example.com',
+                                          concurrency=4)
+        with patch.object(reporter, 'session') as m_session:
+            m_session.post.return_value.status_code = 200
+            reporter.report_jobs(run_name, job_ids)
+        posted = [str(json.loads(c[1]['data'])['job_id'])
+                  for c in m_session.post.call_args_list]
+        assert sorted(posted) == sorted(job_ids)
+
+    def test_report_jobs_concurrently_put_fallback(self):
+        run_name = "test_report_jobs_concurrently_put_fallback"
+        yaml_path = "examples/3node_ceph.yaml"
+        jobs = self.archive.create_fake_run(run_name, 3, yaml_path)
+        job_ids = [str(job['job_id']) for job in jobs]
+
+        reporter = report.ResultsReporter(archive_base=self.archive_base,
+                                          base_uri='http://example.com',
+                                          concurrency=2)
+        with patch.object(reporter, 'session') as m_session:
+            m_session.post.return_value.status_code = 400
+            m_session.post.return_value.json.return_value = dict(
+                message='job already exists')
+            reporter.report_jobs(run_name, job_ids)
+        assert m_session.put.call_count == len(job_ids)
+
+
+class TestSerializerIndex(object):
+    def setup(self):
+        self.archive = fake_archive.FakeArchive()
+        self.archive.setup()
+        self.archive_base = self.archive.archive_base
+        self.serializer = report.ResultsSerializer(self.archive_base,
+                                                   use_index=True)
+
+    def teardown(self):
+        self.archive.teardown()
+
+    def age(self, seconds=60):
+        # The index doesn't trust mtimes that are too recent. Make sure the
+        # index file itself exists first, since creating it changes
+        # archive_base's mtime.
+        self.serializer.index
+        stamp = time.time() - seconds
+        for root, dirs, files in os.walk(self.archive_base):
+            for name in dirs + files:
+                os.utime(os.path.join(root, name), (stamp, stamp))
+        os.utime(self.archive_base, (stamp, stamp))
+
+    def test_runs_and_jobs(self):
+        run_name = "test_runs_and_jobs"
+        jobs = self.archive.create_fake_run(run_name, 3,
+                                            "examples/3node_ceph.yaml")
+        job_ids = sorted(str(job['job_id']) for job in jobs)
+        self.age()
+        assert self.serializer.all_runs == [run_name]
+        assert sorted(self.serializer.jobs_for_run(run_name)) == job_ids
+        with patch('os.listdir') as m_listdir:
+            assert self.serializer.all_runs == [run_name]
+            assert sorted(self.serializer.jobs_for_run(run_name)) == job_ids
+            assert m_listdir.call_count == 0
+        # Adding a run changes archive_base's mtime
+        self.archive.create_fake_run("another_run", 1,
+                                     "examples/3node_ceph.yaml")
+        assert sorted(self.serializer.all_runs) == \
+            sorted([run_name, "another_run"])
+
+    def test_job_info(self):
+        run_name = "test_job_info"
+        jobs = self.archive.create_fake_run(run_name, 1,
+                                            "examples/3node_ceph.yaml")
+        job_id = str(jobs[0]['job_id'])
+        self.age()
+        plain = report.ResultsSerializer(self.archive_base, use_index=False)
+        expected = plain.job_info(run_name, job_id)
+        assert self.serializer.job_info(run_name, job_id) == expected
+        with patch.object(self.serializer, '_read_job_info') as m_read:
+            assert self.serializer.job_info(run_name, job_id) == expected
+            assert m_read.call_count == 0
+        # A changed file means the job is read again
+        info_path = os.path.join(self.archive_base, run_name, job_id,
+                                 'info.yaml')
+        with file(info_path, 'a') as f:
+            f.write('extra: value\n')
+        self.age()
+        assert self.serializer.job_info(run_name, job_id)['extra'] == 'value'
+
+    def test_running_jobs_for_run(self):
+        run_name = "test_running_jobs_for_run"
+        jobs = self.archive.create_fake_run(run_name, 3,
+                                            "examples/3node_ceph.yaml",
+                                            num_hung=1)
+        hung = [str(job['job_id']) for job in jobs if 'summary' not in job]
+        self.age()
+        for job_id in self.serializer.jobs_for_run(run_name):
+            self.serializer.job_info(run_name, job_id)
+        assert sorted(self.serializer.running_jobs_for_run(run_name)) == hung
+        # Finished jobs are known from the index
+        with patch('os.path.exists') as m_exists:
+            m_exists.return_value = False
+            assert sorted(self.serializer.running_jobs_for_run(run_name)) == \
+                hung
+            assert m_exists.call_count == len(hung)
+
+    def test_locked_index(self):
+        run_name = "test_locked_index"
+        jobs = self.archive.create_fake_run(run_name, 1,
+                                            "examples/3node_ceph.yaml")
+        job_id = str(jobs[0]['job_id'])
+        self.age()
+        expected = self.serializer.job_info(run_name, job_id)
+        index = self.serializer.index
+        with patch.object(index, 'conn') as m_conn:
+            m_conn.execute.side_effect = sqlite3.OperationalError(
+                'database is locked')
+            assert self.serializer.all_runs == [run_name]
+            assert self.serializer.job_info(run_name, job_id) == expected
+
+    def test_corrupt_index(self):
+        run_name = "test_corrupt_index"
+        self.archive.create_fake_run(run_name, 1, "examples/3node_ceph.yaml")
+        index_path = os.path.join(self.archive_base,
+                                  archive_index.ArchiveIndex.filename)
+        with file(index_path, 'w') as f:
+            f.write('not a database' * 100)
+        serializer = report.ResultsSerializer(self.archive_base,
+                                              use_index=True)
+        assert serializer.index is not None
+        assert serializer.all_runs == [run_name]
+        # Corrupted while in use
+        with file(index_path, 'w') as f:
+            f.write('not a database' * 100)
+        assert serializer.all_runs == [run_name]
+        assert serializer.all_runs == [run_name]
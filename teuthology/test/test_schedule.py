@@ -1,4 +1,6 @@
-from ..schedule import build_config
+from mock import patch, call
+
+from ..schedule import build_config, schedule_jobs
 from ..misc import get_user
 
 
@@ -41,3 +43,22 @@ class TestSchedule(object):
         job_dict = build_config(self.basic_args)
         assert job_dict['owner'] == 'scheduled_%s' % get_user()
 
+
+    @patch('teuthology.schedule.report.try_push_jobs_info')
+    @patch('teuthology.schedule.teuthology.beanstalk.connect')
+    def test_schedule_jobs(self, m_connect, m_try_push_jobs_info):
+        m_beanstalk = m_connect.return_value
+        m_beanstalk.put.side_effect = range(1, 7)
+        job_configs = [
+            dict(name='NAME', priority=99, tube='tala'),
+            dict(name='NAME', priority=99, tube='tala'),
+            dict(name='NAME', priority=99, tube='mira'),
+        ]
+        job_ids = schedule_jobs(job_configs, num=2)
+        assert job_ids == range(1, 7)
+        # one connection, one use() per change of tube
+        assert m_connect.call_count == 1
+        assert m_beanstalk.use.call_args_list == [call('tala'), call('mira')]
+        m_beanstalk.close.assert_called_once_with()
+        queued = m_try_push_jobs_info.call_args[0][0]
+        assert [j['job_id'] for j in queued] == map(str, range(1, 7))
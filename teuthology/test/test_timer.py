@@ -81,3 +81,11 @@ class TestTimer(object):
                     _file.return_value.__enter__.return_value,
                     default_flow_style=False,
                 )
+
+    def test_record(self):
+        self.timer = timer.Timer()
+        self.timer.mark()
+        hosts = [dict(host='host1', seconds=2.5)]
+        self.timer.record('connect_slowest_hosts', hosts)
+        assert self.timer.data['connect_slowest_hosts'] == hosts
+        assert len(self.timer.data['marks']) == 1
@@ -33,6 +33,7 @@ class Timer(object):
         self.path = path
         self.sync = sync
         self.marks = list()
+        self.extra = dict()
         self.start_time = None
         self.start_string = None
 
@@ -55,6 +56,19 @@ class Timer(object):
         if self.sync:
             self.write()
 
+    def record(self, key, value):
+        """
+        Store additional data, like per-host timings, to be included in
+        self.data under the given key
+
+        :param key:   A string; must not be one of the keys self.data already
+                      uses
+        :param value: Any object that can be dumped as yaml
+        """
+        self.extra[key] = value
+        if self.sync:
+            self.write()
+
     def _mark_start(self, message):
         """
         Create the initial time mark
@@ -104,6 +118,7 @@ class Timer(object):
             end=self.get_datetime_string(end_time),
             elapsed=end_interval,
         )
+        result.update(self.extra)
         return result
 
     def write(self):
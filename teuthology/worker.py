@@ -10,6 +10,7 @@ from datetime import datetime
 
 from teuthology import setup_log_file, install_except_hook
 from . import beanstalk
+from . import queue_index
 from . import report
 from . import safepath
 from .config import config as teuth_config
@@ -76,6 +77,8 @@ def main(ctx):
 
     connection = beanstalk.connect()
     beanstalk.watch_tube(connection, ctx.tube)
+    # Kept open rather than reopened for every job
+    index = queue_index.get_index()
     result_proc = None
 
     if teuth_config.teuthology_path is None:
@@ -106,6 +109,7 @@ def main(ctx):
         job.bury()
         job_id = job.jid
         log.info('Reserved job %d', job_id)
+        queue_index.remove_jobs([job_id], index=index)
         log.info('Config is: %s', job.body)
         job_config = yaml.safe_load(job.body)
         job_config['job_id'] = str(job_id)